@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_append.py
+# Purpose:     Cost of saving a growing track after each batch of new notes
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time repeated saves of a track that grows at its end.
+
+This is the pattern of a live recording that is saved as it goes: a track
+that already holds many notes has a few notes added after its last one
+before each save. The new notes are encoded onto the end of the track's
+encoded data; for comparison the same saves are made with the track
+reopened first, so that all of it is closed and encoded again. Reported is
+the mean time per save.
+
+Usage::
+
+    python benchmarks/bench_append.py [--notes N] [--batch B] [--saves S]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def add_notes(midi, rnd, start, count):
+    for i in range(count):
+        midi.addNote(0, 0, rnd.randrange(40, 90), start + i / 4.0,
+                     rnd.choice((0.125, 0.25)), rnd.randrange(1, 128))
+    return start + count / 4.0
+
+
+def record_and_save(args, reopen):
+    rnd = random.Random(0)
+    midi = MIDIFile(1, adjust_origin=True, running_status=True)
+    beat = add_notes(midi, rnd, 0, args.notes)
+    midi.writeFile(BytesIO())
+    elapsed = 0.0
+    for save in range(args.saves):
+        beat = add_notes(midi, rnd, beat, args.batch)
+        start = time.time()
+        if reopen:
+            for track in midi.tracks:
+                track.reopen()
+        output = BytesIO()
+        midi.writeFile(output)
+        elapsed += time.time() - start
+    return elapsed / args.saves, output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--notes', type=int, default=100000,
+                        help='number of notes in the track at the start')
+    parser.add_argument('--batch', type=int, default=16,
+                        help='number of notes added before each save')
+    parser.add_argument('--saves', type=int, default=20,
+                        help='number of saves')
+    args = parser.parse_args()
+
+    print('%d notes, %d saves of %d more' % (args.notes, args.saves,
+                                            args.batch))
+    (appended, data) = record_and_save(args, False)
+    (encoded, expected) = record_and_save(args, True)
+    assert data == expected
+    print('%-26s %10.4f s' % ('new notes appended', appended))
+    print('%-26s %10.4f s' % ('track encoded again', encoded))
+    print('%-26s %10.1fx' % ('speed-up', encoded / appended))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_async.py
+# Purpose:     How long writing a file holds up an asyncio event loop
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Measure how long writing a large file blocks an asyncio event loop.
+
+A ticker task runs on the loop while the file is written, and the longest
+gap between its ticks is reported, along with the time the write took. The
+file is written with ``writeFile()`` called from the loop, with
+``writeAsync()`` and its default thread, and with ``writeAsync()`` and a
+pool of worker processes.
+
+Needs Python 3.5 or later.
+
+Usage::
+
+    python benchmarks/bench_async.py [--tracks T] [--notes N] [--workers W]
+'''
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent import futures
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build(tracks, notes, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for track in range(tracks):
+        for i in range(notes):
+            midi.addNote(track, track % 16, rnd.randrange(40, 90),
+                         rnd.randrange(4 * notes) / 4.0,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(1, 128))
+    return midi
+
+
+async def ticker(gaps):
+    last = time.time()
+    while True:
+        await asyncio.sleep(0.001)
+        now = time.time()
+        gaps.append(now - last)
+        last = now
+
+
+async def measure(write):
+    gaps = []
+    task = asyncio.ensure_future(ticker(gaps))
+    await asyncio.sleep(0.01)
+    start = time.time()
+    await write()
+    elapsed = time.time() - start
+    # Let the ticker see the end of a write that did not yield.
+    await asyncio.sleep(0.01)
+    task.cancel()
+    return (elapsed, max(gaps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=16,
+                        help='number of tracks')
+    parser.add_argument('--notes', type=int, default=20000,
+                        help='number of notes per track')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of worker processes')
+    args = parser.parse_args()
+
+    async def blocking(midi):
+        midi.writeFile(BytesIO())
+
+    async def threaded(midi):
+        await midi.writeAsync(BytesIO())
+
+    async def processes(midi):
+        with futures.ProcessPoolExecutor(args.workers) as executor:
+            await midi.writeAsync(BytesIO(), executor)
+
+    print('%d tracks of %d notes' % (args.tracks, args.notes))
+    print('%-22s %10s %14s' % ('write', 'time', 'longest stall'))
+    loop = asyncio.new_event_loop()
+    try:
+        for (name, write) in (('writeFile', blocking),
+                              ('writeAsync, thread', threaded),
+                              ('writeAsync, processes', processes)):
+            midi = build(args.tracks, args.notes)
+            (elapsed, stall) = loop.run_until_complete(
+                measure(lambda: write(midi)))
+            print('%-22s %10.4f %14.4f' % (name, elapsed, stall))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
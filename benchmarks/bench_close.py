@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_close.py
+# Purpose:     Per-stage timing of MIDIFile.close()
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time each stage of closing a MIDIFile.
+
+The stages of ``MIDIFile.close()`` are run one at a time over all the tracks
+of a file of randomly placed notes (with a sprinkling of other events), and
+the time spent in each is reported: removing duplicates, creating the sorted
+MIDI event list, de-interleaving notes, finding the origin, converting to
+relative times and encoding the MIDI stream.
+
+Usage::
+
+    python benchmarks/bench_close.py [--notes N] [--tracks T]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build(notes, tracks, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for i in range(notes):
+        track = rnd.randrange(tracks)
+        when = rnd.randrange(notes // tracks + 1) / 4.0
+        midi.addNote(track, rnd.randrange(16), rnd.randrange(40, 80), when,
+                     rnd.choice((0.25, 0.5, 1.0, 3.0)), rnd.randrange(128))
+        if i % 20 == 0:
+            midi.addControllerEvent(track, rnd.randrange(16), when, 7,
+                                    rnd.randrange(128))
+        if i % 500 == 0:
+            midi.addTempo(track, when, rnd.choice((60, 90, 120)))
+    return midi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--notes', type=int, default=200000,
+                        help='number of notes')
+    parser.add_argument('--tracks', type=int, default=4,
+                        help='number of tracks')
+    args = parser.parse_args()
+
+    midi = build(args.notes, args.tracks)
+    tracks = midi.tracks
+    timings = []
+
+    def stage(name, func):
+        start = time.time()
+        func()
+        timings.append((name, time.time() - start))
+
+    def remove_duplicates():
+        for track in tracks:
+            track.closed = True
+            if track.remdep:
+                track.removeDuplicates()
+
+    def process():
+        for track in tracks:
+            deinterleave = track.deinterleave
+            track.deinterleave = False
+            try:
+                track.processEventList()
+            finally:
+                track.deinterleave = deinterleave
+
+    def deinterleave():
+        for track in tracks:
+            if track.deinterleave:
+                track.deInterleaveNotes()
+
+    origin = []
+
+    def find_origin():
+        origin.append(midi.findOrigin())
+
+    def adjust():
+        for track in tracks:
+            track.adjustTimeAndOrigin(origin[0], midi.adjust_origin)
+
+    def encode():
+        for track in tracks:
+            track.writeMIDIStream()
+
+    stage('removeDuplicates', remove_duplicates)
+    stage('processEventList', process)
+    stage('deInterleaveNotes', deinterleave)
+    stage('findOrigin', find_origin)
+    stage('adjustTimeAndOrigin', adjust)
+    stage('writeMIDIStream', encode)
+    midi.closed = True
+
+    total = sum(seconds for (name, seconds) in timings)
+    print('%d notes in %d tracks' % (args.notes, args.tracks))
+    print('%-22s %10s %8s' % ('stage', 'seconds', 'share'))
+    for (name, seconds) in timings:
+        print('%-22s %10.4f %7.1f%%' % (name, seconds, 100 * seconds / total))
+    print('%-22s %10.4f' % ('total', total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_deinterleave.py
+# Purpose:     Benchmark for MIDITrack.deInterleaveNotes
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time the de-interleaving of notes on a track with heavy same-pitch overlap.
+
+The notes are long and drawn from a handful of pitches on a few channels, so
+most voices have many notes sounding at once. Reported are the time taken by
+``deInterleaveNotes()`` on the sorted MIDI event list, and, if NumPy is
+installed, the time taken to expand and de-interleave the same notes held in
+the note table (``expandNoteTableSorted(deinterleave=True)``), together with
+the time to expand them without de-interleaving for comparison.
+
+Usage::
+
+    python benchmarks/bench_deinterleave.py [--min N] [--max N]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+import midiutil.MidiFile as MidiFileModule  # noqa: E402
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def overlapping_notes(count, seed=0):
+    rnd = random.Random(seed)
+    channels = [rnd.randrange(2) for _ in range(count)]
+    pitches = [rnd.choice((36, 38, 42, 60)) for _ in range(count)]
+    times = [rnd.randrange(count) / 4.0 for _ in range(count)]
+    durations = [rnd.choice((4.0, 8.0, 16.0)) for _ in range(count)]
+    volumes = [100] * count
+    return channels, pitches, times, durations, volumes
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--min', type=int, default=1000,
+                        help='smallest number of notes')
+    parser.add_argument('--max', type=int, default=1000000,
+                        help='largest number of notes')
+    args = parser.parse_args()
+
+    numpy = MidiFileModule.numpy
+    print('%10s %14s %14s %14s' % ('notes', 'deInterleave', 'table expand',
+                                   'table expand'))
+    print('%10s %14s %14s %14s' % ('', '(events)', '(deinterleave)',
+                                   '(plain)'))
+    count = args.min
+    while count <= args.max:
+        columns = overlapping_notes(count)
+
+        midi = MIDIFile(1, adjust_origin=True)
+        for note in zip(*columns):
+            midi.addNote(0, *note)
+        track = midi.tracks[1]
+        track.deinterleave = False
+        track.processEventList()
+        results = [timed(track.deInterleaveNotes)]
+
+        if numpy is not None:
+            bulk = MIDIFile(1, adjust_origin=True)
+            bulk.addNotes(0, *columns)
+            table = bulk.tracks[1]
+            results.append(timed(table.expandNoteTableSorted, True))
+            results.append(timed(table.expandNoteTableSorted, False))
+        else:
+            results.extend([float('nan')] * 2)
+        print('%10d %14.4f %14.4f %14.4f' % tuple([count] + results))
+        count *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_encode.py
+# Purpose:     Scaling benchmark for MIDITrack.writeEventsToStream
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time the byte encoding of a single, note-dense track at increasing sizes.
+
+Only ``MIDITrack.writeMIDIStream()`` is timed; the event list is built and
+processed beforehand. With a linear encoder the time per event should stay
+roughly constant as the track grows.
+
+Usage::
+
+    python benchmarks/bench_encode.py                # 1k .. 1M events
+    python benchmarks/bench_encode.py --max 10000000 # 1k .. 10M events
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build_track(num_events, seed=0):
+    '''
+    Return a closed, origin-adjusted track holding ``num_events`` MIDI events.
+    '''
+    rnd = random.Random(seed)
+    midi = MIDIFile(1, adjust_origin=True)
+    beat = 0.0
+    for _ in range(num_events // 2):
+        midi.addNote(0, rnd.randrange(16), rnd.randrange(128), beat,
+                     rnd.choice((0.25, 0.5, 1.0)), 100)
+        beat += rnd.choice((0.0, 0.125, 0.25))
+    track = midi.tracks[1]
+    track.closeTrack()
+    track.adjustTimeAndOrigin(midi.findOrigin(), True)
+    return track
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--min', type=int, default=1000,
+                        help='smallest track size, in MIDI events')
+    parser.add_argument('--max', type=int, default=1000000,
+                        help='largest track size, in MIDI events')
+    args = parser.parse_args()
+
+    print('%12s %12s %14s' % ('events', 'seconds', 'usec/event'))
+    size = args.min
+    while size <= args.max:
+        track = build_track(size)
+        start = time.time()
+        track.writeMIDIStream()
+        elapsed = time.time() - start
+        print('%12d %12.4f %14.3f' % (size, elapsed, 1e6 * elapsed / size))
+        del track
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_estimate.py
+# Purpose:     Accuracy and cost of estimating the encoded size of a file
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Compare the estimated size of a file with the size it is written at.
+
+Files of random notes (with controller changes, tempo changes and a few
+meta and system exclusive events) are built with and without running
+status. For each, ``MIDIFile.estimateSize()`` is timed against encoding the
+file with ``toBytes()``, and the error of the estimate is reported. The
+statistics of what the last file's size is made of are printed at the end.
+
+Usage::
+
+    python benchmarks/bench_estimate.py [--notes N] [--tracks T]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build(notes, tracks, running_status, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True, running_status=running_status,
+                    note_off_as_note_on=running_status)
+    for track in range(tracks):
+        midi.addTrackName(track, 0, 'track %d' % track)
+        midi.addSysEx(track, 0, 0x41, b'\x10\x42\x12\x40\x00\x7F\x00\x41')
+    for i in range(notes):
+        track = rnd.randrange(tracks)
+        when = rnd.randrange(notes // tracks + 1) / 4.0
+        midi.addNote(track, track % 16, rnd.randrange(40, 80), when,
+                     rnd.choice((0.25, 0.5, 1.0, 3.0)), rnd.randrange(1, 128))
+        if i % 20 == 0:
+            midi.addControllerEvent(track, track % 16, when, 7,
+                                    rnd.randrange(128))
+        if i % 500 == 0:
+            midi.addTempo(track, when, rnd.choice((60, 90, 120)))
+    return midi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--notes', type=int, default=200000,
+                        help='number of notes')
+    parser.add_argument('--tracks', type=int, default=4,
+                        help='number of tracks')
+    args = parser.parse_args()
+
+    print('%d notes in %d tracks' % (args.notes, args.tracks))
+    print('%-16s %12s %12s %8s %10s %10s' % (
+        '', 'estimate', 'written', 'error', 'estimate', 'encode'))
+    for running_status in (False, True):
+        midi = build(args.notes, args.tracks, running_status)
+        start = time.time()
+        estimate = midi.estimateSize()
+        estimated = time.time() - start
+        start = time.time()
+        size = len(midi.toBytes())
+        encoded = time.time() - start
+        print('%-16s %12d %12d %7.3f%% %9.3fs %9.3fs' % (
+            'running status' if running_status else 'plain', estimate, size,
+            100 * (estimate - size) / size, estimated, encoded))
+
+    (total, tracks) = midi.encodingStats()
+    print()
+    print(total)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_incremental.py
+# Purpose:     Cost of saving a file after each small edit
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time repeated saves of a many-track file, with a note added between saves.
+
+This is the pattern of an interactive editor that saves after every edit.
+After the first save only the track that a note was added to is closed and
+encoded again; for comparison the same edits are saved with every track
+reopened first, which is what each save cost before tracks kept their
+encoded data. Reported is the mean time per save.
+
+Usage::
+
+    python benchmarks/bench_incremental.py [--tracks T] [--notes N]
+                                           [--saves S]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build(tracks, notes, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for track in range(tracks):
+        for i in range(notes):
+            midi.addNote(track, track % 16, rnd.randrange(40, 90),
+                         rnd.randrange(4 * notes) / 4.0,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(1, 128))
+    return midi
+
+
+def edit_and_save(args, reopen_all):
+    rnd = random.Random(1)
+    midi = build(args.tracks, args.notes)
+    midi.writeFile(BytesIO())
+    elapsed = 0.0
+    for save in range(args.saves):
+        midi.addNote(rnd.randrange(args.tracks), 0, rnd.randrange(40, 90),
+                     rnd.randrange(4 * args.notes) / 4.0, 1, 100)
+        start = time.time()
+        if reopen_all:
+            for track in midi.tracks:
+                track.reopen()
+        midi.writeFile(BytesIO())
+        elapsed += time.time() - start
+    return elapsed / args.saves
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=16,
+                        help='number of tracks')
+    parser.add_argument('--notes', type=int, default=5000,
+                        help='number of notes per track')
+    parser.add_argument('--saves', type=int, default=20,
+                        help='number of edits and saves')
+    args = parser.parse_args()
+
+    print('%d tracks of %d notes, %d saves' % (args.tracks, args.notes,
+                                               args.saves))
+    incremental = edit_and_save(args, False)
+    full = edit_and_save(args, True)
+    print('%-26s %10.4f s' % ('changed track only', incremental))
+    print('%-26s %10.4f s' % ('every track', full))
+    print('%-26s %10.1fx' % ('speed-up', full / incremental))
+
+
+if __name__ == '__main__':
+    main()
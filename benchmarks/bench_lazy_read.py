@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_lazy_read.py
+# Purpose:     Cost of reading one track of a many-track file
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time reading a single track of a many-track file.
+
+A file with many tracks of random notes is written to a temporary file. It is
+then opened with ``MIDIFileReader.open()``, which indexes only the chunks, and
+one track is decoded; for comparison every track is decoded, and the whole
+file is loaded with ``MIDIFile.read()``. Reported are the times taken and the
+memory held by the decoded events (as estimated by the reader).
+
+Usage::
+
+    python benchmarks/bench_lazy_read.py [--tracks T] [--notes N]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile, MIDIFileReader  # noqa: E402
+
+
+def build(tracks, notes, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for track in range(tracks):
+        for i in range(notes):
+            midi.addNote(track, track % 16, rnd.randrange(40, 90),
+                         rnd.randrange(4 * notes) / 4.0,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(1, 128))
+    return midi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=32,
+                        help='number of tracks')
+    parser.add_argument('--notes', type=int, default=20000,
+                        help='number of notes per track')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.mid')
+    try:
+        with os.fdopen(handle, 'wb') as output_file:
+            build(args.tracks, args.notes).writeFile(output_file)
+        print('%d tracks of %d notes, %.1f MB' % (
+            args.tracks, args.notes, os.path.getsize(path) / 1e6))
+        print('%-22s %10s %12s' % ('', 'seconds', 'cached (MB)'))
+
+        def run(name, tracks):
+            start = time.time()
+            with open(path, 'rb') as input_file:
+                with MIDIFileReader.open(input_file, cacheSize=None) as reader:
+                    for track in tracks(reader):
+                        reader[track]
+                    cached = reader.cachedSize
+            print('%-22s %10.3f %12.1f' % (name, time.time() - start,
+                                           cached / 1e6))
+
+        run('index only', lambda reader: [])
+        run('one track', lambda reader: [len(reader) // 2])
+        run('every track', lambda reader: range(len(reader)))
+
+        start = time.time()
+        with open(path, 'rb') as input_file:
+            MIDIFile.read(input_file)
+        print('%-22s %10.3f' % ('MIDIFile.read', time.time() - start))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_memory.py
+# Purpose:     Memory used per note by the event classes
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Report the memory used per note of a large, single track score.
+
+Two figures are reported, measured with ``tracemalloc``: the memory held by
+the track's event list once the notes have been added (the ``Note`` objects
+for ``addNote()``, the note table for ``addNotes()``), and the additional
+memory held by the MIDI event list once ``processEventList()`` has run (two
+MIDI events per note).
+
+Usage::
+
+    python benchmarks/bench_memory.py [--notes N]
+'''
+
+from __future__ import division, print_function
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def measure(count, bulk):
+    '''
+    Return the bytes per note held after adding the notes and after
+    processing them into MIDI events.
+    '''
+    channels = [i % 16 for i in range(count)]
+    pitches = [i % 128 for i in range(count)]
+    times = [i * 0.25 for i in range(count)]
+
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    midi = MIDIFile(1, adjust_origin=True)
+    if bulk:
+        midi.addNotes(0, channels, pitches, times, 1, 100)
+    else:
+        for note in zip(channels, pitches, times):
+            midi.addNote(0, note[0], note[1], note[2], 1, 100)
+    gc.collect()
+    added = tracemalloc.get_traced_memory()[0]
+    track = midi.tracks[1]
+    track.deinterleave = False
+    track.processEventList()
+    gc.collect()
+    processed = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (added - start) / count, (processed - added) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--notes', type=int, default=1000000,
+                        help='number of notes in the score')
+    args = parser.parse_args()
+
+    print('%-10s %16s %16s' % ('', 'events', 'MIDI events'))
+    print('%-10s %16s %16s' % ('', '(bytes/note)', '(bytes/note)'))
+    for (name, bulk) in (('addNote', False), ('addNotes', True)):
+        print('%-10s %16.1f %16.1f' % ((name,) + measure(args.notes, bulk)))
+
+
+if __name__ == '__main__':
+    main()
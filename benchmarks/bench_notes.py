@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_notes.py
+# Purpose:     Benchmark for bulk note insertion and expansion
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Compare notes added one at a time with ``addNote()`` against notes added in
+bulk with ``addNotes()``.
+
+For each size the insertion time is reported, followed by the time taken by
+``MIDITrack.processEventList()`` to turn the notes into a sorted list of
+MIDI events -- for ``addNotes()`` both with NumPy (if it is installed) and
+with the pure Python fallback.
+
+Usage::
+
+    python benchmarks/bench_notes.py [--max N]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+import midiutil.MidiFile as MidiFileModule  # noqa: E402
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def note_columns(count, seed=0):
+    rnd = random.Random(seed)
+    channels = [rnd.randrange(16) for _ in range(count)]
+    pitches = [rnd.randrange(128) for _ in range(count)]
+    times = [rnd.randrange(4 * count) / 4.0 for _ in range(count)]
+    durations = [rnd.choice((0.25, 0.5, 1.0)) for _ in range(count)]
+    volumes = [rnd.randrange(128) for _ in range(count)]
+    return channels, pitches, times, durations, volumes
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def process(midi):
+    track = midi.tracks[1]
+    track.deinterleave = False
+    track.processEventList()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--min', type=int, default=1000,
+                        help='smallest number of notes')
+    parser.add_argument('--max', type=int, default=1000000,
+                        help='largest number of notes')
+    args = parser.parse_args()
+
+    numpy = MidiFileModule.numpy
+    print('%10s %10s %10s %12s %12s %12s' % (
+        'notes', 'addNote', 'addNotes', 'process', 'process', 'process'))
+    print('%10s %10s %10s %12s %12s %12s' % (
+        '', '', '', '(addNote)', '(numpy)', '(python)'))
+    count = args.min
+    while count <= args.max:
+        columns = note_columns(count)
+
+        single = MIDIFile(1, adjust_origin=True)
+
+        def add_single():
+            for note in zip(*columns):
+                single.addNote(0, *note)
+
+        bulk = MIDIFile(1, adjust_origin=True)
+        bulk_python = MIDIFile(1, adjust_origin=True)
+        bulk_python.addNotes(0, *columns)
+        results = [timed(add_single), timed(bulk.addNotes, 0, *columns),
+                   timed(process, single)]
+        results.append(timed(process, bulk) if numpy is not None
+                       else float('nan'))
+        MidiFileModule.numpy = None
+        try:
+            results.append(timed(process, bulk_python))
+        finally:
+            MidiFileModule.numpy = numpy
+        print('%10d %10.4f %10.4f %12.4f %12.4f %12.4f' % tuple([count] +
+                                                             results))
+        count *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_parallel.py
+# Purpose:     Scaling of MIDIFile.close() with the number of workers
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time ``MIDIFile.close()`` on a many-track file with 1, 2, 4 and 8 workers.
+
+Each track holds randomly placed notes and a few controller events. With one
+worker the tracks are closed one after the other in the calling process; with
+more they are closed in a process (or thread) pool. The time includes
+creating the pool and moving the tracks to and from the workers, and the
+speed-up over a single worker is reported alongside it.
+
+Usage::
+
+    python benchmarks/bench_parallel.py [--tracks T] [--notes N]
+                                        [--pool process|thread]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build(tracks, notes, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for track in range(tracks):
+        for i in range(notes):
+            when = rnd.randrange(4 * notes) / 4.0
+            midi.addNote(track, track % 16, rnd.randrange(40, 90), when,
+                         rnd.choice((0.25, 0.5, 1.0, 2.0)), rnd.randrange(128))
+            if i % 50 == 0:
+                midi.addControllerEvent(track, track % 16, when, 7,
+                                        rnd.randrange(128))
+    return midi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=64,
+                        help='number of tracks')
+    parser.add_argument('--notes', type=int, default=5000,
+                        help='number of notes per track')
+    parser.add_argument('--pool', choices=('process', 'thread'),
+                        default='process', help='kind of worker')
+    args = parser.parse_args()
+
+    print('%d tracks of %d notes, %s pool, %s CPUs' % (
+        args.tracks, args.notes, args.pool, os.cpu_count()))
+    print('%8s %10s %8s' % ('workers', 'seconds', 'speed-up'))
+    single = None
+    for workers in (1, 2, 4, 8):
+        midi = build(args.tracks, args.notes)
+        start = time.time()
+        midi.close(workers=workers, pool=args.pool)
+        elapsed = time.time() - start
+        if single is None:
+            single = elapsed
+        print('%8d %10.3f %8.2f' % (workers, elapsed, single / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_pass_through.py
+# Purpose:     Cost of re-writing a loaded file after a small edit
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time writing a loaded many-track file after changing one track.
+
+A file with many tracks of random notes is written and read back with
+``MIDIFile.fromBytes()``. A note is added to one track and the file is
+written again, once with the untouched tracks copied as they were read and
+once with every track encoded again (the data read being dropped first).
+
+Usage::
+
+    python benchmarks/bench_pass_through.py [--tracks T] [--notes N]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build(tracks, notes, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=False)
+    for track in range(tracks):
+        midi.addProgramChange(track, track % 16, 0, track % 128)
+        for i in range(notes):
+            midi.addNote(track, track % 16, rnd.randrange(40, 90),
+                         rnd.randrange(4 * notes) / 4.0,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(1, 128))
+    output = BytesIO()
+    midi.writeFile(output)
+    return output.getvalue()
+
+
+def edit_and_write(data, pass_through):
+    midi = MIDIFile.fromBytes(data)
+    if not pass_through:
+        for track in midi.tracks:
+            track.sourceData = None
+    midi.addNote(0, 0, 60, 0, 1, 100)
+    start = time.time()
+    output = BytesIO()
+    midi.writeFile(output)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=200,
+                        help='number of tracks')
+    parser.add_argument('--notes', type=int, default=2000,
+                        help='number of notes per track')
+    args = parser.parse_args()
+
+    data = build(args.tracks, args.notes)
+    print('%d tracks of %d notes, %.1f MB' % (args.tracks, args.notes,
+                                             len(data) / 1e6))
+    copied = edit_and_write(data, True)
+    encoded = edit_and_write(data, False)
+    print('%-28s %10.3f s' % ('untouched tracks copied', copied))
+    print('%-28s %10.3f s' % ('every track encoded', encoded))
+    print('%-28s %10.1fx' % ('speed-up', encoded / copied))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_producers.py
+# Purpose:     Cost of adding events from several threads through producers
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time adding notes from several threads, through producers and under a lock.
+
+The threads add their notes to two tracks, which they share. Through producers the threads
+only record their calls, which are made on the file when it is written; for
+comparison the same notes are added directly to the file by threads that
+share one lock, and by a single thread. Reported are the times taken to add
+the notes and to write the file, and whether the files written are the same
+on every run (with a shared lock they depend on how the threads ran).
+
+Usage::
+
+    python benchmarks/bench_producers.py [--threads T] [--notes N]
+                                         [--runs R]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def generate(target, part, notes, lock=None):
+    rnd = random.Random(part)
+    for i in range(notes):
+        if lock is not None:
+            lock.acquire()
+        try:
+            # Notes on the beat, so that the order of insertion matters.
+            target.addNote(part % 2, part % 16, rnd.randrange(40, 90),
+                           rnd.randrange(notes // 4 + 1), 1, 100)
+            target.addTempo(0, rnd.randrange(notes // 4 + 1), 60 + part)
+        finally:
+            if lock is not None:
+                lock.release()
+
+
+def run(args, mode):
+    midi = MIDIFile(2, adjust_origin=True)
+    start = time.time()
+    if mode == 'single thread':
+        for part in range(args.threads):
+            generate(midi, part, args.notes)
+    else:
+        lock = threading.Lock()
+        threads = []
+        for part in range(args.threads):
+            if mode == 'producers':
+                target = (midi.producer(), None)
+            else:
+                target = (midi, lock)
+            threads.append(threading.Thread(
+                target=generate, args=(target[0], part, args.notes,
+                                       target[1])))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    added = time.time()
+    output = BytesIO()
+    midi.writeFile(output)
+    return (added - start, time.time() - added, output.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--threads', type=int, default=8,
+                        help='number of threads')
+    parser.add_argument('--notes', type=int, default=20000,
+                        help='number of notes added by each thread')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='number of times each mode is run')
+    args = parser.parse_args()
+
+    print('%d threads of %d notes, %d runs' % (args.threads, args.notes,
+                                               args.runs))
+    print('%-16s %10s %10s %12s' % ('mode', 'add', 'write', 'same output'))
+    for mode in ('single thread', 'producers', 'shared lock'):
+        results = [run(args, mode) for i in range(args.runs)]
+        print('%-16s %10.4f %10.4f %12s' % (
+            mode, min(result[0] for result in results),
+            min(result[1] for result in results),
+            len(set(result[2] for result in results)) == 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_read.py
+# Purpose:     Throughput of the MIDI file reader
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time the reading of a corpus of MIDI files.
+
+A handful of multi-track files of random notes and controller events is
+written and copied into a temporary directory until the corpus reaches the
+requested size. Each file is then memory-mapped and read in three ways:
+
+* scanned with ``readChunks()`` and ``readTrackEvents()``, which index
+  the bytes of the file in place;
+* scanned by a reference parser that reads every byte with
+  ``struct.unpack_from()``, as a baseline for the above;
+* loaded in full with ``MIDIFile.read()``.
+
+Reported for each are the time taken and the throughput in megabytes and
+events per second.
+
+Usage::
+
+    python benchmarks/bench_read.py [--megabytes M] [--distinct D]
+'''
+
+from __future__ import division, print_function
+import argparse
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import (MIDIFile, readChunks,  # noqa: E402
+                               readTrackEvents)
+
+
+def build(seed, tracks=4, notes=20000):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    midi.addTempo(0, 0, 120)
+    for track in range(tracks):
+        midi.addTrackName(track, 0, 'track %d' % track)
+        for i in range(notes):
+            when = rnd.randrange(4 * notes) / 4.0
+            midi.addNote(track, track % 16, rnd.randrange(40, 90), when,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(1, 128))
+            if i % 20 == 0:
+                midi.addControllerEvent(track, track % 16, when, 7,
+                                        rnd.randrange(128))
+    return midi
+
+
+def make_corpus(directory, megabytes, distinct):
+    sources = []
+    for seed in range(distinct):
+        path = os.path.join(directory, 'source%d.mid' % seed)
+        with open(path, 'wb') as output_file:
+            build(seed).writeFile(output_file)
+        sources.append(path)
+    paths = list(sources)
+    total = sum(os.path.getsize(path) for path in paths)
+    while total < megabytes * 1e6:
+        source = sources[len(paths) % distinct]
+        path = os.path.join(directory, 'copy%d.mid' % len(paths))
+        shutil.copyfile(source, path)
+        paths.append(path)
+        total += os.path.getsize(path)
+    return paths, total
+
+
+def scan(data):
+    count = 0
+    for (start, end) in readChunks(data)[2]:
+        for event in readTrackEvents(data, start, end):
+            count += 1
+    return count
+
+
+_unpack_byte = struct.Struct('>B').unpack_from
+_unpack_length = struct.Struct('>L').unpack_from
+
+
+def unpack_scan(data):
+    '''
+    Count the events in a file, reading each byte with struct.unpack_from.
+    '''
+    def var_length(offset):
+        value = 0
+        while True:
+            byte = _unpack_byte(data, offset)[0]
+            offset += 1
+            value = (value << 7) | (byte & 0x7F)
+            if byte < 0x80:
+                return value, offset
+
+    count = 0
+    offset = 8 + _unpack_length(data, 4)[0]
+    while offset + 8 <= len(data):
+        end = offset + 8 + _unpack_length(data, offset + 4)[0]
+        offset += 8
+        status = None
+        while offset < end:
+            delta, offset = var_length(offset)
+            byte = _unpack_byte(data, offset)[0]
+            if byte & 0x80:
+                offset += 1
+            else:
+                byte = status
+            if byte < 0xF0:
+                status = byte
+                offset += 1 if byte & 0xE0 == 0xC0 else 2
+            elif byte == 0xFF:
+                status = None
+                length, offset = var_length(offset + 1)
+                offset += length
+            else:
+                status = None
+                length, offset = var_length(offset)
+                offset += length
+            count += 1
+    return count
+
+
+def load(data):
+    with open(data, 'rb') as input_file:
+        MIDIFile.read(input_file)
+    return 0
+
+
+def run(paths, func, mapped=True):
+    events = 0
+    start = time.time()
+    for path in paths:
+        if not mapped:
+            events += func(path)
+            continue
+        with open(path, 'rb') as input_file:
+            data = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                events += func(data)
+            finally:
+                data.close()
+    return time.time() - start, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--megabytes', type=float, default=100,
+                        help='size of the corpus')
+    parser.add_argument('--distinct', type=int, default=8,
+                        help='number of distinct files in the corpus')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths, total = make_corpus(directory, args.megabytes, args.distinct)
+        print('%d files, %.1f MB' % (len(paths), total / 1e6))
+        print('%-22s %10s %10s %14s' % ('', 'seconds', 'MB/s', 'events/s'))
+        events = None
+        for (name, func, mapped) in (('readTrackEvents', scan, True),
+                                     ('struct.unpack_from', unpack_scan, True),
+                                     ('MIDIFile.read', load, False)):
+            elapsed, count = run(paths, func, mapped)
+            events = events or count
+            print('%-22s %10.2f %10.2f %14.0f' % (
+                name, elapsed, total / 1e6 / elapsed, events / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_running_status.py
+# Purpose:     File size with and without running status
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Compare the size of files written with and without running status.
+
+Three dense note corpora are written: block chords, fast arpeggios on a
+single channel and a sixteenth-note drum grid. Each is written as usual,
+with ``running_status=True`` and with ``running_status=True`` and
+``note_off_as_note_on=True``, and the size of each file is reported along
+with its reduction over the usual encoding.
+
+Usage::
+
+    python benchmarks/bench_running_status.py [--bars B]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def chords(midi, bars, rnd):
+    for beat in range(4 * bars):
+        root = rnd.randrange(48, 60)
+        for interval in (0, 4, 7, 11):
+            midi.addNote(0, 0, root + interval, beat, 1, 90)
+
+
+def arpeggios(midi, bars, rnd):
+    for step in range(16 * bars):
+        midi.addNote(0, 0, rnd.choice((60, 64, 67, 72)), step / 4.0, 0.25,
+                     rnd.randrange(60, 110))
+
+
+def drums(midi, bars, rnd):
+    for step in range(16 * bars):
+        for (pitch, chance) in ((36, 0.3), (38, 0.2), (42, 0.9), (46, 0.1)):
+            if rnd.random() < chance:
+                midi.addNote(0, 9, pitch, step / 4.0, 0.25,
+                             rnd.randrange(80, 127))
+
+
+def size(corpus, bars, **options):
+    midi = MIDIFile(1, adjust_origin=True, **options)
+    corpus(midi, bars, random.Random(0))
+    output = BytesIO()
+    midi.writeFile(output)
+    return len(output.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--bars', type=int, default=1000,
+                        help='number of bars in each corpus')
+    args = parser.parse_args()
+
+    print('%-10s %10s %18s %18s' % ('corpus', 'plain', 'running status',
+                                     '+ note off as on'))
+    for (name, corpus) in (('chords', chords), ('arpeggios', arpeggios),
+                           ('drums', drums)):
+        plain = size(corpus, args.bars)
+        running = size(corpus, args.bars, running_status=True)
+        noteOn = size(corpus, args.bars, running_status=True,
+                      note_off_as_note_on=True)
+        print('%-10s %10d %10d (%4.1f%%) %10d (%4.1f%%)' % (
+            name, plain, running, 100 * (1 - running / plain),
+            noteOn, 100 * (1 - noteOn / plain)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_scan.py
+# Purpose:     Throughput of the metadata scan over a directory of MIDI files
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time scanning a directory of MIDI files for their metadata.
+
+A handful of files, each with a tempo map, track names and random notes, is
+written and copied into a temporary directory until the corpus reaches the
+requested size. The directory is then scanned with ``scanDirectory()``, in
+the calling process and with a pool of worker processes, and for comparison
+every track of every file is decoded with ``readTrackEvents()``. Reported
+are the time taken and the throughput in files and megabytes per second.
+
+Usage::
+
+    python benchmarks/bench_scan.py [--megabytes M] [--workers W]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import (MIDIFile, MIDIFileReader,  # noqa: E402
+                               scanDirectory)
+
+
+def build(seed, tracks=4, notes=2000):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for beat in range(0, notes, 64):
+        midi.addTempo(0, beat, rnd.choice((90, 120, 140)))
+    midi.addTimeSignature(0, 0, 4, 2, 24)
+    for track in range(tracks):
+        midi.addTrackName(track, 0, 'track %d' % track)
+        for i in range(notes):
+            when = rnd.randrange(4 * notes) / 4.0
+            midi.addNote(track, track % 16, rnd.randrange(40, 90), when,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(1, 128))
+            if i % 20 == 0:
+                midi.addControllerEvent(track, track % 16, when, 7,
+                                        rnd.randrange(128))
+    return midi
+
+
+def make_corpus(directory, megabytes, distinct):
+    sources = []
+    for seed in range(distinct):
+        path = os.path.join(directory, 'source%d.mid' % seed)
+        with open(path, 'wb') as output_file:
+            build(seed).writeFile(output_file)
+        sources.append(path)
+    paths = list(sources)
+    total = sum(os.path.getsize(path) for path in paths)
+    while total < megabytes * 1e6:
+        source = sources[len(paths) % distinct]
+        path = os.path.join(directory, 'copy%d.mid' % len(paths))
+        shutil.copyfile(source, path)
+        paths.append(path)
+        total += os.path.getsize(path)
+    return paths, total
+
+
+def decode_all(directory):
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), 'rb') as input_file:
+            with MIDIFileReader.open(input_file, cacheSize=0) as reader:
+                for track in range(len(reader)):
+                    reader[track]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--megabytes', type=float, default=100,
+                        help='size of the corpus')
+    parser.add_argument('--distinct', type=int, default=16,
+                        help='number of distinct files in the corpus')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths, total = make_corpus(directory, args.megabytes, args.distinct)
+        print('%d files, %.1f MB, %d CPUs' % (len(paths), total / 1e6,
+                                              os.cpu_count()))
+        print('%-28s %10s %10s %10s' % ('', 'seconds', 'files/s', 'MB/s'))
+        for (name, scan) in (
+                ('scanDirectory', lambda: list(scanDirectory(directory))),
+                ('scanDirectory, %d workers' % args.workers,
+                 lambda: list(scanDirectory(directory, workers=args.workers))),
+                ('decode every track', lambda: decode_all(directory))):
+            start = time.time()
+            scan()
+            elapsed = time.time() - start
+            print('%-28s %10.2f %10.1f %10.2f' % (
+                name, elapsed, len(paths) / elapsed, total / 1e6 / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_stream.py
+# Purpose:     Peak memory of writeFile, with and without streaming
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Compare the peak memory used by ``writeFile()`` with that used by
+``writeFile(stream=True)``.
+
+A multi-track file is written to a temporary file (and, for the streaming
+mode, to an unseekable pipe-like object as well). Reported for each is the
+peak memory allocated during the write over and above what the file held
+before it (measured with ``tracemalloc``), and the time taken.
+
+Usage::
+
+    python benchmarks/bench_stream.py [--tracks T] [--notes N]
+'''
+
+from __future__ import division, print_function
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+class Unseekable(object):
+    '''
+    A write-only file that discards what is written to it.
+    '''
+    def __init__(self):
+        self.length = 0
+
+    def write(self, data):
+        self.length += len(data)
+
+    def seekable(self):
+        return False
+
+
+def build(tracks, notes, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for track in range(tracks):
+        for i in range(notes):
+            midi.addNote(track, track % 16, rnd.randrange(40, 90),
+                         rnd.randrange(4 * notes) / 4.0,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(128))
+    return midi
+
+
+def measure(midi, write):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    write(midi)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - before) / 1e6, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=16,
+                        help='number of tracks')
+    parser.add_argument('--notes', type=int, default=20000,
+                        help='number of notes per track')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.mid')
+    os.close(handle)
+
+    def to_file(**kwargs):
+        def write(midi):
+            with open(path, 'wb') as output_file:
+                midi.writeFile(output_file, **kwargs)
+        return write
+
+    def to_pipe(midi):
+        midi.writeFile(Unseekable(), stream=True)
+
+    print('%d tracks of %d notes' % (args.tracks, args.notes))
+    print('%-24s %12s %10s' % ('', 'peak (MB)', 'seconds'))
+    try:
+        for (name, write) in (('writeFile', to_file()),
+                              ('stream, seekable file', to_file(stream=True)),
+                              ('stream, unseekable', to_pipe)):
+            peak, elapsed = measure(build(args.tracks, args.notes), write)
+            print('%-24s %12.1f %10.3f' % (name, peak, elapsed))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
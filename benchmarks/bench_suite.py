@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_suite.py
+# Purpose:     Per-phase timings of building and writing synthetic scores,
+#              with JSON results and a check against a baseline
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time each phase of building, closing and writing a range of synthetic scores.
+
+Scores of several shapes are generated at each size (the number of events
+added): note-dense (one track of overlapping notes), controller-dense (mostly
+controller changes), tempo-heavy (a tempo change for every note) and
+many-track (notes spread over many tracks). For each, the phases of building
+and writing a file are timed separately: adding the events, removing
+duplicates, creating the sorted MIDI event list, de-interleaving notes,
+finding the origin and converting to relative times, encoding the MIDI
+stream, and writing the file. Each phase is timed ``--repeat`` times, on a
+newly built score each time, and the fastest time is kept.
+
+The results can be written to a JSON file with ``--output``. Given the
+results of an earlier run with ``--baseline``, every phase that has become
+slower by more than ``--threshold`` (a fraction, 0.25 by default) is
+reported, and the script exits with status 1 if there are any. Phases
+faster than ``--min-time`` in the baseline are not compared, as their
+timings are mostly noise.
+
+Sizes may be given with a ``k`` or ``M`` suffix. Scores of 10M events need
+several gigabytes of memory, so they are not part of the default run.
+
+Usage::
+
+    python benchmarks/bench_suite.py [--sizes 1k,10k,100k,1M]
+                                     [--shapes notes,controllers,tempo,tracks]
+                                     [--repeat R] [--output results.json]
+                                     [--baseline baseline.json]
+                                     [--threshold 0.25] [--min-time 0.005]
+'''
+
+from __future__ import division, print_function
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil import MidiFile  # noqa: E402
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+PHASES = ('build', 'removeDuplicates', 'processEventList',
+          'deInterleaveNotes', 'adjustTimeAndOrigin', 'writeMIDIStream',
+          'writeFile')
+
+
+def addNotes(midi, rnd, tracks, count, spread):
+    for i in range(count):
+        midi.addNote(rnd.randrange(tracks), rnd.randrange(16),
+                     rnd.randrange(40, 80), rnd.randrange(spread) / 4.0,
+                     rnd.choice((0.25, 0.5, 1.0, 3.0)), rnd.randrange(1, 128))
+
+
+def buildNotes(midi, rnd, events):
+    addNotes(midi, rnd, 1, events, events // 4 + 1)
+
+
+def buildControllers(midi, rnd, events):
+    notes = events // 10
+    addNotes(midi, rnd, 1, notes, notes + 1)
+    for i in range(events - notes):
+        midi.addControllerEvent(0, rnd.randrange(16),
+                                rnd.randrange(events) / 16.0,
+                                rnd.choice((1, 7, 10, 11, 64)),
+                                rnd.randrange(128))
+
+
+def buildTempo(midi, rnd, events):
+    notes = events // 2
+    addNotes(midi, rnd, 1, notes, notes // 4 + 1)
+    for i in range(events - notes):
+        midi.addTempo(0, rnd.randrange(notes + 1) / 4.0,
+                      rnd.randrange(40, 240))
+
+
+def buildTracks(midi, rnd, events):
+    addNotes(midi, rnd, len(midi.tracks) - 1, events, events // 64 + 1)
+
+
+SHAPES = (('notes', 1, buildNotes),
+          ('controllers', 1, buildControllers),
+          ('tempo', 1, buildTempo),
+          ('tracks', 64, buildTracks))
+
+
+def runPhases(builder, tracks, events, seed=0):
+    '''
+    Build and write one score, returning the time taken by each phase.
+    '''
+    timings = {}
+
+    def phase(name, func):
+        start = time.time()
+        func()
+        timings[name] = time.time() - start
+
+    midi = MIDIFile(tracks, adjust_origin=True)
+    phase('build', lambda: builder(midi, random.Random(seed), events))
+
+    def removeDuplicates():
+        for track in midi.tracks:
+            if track.remdep:
+                track.removeDuplicates()
+
+    def process():
+        for track in midi.tracks:
+            deinterleave = track.deinterleave
+            track.deinterleave = False
+            try:
+                track.processEventList()
+            finally:
+                track.deinterleave = deinterleave
+
+    def deinterleave():
+        for track in midi.tracks:
+            if track.deinterleave:
+                track.deInterleaveNotes()
+
+    def adjust():
+        origin = midi.findOrigin()
+        for track in midi.tracks:
+            track.adjustTimeAndOrigin(origin, midi.adjust_origin)
+
+    def encode():
+        for track in midi.tracks:
+            track.writeMIDIStream()
+
+    def write():
+        output = BytesIO()
+        midi.header.writeFile(output)
+        for track in midi.tracks:
+            track.writeTrack(output)
+
+    phase('removeDuplicates', removeDuplicates)
+    phase('processEventList', process)
+    phase('deInterleaveNotes', deinterleave)
+    phase('adjustTimeAndOrigin', adjust)
+    phase('writeMIDIStream', encode)
+    phase('writeFile', write)
+    return timings
+
+
+def parseSize(text):
+    text = text.strip()
+    scale = {'k': 1000, 'M': 1000000}.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    return int(float(text) * scale)
+
+
+def compare(results, baseline, threshold, min_time):
+    '''
+    Return (key, phase, baseline time, time) for each phase that is slower
+    than in the baseline by more than the threshold.
+    '''
+    regressions = []
+    for (key, timings) in sorted(results.items()):
+        for phase in PHASES:
+            before = baseline.get(key, {}).get(phase)
+            if before is None or before < min_time:
+                continue
+            if timings[phase] > before * (1 + threshold):
+                regressions.append((key, phase, before, timings[phase]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', default='1k,10k,100k,1M',
+                        help='comma separated numbers of events')
+    parser.add_argument('--shapes', default=','.join(
+        name for (name, tracks, builder) in SHAPES),
+        help='comma separated shapes of score')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of times each score is timed')
+    parser.add_argument('--output', help='file to write the results to')
+    parser.add_argument('--baseline', help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slow-down reported as a regression')
+    parser.add_argument('--min-time', type=float, default=0.005,
+                        help='shortest baseline time compared (seconds)')
+    args = parser.parse_args()
+
+    sizes = [parseSize(size) for size in args.sizes.split(',')]
+    shapes = [shape for shape in SHAPES
+              if shape[0] in args.shapes.split(',')]
+
+    print('%-18s' % 'score' + ''.join('%13s' % phase[:12] for phase in PHASES))
+    results = {}
+    for (name, tracks, builder) in shapes:
+        for events in sizes:
+            key = '%s/%d' % (name, events)
+            best = {}
+            for attempt in range(max(args.repeat, 1)):
+                for (phase, seconds) in runPhases(builder, tracks,
+                                                   events).items():
+                    best[phase] = min(best.get(phase, seconds), seconds)
+            results[key] = best
+            print('%-18s' % key + ''.join('%13.4f' % best[phase]
+                                          for phase in PHASES))
+            sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'numpy': (MidiFile.numpy.__version__
+                                 if MidiFile.numpy is not None else None),
+                       'results': results},
+                      output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as input_file:
+            baseline = json.load(input_file)['results']
+        regressions = compare(results, baseline, args.threshold,
+                              args.min_time)
+        for (key, phase, before, after) in regressions:
+            print('regression: %s %s %.4f s -> %.4f s (%+.0f%%)' % (
+                key, phase, before, after, 100 * (after / before - 1)))
+        if regressions:
+            sys.exit(1)
+        print('no regressions beyond %.0f%% of %s' % (100 * args.threshold,
+                                                      args.baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_to_bytes.py
+# Purpose:     Cost of getting an encoded file out, in memory or to disk
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Time producing the contents of an already encoded many-track file.
+
+A file with many tracks of random notes is closed once, so that what is
+timed is only the output of its encoded chunks. In memory, ``toBytes()`` is
+compared with writing to a ``BytesIO`` and taking its value; on disk, a
+vectored ``writeFile()`` is compared with the usual one. Reported are the
+mean times and, for the in-memory output, the peak memory allocated on top
+of the encoded file (on Python 3).
+
+Usage::
+
+    python benchmarks/bench_to_bytes.py [--tracks T] [--notes N]
+                                        [--repeat R]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402
+
+
+def build(tracks, notes, seed=0):
+    rnd = random.Random(seed)
+    midi = MIDIFile(tracks, adjust_origin=True)
+    for track in range(tracks):
+        for i in range(notes):
+            midi.addNote(track, track % 16, rnd.randrange(40, 90),
+                         rnd.randrange(4 * notes) / 4.0,
+                         rnd.choice((0.25, 0.5, 1.0)), rnd.randrange(1, 128))
+    return midi
+
+
+def through_bytesio(midi):
+    output = BytesIO()
+    midi.writeFile(output)
+    return output.getvalue()
+
+
+def measure(function, repeat):
+    start = time.time()
+    for i in range(repeat):
+        function()
+    elapsed = (time.time() - start) / repeat
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=64,
+                        help='number of tracks')
+    parser.add_argument('--notes', type=int, default=5000,
+                        help='number of notes per track')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='number of times each output is made')
+    args = parser.parse_args()
+
+    midi = build(args.tracks, args.notes)
+    data = midi.toBytes()
+    assert bytes(data) == through_bytesio(midi)
+    print('%d tracks of %d notes, %.1f MB' % (args.tracks, args.notes,
+                                             len(data) / 1e6))
+    print('%-24s %10s %12s' % ('', 'seconds', 'peak (MB)'))
+    for (name, function) in (('BytesIO', lambda: through_bytesio(midi)),
+                             ('toBytes', midi.toBytes)):
+        elapsed, peak = measure(function, args.repeat)
+        print('%-24s %10.4f %12s' % (name, elapsed, '-' if peak is None
+                                     else '%.1f' % (peak / 1e6)))
+
+    handle, path = tempfile.mkstemp(suffix='.mid')
+    os.close(handle)
+    try:
+        for (name, vectored) in (('writeFile', False),
+                                 ('writeFile, vectored', True)):
+            def write():
+                with open(path, 'wb') as output_file:
+                    midi.writeFile(output_file, vectored=vectored)
+            elapsed, peak = measure(write, args.repeat)
+            print('%-24s %10.4f' % (name, elapsed))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -----------------------------------------------------------------------------
+# Name:        bench_vlq.py
+# Purpose:     Micro-benchmarks for variable length quantity coding
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Micro-benchmarks for the variable length quantity (VLQ) helpers.
+
+Values are drawn from a distribution resembling real delta times: mostly
+below 128, some two byte values and a few larger ones. Encoding compares
+``writeVarLength()`` (list output) with the table driven ``encodeVarLength()``
+(``bytes`` output). Decoding compares a loop of ``readVarLength()`` calls with
+a single ``readVarLengths()`` call over the same run.
+
+Usage::
+
+    python benchmarks/bench_vlq.py [--count N] [--repeat R]
+'''
+
+from __future__ import division, print_function
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from midiutil.MidiFile import (writeVarLength, encodeVarLength,  # noqa: E402
+                               readVarLength, readVarLengths)
+
+
+def sample_values(count, seed=0):
+    rnd = random.Random(seed)
+    values = []
+    for _ in range(count):
+        roll = rnd.random()
+        if roll < 0.7:
+            values.append(rnd.randrange(0x80))
+        elif roll < 0.97:
+            values.append(rnd.randrange(0x80, 0x4000))
+        else:
+            values.append(rnd.randrange(0x4000, 0x0FFFFFFF))
+    return values
+
+
+def encode_list(values):
+    for value in values:
+        writeVarLength(value)
+
+
+def encode_bytes(values):
+    for value in values:
+        encodeVarLength(value)
+
+
+def decode_single(buffer, count):
+    offset = 0
+    for _ in range(count):
+        offset += readVarLength(offset, buffer)[1]
+
+
+def decode_run(buffer, count):
+    readVarLengths(buffer, 0, count)
+
+
+def report(name, seconds, count):
+    print('%-28s %10.4f s %10.1f nsec/value' % (name, seconds,
+                                                1e9 * seconds / count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--count', type=int, default=100000,
+                        help='number of values per run')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs; the best is reported')
+    args = parser.parse_args()
+
+    values = sample_values(args.count)
+    buffer = b''.join(encodeVarLength(value) for value in values)
+
+    def best(func, *func_args):
+        return min(timeit.repeat(lambda: func(*func_args), number=1,
+                                 repeat=args.repeat))
+
+    report('writeVarLength', best(encode_list, values), args.count)
+    report('encodeVarLength', best(encode_bytes, values), args.count)
+    report('readVarLength (per value)', best(decode_single, buffer,
+                                             args.count), args.count)
+    report('readVarLengths (one run)', best(decode_run, buffer, args.count),
+           args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@ setup(name='MIDIUtil',
           '' : ['License.txt', 'README.rst', 'documentation/*'],
           'examples' : ['single-note-example.py', 'c-major-scale.py']},
       include_package_data = True,
+      install_requires=['futures; python_version < "3"'],
       platforms='Platform Independent',
       classifiers=[
             'Development Status :: 4 - Beta',
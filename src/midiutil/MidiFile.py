@@ -11,10 +11,24 @@
 # -----------------------------------------------------------------------------
 
 from __future__ import division, print_function
+from array import array
+from collections import OrderedDict
+import itertools
 import math
+import mmap
+from operator import attrgetter, itemgetter
+import os
 import struct
+import sys
+import threading
+from timeit import default_timer
 import warnings
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 __version__ = 'HEAD'
 
 # TICKSPERBEAT is the number of "ticks" (time measurement in the MIDI file)
@@ -34,22 +48,250 @@ FLATS = -1
 
 __all__ = ['MIDIFile', 'MAJOR', 'MINOR', 'SHARPS', 'FLATS']
 
+# Pre-compiled packers for the fixed-layout portions of the events written by
+# MIDITrack.writeEventsToStream().
+
+_CHANNEL2_STRUCT = struct.Struct('>BB')  # status, data
+_CHANNEL3_STRUCT = struct.Struct('>BBB')  # status, data 1, data 2
+_META_STRUCT = struct.Struct('>BB')  # 0xFF, meta type
+_TEMPO_STRUCT = struct.Struct('>BBL')  # 0xFF, 0x51, length + 24 bit tempo
+_TIME_SIGNATURE_STRUCT = struct.Struct('>BBBBBBB')
+_KEY_SIGNATURE_STRUCT = struct.Struct('>BBBbB')
+_UNIVERSAL_SYSEX_STRUCT = struct.Struct('>BBBB')
+
+# The array type code used for insertion orders in a NoteTable. Python 2 has
+# no 'q' type code, but its 'l' is 64 bits wide on most platforms.
+
+try:
+    array('q')
+    _ORDER_TYPECODE = 'q'
+except ValueError:
+    _ORDER_TYPECODE = 'l'
+
+
+class MIDIEventBase(object):
+    '''
+    The base class for the events placed on the MIDIEventList.
+
+    Each type of event written by the library has its own subclass, which
+    holds its data in slots rather than in an instance dictionary.
+    '''
+    __slots__ = ('type', 'time', 'ord', 'insertion_order', 'sortKey')
+
+    def __init__(self, type, time, ordinal, insertion_order):
+        self.type = type
+        self.time = time
+        self.ord = ordinal
+        self.insertion_order = insertion_order
 
-class MIDIEvent(object):
+
+class MIDIEvent(MIDIEventBase):
     '''
     The class to contain the MIDI Event (placed on MIDIEventList).
+
+    This is a general purpose event, to which any attributes can be added;
+    it is meant for user-defined event types (see "Extending the Library").
     '''
     def __init__(self, type="unknown", time=0, ordinal=0, insertion_order=0):
-        self.type = type
+        super(MIDIEvent, self).__init__(type, time, ordinal, insertion_order)
+
+
+class MIDINoteOn(MIDIEventBase):
+    '''
+    A note on event.
+    '''
+    __slots__ = ('channel', 'pitch', 'volume')
+
+    def __init__(self, time, ordinal, insertion_order, channel, pitch, volume):
+        # Note events are by far the most numerous, so the base class
+        # initialiser is inlined.
+        self.type = "NoteOn"
+        self.time = time
+        self.ord = ordinal
+        self.insertion_order = insertion_order
+        self.channel = channel
+        self.pitch = pitch
+        self.volume = volume
+
+
+class MIDINoteOff(MIDIEventBase):
+    '''
+    A note off event.
+    '''
+    __slots__ = ('channel', 'pitch', 'volume')
+
+    def __init__(self, time, ordinal, insertion_order, channel, pitch, volume):
+        self.type = "NoteOff"
         self.time = time
         self.ord = ordinal
         self.insertion_order = insertion_order
+        self.channel = channel
+        self.pitch = pitch
+        self.volume = volume
+
+
+class MIDITempo(MIDIEventBase):
+    '''
+    A tempo meta-event. ``tempo`` is in microseconds per quarter note.
+    '''
+    __slots__ = ('tempo',)
+
+    def __init__(self, time, ordinal, insertion_order, tempo):
+        self.tempo = tempo
+        super(MIDITempo, self).__init__("Tempo", time, ordinal,
+                                        insertion_order)
+
+
+class MIDICopyright(MIDIEventBase):
+    '''
+    A copyright notice meta-event.
+    '''
+    __slots__ = ('notice',)
+
+    def __init__(self, time, ordinal, insertion_order, notice):
+        self.notice = notice
+        super(MIDICopyright, self).__init__("Copyright", time, ordinal,
+                                            insertion_order)
+
+
+class MIDIText(MIDIEventBase):
+    '''
+    A text meta-event.
+    '''
+    __slots__ = ('text',)
+
+    def __init__(self, time, ordinal, insertion_order, text):
+        self.text = text
+        super(MIDIText, self).__init__("Text", time, ordinal, insertion_order)
+
+
+class MIDIKeySignature(MIDIEventBase):
+    '''
+    A key signature meta-event.
+    '''
+    __slots__ = ('accidentals', 'accidental_type', 'mode')
+
+    def __init__(self, time, ordinal, insertion_order, accidentals,
+                 accidental_type, mode):
+        self.accidentals = accidentals
+        self.accidental_type = accidental_type
+        self.mode = mode
+        super(MIDIKeySignature, self).__init__("KeySignature", time, ordinal,
+                                               insertion_order)
+
+
+class MIDIProgramChange(MIDIEventBase):
+    '''
+    A program change event.
+    '''
+    __slots__ = ('channel', 'programNumber')
+
+    def __init__(self, time, ordinal, insertion_order, channel,
+                 programNumber):
+        self.channel = channel
+        self.programNumber = programNumber
+        super(MIDIProgramChange, self).__init__("ProgramChange", time,
+                                                ordinal, insertion_order)
+
+
+class MIDITrackName(MIDIEventBase):
+    '''
+    A track name meta-event.
+    '''
+    __slots__ = ('trackName',)
+
+    def __init__(self, time, ordinal, insertion_order, trackName):
+        self.trackName = trackName
+        super(MIDITrackName, self).__init__("TrackName", time, ordinal,
+                                            insertion_order)
+
+
+class MIDIControllerEvent(MIDIEventBase):
+    '''
+    A control change event.
+    '''
+    __slots__ = ('channel', 'controller_number', 'parameter')
+
+    def __init__(self, time, ordinal, insertion_order, channel,
+                 controller_number, parameter):
+        self.channel = channel
+        self.controller_number = controller_number
+        self.parameter = parameter
+        super(MIDIControllerEvent, self).__init__("ControllerEvent", time,
+                                                  ordinal, insertion_order)
+
+
+class MIDIPitchWheelEvent(MIDIEventBase):
+    '''
+    A pitch wheel change event.
+    '''
+    __slots__ = ('channel', 'pitch_wheel_value')
+
+    def __init__(self, time, ordinal, insertion_order, channel,
+                 pitch_wheel_value):
+        self.channel = channel
+        self.pitch_wheel_value = pitch_wheel_value
+        super(MIDIPitchWheelEvent, self).__init__("PitchWheelEvent", time,
+                                                  ordinal, insertion_order)
+
+
+class MIDISysEx(MIDIEventBase):
+    '''
+    A System Exclusive event.
+    '''
+    __slots__ = ('manID', 'payload')
+
+    def __init__(self, time, ordinal, insertion_order, manID, payload):
+        self.manID = manID
+        self.payload = payload
+        super(MIDISysEx, self).__init__("SysEx", time, ordinal,
+                                        insertion_order)
+
+
+class MIDIUniversalSysEx(MIDIEventBase):
+    '''
+    A Universal System Exclusive event.
+    '''
+    __slots__ = ('realTime', 'sysExChannel', 'code', 'subcode', 'payload')
+
+    def __init__(self, time, ordinal, insertion_order, realTime, sysExChannel,
+                 code, subcode, payload):
+        self.realTime = realTime
+        self.sysExChannel = sysExChannel
+        self.code = code
+        self.subcode = subcode
+        self.payload = payload
+        super(MIDIUniversalSysEx, self).__init__("UniversalSysEx", time,
+                                                 ordinal, insertion_order)
+
+
+class MIDITimeSignature(MIDIEventBase):
+    '''
+    A time signature meta-event.
+    '''
+    __slots__ = ('numerator', 'denominator', 'clocks_per_tick',
+                 'notes_per_quarter')
+
+    def __init__(self, time, ordinal, insertion_order, numerator, denominator,
+                 clocks_per_tick, notes_per_quarter):
+        self.numerator = numerator
+        self.denominator = denominator
+        self.clocks_per_tick = clocks_per_tick
+        self.notes_per_quarter = notes_per_quarter
+        super(MIDITimeSignature, self).__init__("TimeSignature", time,
+                                                ordinal, insertion_order)
 
 
 class GenericEvent(object):
     '''
     The event class from which specific events are derived
+
+    The data of the events is held in slots rather than in an instance
+    dictionary. Derived classes should declare their own ``__slots__``
+    (classes that do not simply get a dictionary).
     '''
+    __slots__ = ('type', 'time', 'ord', 'insertion_order')
+
     def __init__(self, event_type, time, ordinal, insertion_order):
         self.type = event_type
         self.time = time
@@ -57,71 +299,56 @@ class GenericEvent(object):
         self.insertion_order = insertion_order
         # self.type = 'Unknown'
 
-    def __eq__(self, other):
+    def dedupeKey(self):
         '''
-        Equality operator for Generic Events and derived classes.
+        Return the key used to remove duplicate events from the eventList.
 
-        In the processing of the event list, we have need to remove duplicates.
-        To do this we rely on the fact that the classes are hashable, and must
-        therefore have an equality operator (__hash__() and __eq__() must both
-        be defined).
+        Two events are duplicates of each other if their keys are equal, and
+        the one that was added later is removed (see
+        ``MIDITrack.removeDuplicates()``). An event whose key is ``None`` is
+        never a duplicate.
 
-        This is the most embarrassing portion of the code, and anyone who knows
-        about OO programming would find this almost unbelievable. Here we have
-        a base class that knows specifics about derived classes, thus breaking
-        the very spirit of OO programming.
+        By default events are duplicates if they are of the same type and at
+        the same time. Derived classes override this to add the data that
+        must also match, or to return ``None`` for events that are never
+        removed.
+        '''
+        if type(self).__eq__ != GenericEvent.__eq__:
+            # A derived class that defines equality itself, in the way that
+            # was needed before this method existed.
+            return (GenericEvent, self)
+        return (self.type, self.time)
 
-        I suppose I should go back and restructure the code, perhaps removing
-        the derived classes altogether. At some point perhaps I will.
+    def __eq__(self, other):
         '''
-        if self.time != other.time or self.type != other.type:
-            return False
+        Equality operator for Generic Events and derived classes.
 
-        # What follows is code that encodes the concept of equality for each
-        # derived class. Believe it f you dare.
-
-        if self.type == 'note':
-            if self.pitch != other.pitch or self.channel != other.channel:
-                return False
-        if self.type == 'tempo':
-            if self.tempo != other.tempo:
-                return False
-        if self.type == 'programChange':
-            if (self.programNumber != other.programNumber or
-                    self.channel != other.channel):
-                return False
-        if self.type == 'trackName':
-            if self.trackName != other.trackName:
-                return False
-        if self.type in ('controllerEvent', 'pitchWheelEvent', 'SysEx', 'UniversalSysEx'):
-            return False
+        Events are equal if they are duplicates of each other, as
+        determined by ``dedupeKey()``.
+        '''
+        key = self.dedupeKey()
+        return key is not None and key == other.dedupeKey()
 
-        return True
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
         '''
-        Return a hash code for the object.
-
-        This is needed for the removal of duplicate objects from the event
-        list.  The only real requirement for the algorithm is that the hash of
-        equal objects must be equal.  There is probably great opportunity for
-        improvements in the hashing function.
+        Return a hash code for the object, consistent with ``__eq__()``.
         '''
-        # Robert Jenkin's 32 bit hash.
-        a = int(self.time)
-        a = (a + 0x7ed55d16) + (a << 12)
-        a = (a ^ 0xc761c23c) ^ (a >> 19)
-        a = (a + 0x165667b1) + (a << 5)
-        a = (a + 0xd3a2646c) ^ (a << 9)
-        a = (a + 0xfd7046c5) + (a << 3)
-        a = (a ^ 0xb55a4f09) ^ (a >> 16)
-        return a
+        if type(self).__eq__ != GenericEvent.__eq__:
+            # Equality is defined by the derived class; only events at the
+            # same time can be equal.
+            return hash(self.time)
+        return hash(self.dedupeKey())
 
 
 class Note(GenericEvent):
     '''
     A class that encapsulates a note
     '''
+    __slots__ = ('pitch', 'duration', 'volume', 'channel', 'annotation')
+
     def __init__(self, channel, pitch, time, duration, volume, ordinal=3,
                  annotation=None, insertion_order=0):
         self.pitch = pitch
@@ -131,20 +358,30 @@ class Note(GenericEvent):
         self.annotation = annotation
         super(Note, self).__init__('note', time, ordinal, insertion_order)
 
+    def dedupeKey(self):
+        return (self.type, self.time, self.pitch, self.channel)
+
 
 class Tempo(GenericEvent):
     '''
     A class that encapsulates a tempo meta-event
     '''
+    __slots__ = ('tempo',)
+
     def __init__(self, time, tempo, ordinal=3, insertion_order=0):
         self.tempo = int(60000000 / tempo)
         super(Tempo, self).__init__('tempo', time, ordinal, insertion_order)
 
+    def dedupeKey(self):
+        return (self.type, self.time, self.tempo)
+
 
 class Copyright(GenericEvent):
     '''
     A class that encapsulates a copyright event
     '''
+    __slots__ = ('notice',)
+
     def __init__(self, time, notice, ordinal=1, insertion_order=0):
         self.notice = notice.encode("ISO-8859-1")
         super(Copyright, self).__init__('Copyright', time, ordinal,
@@ -155,6 +392,8 @@ class Text(GenericEvent):
     '''
     A class that encapsulates a text event
     '''
+    __slots__ = ('text',)
+
     def __init__(self, time, text, ordinal=1, insertion_order=0):
         self.text = text.encode("ISO-8859-1")
         super(Text, self).__init__('Text', time, ordinal, insertion_order)
@@ -164,6 +403,8 @@ class KeySignature(GenericEvent):
     '''
     A class that encapsulates a text event
     '''
+    __slots__ = ('accidentals', 'accidental_type', 'mode')
+
     def __init__(self, time, accidentals, accidental_type, mode, ordinal=1,
                  insertion_order=0):
         self.accidentals = accidentals
@@ -177,6 +418,7 @@ class ProgramChange(GenericEvent):
     '''
     A class that encapsulates a program change event.
     '''
+    __slots__ = ('programNumber', 'channel')
 
     def __init__(self,  channel,  time,  programNumber, ordinal=1,
                  insertion_order=0):
@@ -185,11 +427,15 @@ class ProgramChange(GenericEvent):
         super(ProgramChange, self).__init__('programChange', time, ordinal,
                                             insertion_order)
 
+    def dedupeKey(self):
+        return (self.type, self.time, self.programNumber, self.channel)
+
 
 class SysExEvent(GenericEvent):
     '''
     A class that encapsulates a System Exclusive  event.
     '''
+    __slots__ = ('manID', 'payload')
 
     def __init__(self,  time,  manID,  payload, ordinal=1, insertion_order=0):
         self.manID = manID
@@ -197,11 +443,16 @@ class SysExEvent(GenericEvent):
         super(SysExEvent, self).__init__('SysEx', time, ordinal,
                                          insertion_order)
 
+    def dedupeKey(self):
+        # Never removed as a duplicate
+        return None
+
 
 class UniversalSysExEvent(GenericEvent):
     '''
     A class that encapsulates a Universal System Exclusive  event.
     '''
+    __slots__ = ('realTime', 'sysExChannel', 'code', 'subcode', 'payload')
 
     def __init__(self,  time,  realTime,  sysExChannel,  code,  subcode,
                  payload, ordinal=1, insertion_order=0):
@@ -213,11 +464,16 @@ class UniversalSysExEvent(GenericEvent):
         super(UniversalSysExEvent, self).__init__('UniversalSysEx', time,
                                                   ordinal, insertion_order)
 
+    def dedupeKey(self):
+        # Never removed as a duplicate
+        return None
+
 
 class ControllerEvent(GenericEvent):
     '''
     A class that encapsulates a program change event.
     '''
+    __slots__ = ('parameter', 'channel', 'controller_number')
 
     def __init__(self,  channel,  time,  controller_number, parameter,
                  ordinal=1, insertion_order=0):
@@ -227,22 +483,32 @@ class ControllerEvent(GenericEvent):
         super(ControllerEvent, self).__init__('controllerEvent', time, ordinal,
                                               insertion_order)
 
+    def dedupeKey(self):
+        # Never removed as a duplicate
+        return None
+
 
 class PitchWheelEvent(GenericEvent):
     '''
     A class that encapsulates a pitch wheel change event.
     '''
+    __slots__ = ('channel', 'pitch_wheel_value')
 
     def __init__(self, channel, time, pitch_wheel_value, ordinal=1, insertion_order=0):
         self.channel = channel
         self.pitch_wheel_value = pitch_wheel_value
         super(PitchWheelEvent, self).__init__('pitchWheelEvent', time, ordinal, insertion_order)
 
+    def dedupeKey(self):
+        # Never removed as a duplicate
+        return None
+
 
 class TrackName(GenericEvent):
     '''
     A class that encapsulates a program change event.
     '''
+    __slots__ = ('trackName',)
 
     def __init__(self,  time,  trackName, ordinal=0, insertion_order=0):
         # GenericEvent.__init__(self, time,)
@@ -250,11 +516,16 @@ class TrackName(GenericEvent):
         super(TrackName, self).__init__('trackName', time, ordinal,
                                         insertion_order)
 
+    def dedupeKey(self):
+        return (self.type, self.time, self.trackName)
+
 
 class TimeSignature(GenericEvent):
     '''
     A class that encapsulates a time signature.
     '''
+    __slots__ = ('numerator', 'denominator', 'clocks_per_tick',
+                 'notes_per_quarter')
 
     def __init__(self,  time,  numerator, denominator, clocks_per_tick,
                  notes_per_quarter, ordinal=0, insertion_order=0):
@@ -266,22 +537,168 @@ class TimeSignature(GenericEvent):
                                             insertion_order)
 
 
+class NoteTable(object):
+    '''
+    A class that stores notes in columns.
+
+    Notes added in bulk (see ``MIDIFile.addNotes()``) are kept in one
+    compact array per note attribute rather than as individual :class:`Note`
+    objects. Rows are kept in insertion order. All notes in the table have the
+    default ordinal of a :class:`Note`.
+    '''
+
+    ordinal = 3
+
+    # The names and array type codes of the columns, in the order in which
+    # rows are yielded by rows().
+    columnTypes = (('channels', 'B'), ('pitches', 'B'), ('times', 'd'),
+                   ('durations', 'd'), ('volumes', 'B'),
+                   ('insertion_orders', _ORDER_TYPECODE))
+
+    def __init__(self):
+        for (name, typecode) in self.columnTypes:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.insertion_orders)
+
+    def columns(self):
+        '''
+        Return the columns, in the order in which rows are yielded by
+        ``rows()``.
+        '''
+        return tuple(getattr(self, name) for (name, typecode)
+                     in self.columnTypes)
+
+    def rows(self):
+        '''
+        Iterate over the notes as (channel, pitch, time, duration, volume,
+        insertion_order) tuples.
+        '''
+        return zip(*self.columns())
+
+    def extend(self, channels, pitches, times, durations, volumes,
+               insertion_order=0):
+        '''
+        Append notes to the table.
+
+        Each of the note attributes may be a sequence, an iterable, a NumPy
+        array or a single value that applies to every note. The sequences must
+        all be the same length. The notes are numbered consecutively, starting
+        at ``insertion_order``.
+
+        Returns the number of notes added.
+        '''
+        values = (channels, pitches, times, durations, volumes)
+        values = [value if _isScalar(value) else _asSequence(value)
+                  for value in values]
+        lengths = set(len(value) for value in values
+                      if not _isScalar(value))
+        if len(lengths) > 1:
+            raise ValueError("Error in NoteTable: note attributes have "
+                             "different lengths %s" % sorted(lengths))
+        count = lengths.pop() if lengths else 1
+
+        # Convert every column before touching the table, so that a bad value
+        # leaves it unchanged.
+        new = [_toArray(typecode, value, count)
+               for ((name, typecode), value) in zip(self.columnTypes, values)]
+        new.append(array(_ORDER_TYPECODE,
+                         range(insertion_order, insertion_order + count)))
+        for (column, values) in zip(self.columns(), new):
+            column.extend(values)
+        return count
+
+    def compress(self, selectors):
+        '''
+        Keep only the rows for which the corresponding selector is true.
+        '''
+        for (name, typecode) in self.columnTypes:
+            setattr(self, name, array(typecode, itertools.compress(
+                getattr(self, name), selectors)))
+
+    def shift(self, origin, offset=0):
+        '''
+        Shift the notes in time so that time ``origin`` becomes ``offset``.
+        '''
+        self.times = array('d', [time - origin + offset
+                                 for time in self.times])
+
+
+def _isScalar(value):
+    '''
+    True for a single note attribute, as opposed to a column of them.
+    '''
+    return getattr(value, 'ndim', None) == 0 or not hasattr(value, '__iter__')
+
+
+def _asSequence(value):
+    '''
+    Return a column of values as something with a length.
+    '''
+    if hasattr(value, '__len__'):
+        return value
+    return list(value)
+
+
+def _toArray(typecode, value, count):
+    '''
+    Convert a column (or a single value) of note attributes to an array.
+    '''
+    if _isScalar(value):
+        return array(typecode, [value]) * count
+    if hasattr(value, 'dtype'):
+        # A NumPy array. Convert it with NumPy, but with the range checking
+        # that the array module would have done.
+        if typecode == 'B':
+            if len(value) and (value.min() < 0 or value.max() > 0xFF):
+                raise OverflowError("Error in NoteTable: value out of range "
+                                    "for an unsigned byte")
+            if value.dtype.kind not in 'iub':
+                raise TypeError("Error in NoteTable: integer values expected, "
+                                "got %s" % value.dtype)
+        dtype = 'u1' if typecode == 'B' else 'f8'
+        return array(typecode, value.astype(dtype).tobytes())
+    return array(typecode, value)
+
+
 class MIDITrack(object):
     '''
     A class that encapsulates a MIDI track
     '''
 
-    def __init__(self, removeDuplicates,  deinterleave):
+    def __init__(self, removeDuplicates,  deinterleave, runningStatus=False,
+                 noteOffAsNoteOn=False):
         '''Initialize the MIDITrack object.
         '''
         self.headerString = struct.pack('cccc', b'M', b'T', b'r', b'k')
         self.dataLength = 0  # Is calculated after the data is in place
-        self.MIDIdata = b""
+        self.MIDIdata = bytearray()
         self.closed = False
         self.eventList = []
+        self.noteTable = NoteTable()
         self.MIDIEventList = []
         self.remdep = removeDuplicates
         self.deinterleave = deinterleave
+        self.runningStatus = runningStatus
+        self.noteOffAsNoteOn = noteOffAsNoteOn
+        # The encoded data of a track read from a file (see setSource()), and
+        # whether it is written in place of the encoded events.
+        self.sourceData = None
+        self.sourceSize = None
+        self.copySource = False
+        # The event counts and origin when the track was last closed and
+        # encoded (see encodedFor()), and the last origin found.
+        self.closedCounts = None
+        self.encodedOrigin = None
+        self.originCache = None
+        # Where the encoding of the track left off, so that events added
+        # after it can be encoded onto its end (see appendEvents()): the
+        # state of the encoder, the time and sort key of the last event, and
+        # the bounds of the events encoded.
+        self.encoderState = None
+        self.encodedEnd = None
+        self.appendBounds = None
 
     def addNoteByNumber(self, channel, pitch, time, duration, volume,
                         annotation=None, insertion_order=0):
@@ -292,6 +709,17 @@ class MIDITrack(object):
                                    annotation=annotation,
                                    insertion_order=insertion_order))
 
+    def addNotes(self, channels, pitches, times, durations, volumes,
+                 insertion_order=0):
+        '''
+        Add notes in bulk to the track's note table.
+
+        The notes are numbered consecutively from ``insertion_order``. Returns
+        the number of notes added.
+        '''
+        return self.noteTable.extend(channels, pitches, times, durations,
+                                     volumes, insertion_order=insertion_order)
+
     def addControllerEvent(self, channel, time, controller_number, parameter,
                            insertion_order=0):
         '''
@@ -394,121 +822,223 @@ class MIDITrack(object):
         self.eventList.append(UniversalSysExEvent(0, realTime,  sysExChannel,
                               8, 2, payload, insertion_order=insertion_order))
 
-    def processEventList(self):
+    def processEventList(self, profile=None):
         '''
         Process the event list, creating a MIDIEventList
 
         For each item in the event list, one or more events in the MIDIEvent
         list are created.
+
+        If a :class:`CloseProfile` is given, the creation of the events, their
+        sorting and the de-interleaving of notes are recorded in it as the
+        ``processEventList``, ``sortEvents`` and ``deInterleaveNotes``
+        phases.
         '''
 
         # Loop over all items in the eventList
 
+        MIDIEventList = self.MIDIEventList
         for thing in self.eventList:
             if thing.type == 'note':
-                event = MIDIEvent("NoteOn", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.pitch = thing.pitch
-                event.volume = thing.volume
-                event.channel = thing.channel
-                self.MIDIEventList.append(event)
-
-                event = MIDIEvent("NoteOff",
-                                  (thing.time + thing.duration) * TICKSPERBEAT,
-                                  thing.ord - 0.1, thing.insertion_order)
-                event.pitch = thing.pitch
-                event.volume = thing.volume
-                event.channel = thing.channel
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDINoteOn(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.channel, thing.pitch,
+                    thing.volume))
+                MIDIEventList.append(MIDINoteOff(
+                    (thing.time + thing.duration) * TICKSPERBEAT,
+                    thing.ord - 0.1, thing.insertion_order, thing.channel,
+                    thing.pitch, thing.volume))
 
             elif thing.type == 'tempo':
-                event = MIDIEvent("Tempo", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.tempo = thing.tempo
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDITempo(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.tempo))
 
             elif thing.type == 'Copyright':
-                event = MIDIEvent("Copyright", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.notice = thing.notice
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDICopyright(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.notice))
 
             elif thing.type == 'Text':
-                event = MIDIEvent("Text", thing.time * TICKSPERBEAT, thing.ord,
-                                  thing.insertion_order)
-                event.text = thing.text
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDIText(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.text))
 
             elif thing.type == 'KeySignature':
-                event = MIDIEvent("KeySignature", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.accidentals = thing.accidentals
-                event.accidental_type = thing.accidental_type
-                event.mode = thing.mode
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDIKeySignature(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.accidentals,
+                    thing.accidental_type, thing.mode))
 
             elif thing.type == 'programChange':
-                event = MIDIEvent("ProgramChange", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.programNumber = thing.programNumber
-                event.channel = thing.channel
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDIProgramChange(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.channel,
+                    thing.programNumber))
 
             elif thing.type == 'trackName':
-                event = MIDIEvent("TrackName", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.trackName = thing.trackName
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDITrackName(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.trackName))
 
             elif thing.type == 'controllerEvent':
-                event = MIDIEvent("ControllerEvent", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.controller_number = thing.controller_number
-                event.channel = thing.channel
-                event.parameter = thing.parameter
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDIControllerEvent(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.channel,
+                    thing.controller_number, thing.parameter))
 
             elif thing.type == 'pitchWheelEvent':
-                event = MIDIEvent('PitchWheelEvent', thing.time * TICKSPERBEAT, thing.ord, thing.insertion_order)
-                event.pitch_wheel_value = thing.pitch_wheel_value
-                event.channel = thing.channel
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDIPitchWheelEvent(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.channel,
+                    thing.pitch_wheel_value))
 
             elif thing.type == 'SysEx':
-                event = MIDIEvent("SysEx", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.manID = thing.manID
-                event.payload = thing.payload
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDISysEx(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.manID, thing.payload))
 
             elif thing.type == 'UniversalSysEx':
-                event = MIDIEvent("UniversalSysEx", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.realTime = thing.realTime
-                event.sysExChannel = thing.sysExChannel
-                event.code = thing.code
-                event.subcode = thing.subcode
-                event.payload = thing.payload
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDIUniversalSysEx(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.realTime,
+                    thing.sysExChannel, thing.code, thing.subcode,
+                    thing.payload))
 
             elif thing.type == 'TimeSignature':
-                event = MIDIEvent("TimeSignature", thing.time * TICKSPERBEAT,
-                                  thing.ord, thing.insertion_order)
-                event.numerator = thing.numerator
-                event.denominator = thing.denominator
-                event.clocks_per_tick = thing.clocks_per_tick
-                event.notes_per_quarter = thing.notes_per_quarter
-                self.MIDIEventList.append(event)
+                MIDIEventList.append(MIDITimeSignature(
+                    thing.time * TICKSPERBEAT, thing.ord,
+                    thing.insertion_order, thing.numerator,
+                    thing.denominator, thing.clocks_per_tick,
+                    thing.notes_per_quarter))
 
             else:
                 raise ValueError("Error in MIDITrack: Unknown event type %s" %
                                  thing.type)
 
-        # Assumptions in the code expect the list to be time-sorted.
-        self.MIDIEventList.sort(key=sort_events)
+        if profile is not None:
+            profile.lap('processEventList', len(MIDIEventList))
 
-        if self.deinterleave:
+        # Assumptions in the code expect the list to be time-sorted. Notes
+        # added in bulk go straight from the note table to MIDI events; with
+        # NumPy they are put in order separately and merged in afterwards.
+        # If they are the only notes in the track they are de-interleaved
+        # on their own, too.
+
+        deinterleave = self.deinterleave
+        if numpy is None or len(self.noteTable) == 0:
+            self.expandNoteTable()
+            setSortKeys(self.MIDIEventList)
+            self.MIDIEventList.sort(key=_sortKey)
+        else:
+            setSortKeys(self.MIDIEventList)
+            self.MIDIEventList.sort(key=_sortKey)
+            deinterleaveTable = deinterleave and not any(
+                event.type == 'NoteOn' for event in self.MIDIEventList)
+            self.MIDIEventList = _mergeEvents(
+                self.MIDIEventList,
+                self.expandNoteTableSorted(deinterleaveTable))
+            if deinterleaveTable:
+                deinterleave = False
+        if profile is not None:
+            profile.lap('sortEvents', len(self.MIDIEventList))
+
+        if deinterleave:
             self.deInterleaveNotes()
+            if profile is not None:
+                profile.lap('deInterleaveNotes', len(self.MIDIEventList))
+
+    def expandNoteTable(self):
+        '''
+        Create NoteOn and NoteOff events for the notes in the note table,
+        appending them to the (unsorted) MIDIEventList.
+        '''
+        noteOnOrdinal = self.noteTable.ordinal
+        noteOffOrdinal = noteOnOrdinal - 0.1
+        append = self.MIDIEventList.append
+        for (channel, pitch, time, duration, volume,
+                insertion_order) in self.noteTable.rows():
+            append(MIDINoteOn(time * TICKSPERBEAT, noteOnOrdinal,
+                              insertion_order, channel, pitch, volume))
+            append(MIDINoteOff((time + duration) * TICKSPERBEAT,
+                               noteOffOrdinal, insertion_order, channel,
+                               pitch, volume))
+
+    def expandNoteTableSorted(self, deinterleave=False):
+        '''
+        Return the NoteOn and NoteOff events for the notes in the note table,
+        sorted as by ``sort_events()`` and with their sort keys set. Requires
+        NumPy.
+
+        The event times are computed for all notes at once, and the events are
+        put in order by a single ``lexsort`` on (time, ordinal, insertion
+        order) before any event objects are created.
+
+        If ``deinterleave`` is true the notes are also de-interleaved (see
+        ``deInterleaveNotes()``), as far as possible on the arrays of times.
+        '''
+        table = self.noteTable
+        count = len(table)
+        noteOnOrdinal = table.ordinal
+        noteOffOrdinal = noteOnOrdinal - 0.1
+
+        times = _numpyColumn(table.times)
+        insertion_orders = _numpyColumn(table.insertion_orders)
+        eventTimes = numpy.concatenate(
+            (times * TICKSPERBEAT,
+             (times + _numpyColumn(table.durations)) * TICKSPERBEAT))
+        eventOrdinals = numpy.repeat([float(noteOnOrdinal), noteOffOrdinal],
+                                     count)
+        order = numpy.lexsort((numpy.tile(insertion_orders, 2), eventOrdinals,
+                               eventTimes))
+
+        deinterleaved = not deinterleave
+        if deinterleave:
+            voices = (_numpyColumn(table.channels).astype(numpy.int64) * 256 +
+                      _numpyColumn(table.pitches))[order % count]
+            correctedTimes = _deInterleaveTimes(eventTimes[order],
+                                                order >= count, voices)
+            if correctedTimes is not None:
+                # Put the events back in order with their corrected times.
+                eventTimes[order] = correctedTimes
+                order = numpy.lexsort((numpy.tile(insertion_orders, 2),
+                                       eventOrdinals, eventTimes))
+                deinterleaved = True
+
+        # Event i is the NoteOn (i < count) or NoteOff of row i % count.
+        rows = order % count
+        isNoteOff = (order >= count).tolist()
+        eventTimes = eventTimes[order]
+        timeBits = _orderedBitsArray(eventTimes).tolist()
+        eventTimes = eventTimes.tolist()
+        channels = _numpyColumn(table.channels)[rows].tolist()
+        pitches = _numpyColumn(table.pitches)[rows].tolist()
+        volumes = _numpyColumn(table.volumes)[rows].tolist()
+        insertion_orders = insertion_orders[rows].tolist()
+
+        # The sort keys, as setSortKeys() would make them.
+        noteOnKey, noteOffKey = [bits << 64 for bits in _orderedBits(
+            [noteOnOrdinal, noteOffOrdinal])]
+
+        events = []
+        append = events.append
+        for (noteOff, time, bits, channel, pitch, volume,
+                insertion_order) in zip(isNoteOff, eventTimes, timeBits,
+                                        channels, pitches, volumes,
+                                        insertion_orders):
+            if noteOff:
+                event = MIDINoteOff(time, noteOffOrdinal, insertion_order,
+                                    channel, pitch, volume)
+                event.sortKey = (bits << 128) + noteOffKey + insertion_order
+            else:
+                event = MIDINoteOn(time, noteOnOrdinal, insertion_order,
+                                   channel, pitch, volume)
+                event.sortKey = (bits << 128) + noteOnKey + insertion_order
+            append(event)
+
+        if not deinterleaved:
+            events = _deInterleave(events)
+        return events
 
     def removeDuplicates(self):
         '''
@@ -519,15 +1049,115 @@ class MIDITrack(object):
         otherwise.
         '''
 
-        # For this algorithm to work, the events in the eventList must be
-        # hashable (that is, they must have a __hash__() and __eq__() function
-        # defined).
+        # A single pass, keeping the first event with each key. Keys are
+        # structural (type, time and whatever else must match), so events
+        # at the same time only collide if they really are duplicates.
+
+        seen = set()
+        addKey = seen.add
+        eventList = []
+        append = eventList.append
+        for thing in self.eventList:
+            key = thing.dedupeKey()
+            if key is None:
+                append(thing)
+            elif key not in seen:
+                addKey(key)
+                append(thing)
+        self.eventList = eventList
+
+        if len(self.noteTable) > 0:
+            self.removeTableDuplicates()
+
+        # The eventList is not sorted here: processEventList() puts the MIDI
+        # events it creates in order, and that is the only sort needed.
+
+    def removeTableDuplicates(self):
+        '''
+        Remove duplicate notes from the note table.
+
+        Notes in the table are duplicates if they have the same time, pitch
+        and channel as another note, either in the table or in the eventList.
+        As for the eventList, the note that was added first is kept.
+        '''
+        if numpy is not None:
+            keep, discarded = self.findTableDuplicatesVectorized()
+        else:
+            keep, discarded = self.findTableDuplicates()
+
+        self.noteTable.compress(keep)
+        if discarded:
+            self.eventList = [thing for thing in self.eventList
+                              if id(thing) not in discarded]
+
+    def findTableDuplicates(self):
+        '''
+        Find the duplicate notes for ``removeTableDuplicates()``.
+
+        Returns a list with a flag for each row of the table (true if the row
+        is to be kept) and the set of ids of the Note objects in the eventList
+        that are to be discarded.
+        '''
+        firstNotes = {}
+        for thing in self.eventList:
+            if thing.type == 'note':
+                key = (thing.time, thing.pitch, thing.channel)
+                firstNotes.setdefault(key, thing)
+
+        keep = []
+        seen = set()
+        discarded = set()
+        for (channel, pitch, time, duration, volume,
+                insertion_order) in self.noteTable.rows():
+            key = (time, pitch, channel)
+            if key in seen:
+                keep.append(False)
+                continue
+            seen.add(key)
+            note = firstNotes.get(key)
+            if note is not None and note.insertion_order < insertion_order:
+                keep.append(False)
+            else:
+                keep.append(True)
+                if note is not None:
+                    discarded.add(id(note))
+        return keep, discarded
 
-        tempDict = {item: 1 for item in self.eventList}
-        self.eventList = list(tempDict.keys())
-        self.eventList.sort(key=sort_events)
+    def findTableDuplicatesVectorized(self):
+        '''
+        A NumPy implementation of ``findTableDuplicates()``.
 
-    def closeTrack(self):
+        The table rows and the notes in the eventList are sorted together by
+        (channel, pitch, time, insertion order); the first of each run of
+        equal (channel, pitch, time) is the note to keep.
+        '''
+        table = self.noteTable
+        count = len(table)
+        notes = [thing for thing in self.eventList if thing.type == 'note']
+
+        channels = numpy.concatenate((_numpyColumn(table.channels),
+                                      [note.channel for note in notes]))
+        pitches = numpy.concatenate((_numpyColumn(table.pitches),
+                                     [note.pitch for note in notes]))
+        times = numpy.concatenate((_numpyColumn(table.times),
+                                   [note.time for note in notes]))
+        insertion_orders = numpy.concatenate(
+            (_numpyColumn(table.insertion_orders),
+             [note.insertion_order for note in notes]))
+
+        order = numpy.lexsort((insertion_orders, times, pitches, channels))
+        first = numpy.ones(len(order), dtype=bool)
+        first[1:] = ((channels[order][1:] != channels[order][:-1]) |
+                     (pitches[order][1:] != pitches[order][:-1]) |
+                     (times[order][1:] != times[order][:-1]))
+        keep = numpy.empty(len(order), dtype=bool)
+        keep[order] = first
+
+        discarded = set(id(note) for (note, kept) in
+                        zip(notes, keep[count:].tolist()) if not kept)
+        return keep[:count].tolist(), discarded
+
+    def closeTrack(self, profile=None):
         '''
         Called to close a track before writing
 
@@ -535,224 +1165,500 @@ class MIDITrack(object):
         prepare the actual data stream for writing. Duplicate events are
         removed from the eventList, and the MIDIEventList is created.
 
-        Called by the parent MIDIFile object.
+        Called by the parent MIDIFile object, which may pass a
+        :class:`CloseProfile` to record the phases in.
         '''
 
         if self.closed:
             return
         self.closed = True
 
+        if self.copySource:
+            # The data read from the file is written as it is.
+            self.closedCounts = self.eventCounts()
+            return
+
+        self.appendBounds = None
         if self.remdep:
             self.removeDuplicates()
+            if profile is not None:
+                profile.lap('removeDuplicates', sum(self.eventCounts()))
 
-        self.processEventList()
+        self.processEventList(profile)
 
-    def writeMIDIStream(self):
+        # The MIDIEventList is sorted, so its origin is that of its first
+        # event; it is kept for findEventOrigin().
+        self.closedCounts = self.eventCounts()
+        origin = (self.MIDIEventList[0].time if self.MIDIEventList
+                  else 1000000)
+        self.originCache = (self.closedCounts, origin)
+
+    def reopen(self):
         '''
-        Write the meta data and note data to the packed MIDI stream.
+        Discard the MIDI events and encoded data made when the track was
+        closed, so that it is closed again from its events.
         '''
+        self.closed = False
+        self.MIDIEventList = []
+        self.MIDIdata = bytearray()
+        self.dataLength = 0
+        self.closedCounts = None
+        self.encoderState = None
+        self.encodedEnd = None
+        self.appendBounds = None
+
+    def eventCounts(self):
+        '''
+        Return the number of events in the eventList and the number of notes
+        in the note table.
 
-        # Process the events in the eventList
-
-        self.writeEventsToStream()
-
-        # Write MIDI close event.
+        Events are only ever added to a track (apart from duplicates, which
+        are removed when it is closed), so the track has changed if these
+        have. Changes made to the events themselves are not seen: whatever
+        makes them must call :meth:`invalidate`.
+        '''
+        return (len(self.eventList), len(self.noteTable))
 
-        self.MIDIdata += struct.pack('BBBB', 0x00, 0xFF, 0x2F, 0x00)
+    def invalidate(self):
+        '''
+        Discard everything kept from the track's events, after they have
+        been changed in place rather than added to (as by
+        :meth:`MIDIFile.shiftTracks`), which :meth:`eventCounts` cannot
+        show. The track is reopened, and the origin found from its events
+        and the data it was read from (see :meth:`setSource`) are forgotten.
+        '''
+        self.reopen()
+        self.encodedOrigin = None
+        self.originCache = None
+        self.sourceData = None
+        self.sourceSize = None
+        self.copySource = False
+
+    def encodedFor(self, origin):
+        '''
+        True if the track has been closed and encoded with the given origin
+        (in ticks, or ``0.0`` if the origin is not adjusted), and no events
+        have been added to it since.
+        '''
+        return (self.closed and self.closedCounts == self.eventCounts() and
+                self.encodedOrigin == origin)
 
-        # Calculate the entire length of the data and write to the header
+    def setSource(self, data):
+        '''
+        Keep the encoded data of a track read from a file.
 
-        self.dataLength = struct.pack('>L', len(self.MIDIdata))
+        ``data`` is the data of the track's chunk, including the end of track
+        event, from which the track's events have been added. It is written
+        in place of the encoded events for as long as the track is unmodified,
+        if the file allows it (see :meth:`MIDIFile.reopenTracks`).
+        '''
+        self.sourceData = data
+        self.sourceSize = self.eventCounts()
+        self.findEventOrigin()
 
-    def writeEventsToStream(self):
+    def unmodified(self):
         '''
-        Write the events in MIDIEvents to the MIDI stream.
+        True if the track was read from a file and has not changed since (see
+        :meth:`eventCounts`).
         '''
-        preciseTime = 0.0  # Actual time of event, ignoring round-off
-        actualTime = 0.0   # Time as written to midi stream, include round-off
-        for event in self.MIDIEventList:
-
-            preciseTime = preciseTime + event.time
+        return (self.sourceData is not None and
+                self.sourceSize == self.eventCounts())
 
-            # Convert the time to variable length and back, to see how much
-            # error is introduced
-
-            testBuffer = b""
-            varTime = writeVarLength(event.time)
-            for timeByte in varTime:
-                testBuffer = testBuffer + struct.pack('>B', timeByte)
-            (roundedVal, discard) = readVarLength(0, testBuffer)
-            roundedTime = actualTime + roundedVal
+    def findEventOrigin(self):
+        '''
+        Find the earliest time of the events and notes added to the track, in
+        ticks, or 1000000 if there are none (see
+        :meth:`MIDIFile.findEventOrigin`).
 
-            # Calculate the delta between the two and apply it to event time.
+        The origin is remembered, and once events have been added to the
+        track only they are searched.
+        '''
+        counts = self.eventCounts()
+        (events, notes) = (0, 0)
+        origin = 1000000
+        if self.originCache is not None:
+            if (self.originCache[0][0] <= counts[0] and
+                    self.originCache[0][1] <= counts[1]):
+                ((events, notes), origin) = self.originCache
+
+        for thing in itertools.islice(self.eventList, events, None):
+            time = thing.time * TICKSPERBEAT
+            if time < origin:
+                origin = time
+            if thing.type == 'note':
+                time = (thing.time + thing.duration) * TICKSPERBEAT
+                if time < origin:
+                    origin = time
+        table = self.noteTable
+        if len(table) > notes:
+            times = table.times[notes:]
+            origin = min(origin, min(times) * TICKSPERBEAT,
+                         min(time + duration for (time, duration) in
+                             zip(times, table.durations[notes:])) *
+                         TICKSPERBEAT)
+
+        self.originCache = (counts, origin)
+        return origin
 
-            delta = preciseTime - roundedTime
-            event.time = event.time + delta
+    def appendEvents(self, origin):
+        '''
+        Encode the events added since the track was closed onto the end of
+        its encoded data, leaving the events encoded before as they are.
+
+        This is possible if the track was closed and encoded with the given
+        origin (see :meth:`encodedFor`) and every event added comes after the
+        events already encoded, so that they keep their order and none of the
+        new events can be a duplicate of an old one. If notes are
+        de-interleaved the notes already encoded must also all have a
+        positive duration: a note of zero duration leaves its pitch sounding
+        for the notes that follow it. The new events are closed on their own,
+        in a track with the same settings, and encoded from the state the
+        encoding of the track ended in, which gives the same data as closing
+        the whole track again would. The data is put in before the end of
+        track event.
+
+        Returns True if the events were encoded, and False if the track has
+        to be reopened and closed again.
+        '''
+        if (not self.closed or self.encoderState is None or
+                self.encodedOrigin != origin):
+            return False
+        (events, notes) = self.closedCounts
+        table = self.noteTable
+        if len(self.eventList) < events or len(table) < notes:
+            return False
 
-            # Now update the actualTime value, using the updated event time.
+        if self.appendBounds is None:
+            self.appendBounds = _timeBounds(self.eventList[:events],
+                                            table.times[:notes],
+                                            table.durations[:notes])
+        (earliest, latest, positive) = self.appendBounds
+        if self.deinterleave and not positive:
+            return False
 
-            testBuffer = b""
-            varTime = writeVarLength(event.time)
-            for timeByte in varTime:
-                testBuffer = testBuffer + struct.pack('>B', timeByte)
+        tail = MIDITrack(self.remdep, self.deinterleave, self.runningStatus,
+                         self.noteOffAsNoteOn)
+        tail.eventList = self.eventList[events:]
+        for (name, typecode) in NoteTable.columnTypes:
+            setattr(tail.noteTable, name, getattr(table, name)[notes:])
+        bounds = _timeBounds(tail.eventList, tail.noteTable.times,
+                             tail.noteTable.durations)
+        if self.remdep and latest >= bounds[0]:
+            return False
 
-            (roundedVal, discard) = readVarLength(0, testBuffer)
-            actualTime = actualTime + roundedVal
+        tail.closeTrack()
+        if (self.encodedEnd is not None and tail.MIDIEventList and
+                tail.MIDIEventList[0].sortKey <= self.encodedEnd[1]):
+            return False
+        tail.adjustTimeAndOrigin(origin, True)
+        if self.encodedEnd is not None and tail.MIDIEventList:
+            # The first event is relative to the last one encoded.
+            first = tail.MIDIEventList[0]
+            first.time = first.time - (self.encodedEnd[0] - origin)
+
+        data = self.MIDIdata
+        del data[len(data) - len(_END_OF_TRACK):]
+        for piece in tail.encodeEvents(state=self.encoderState):
+            data += piece
+        data += _END_OF_TRACK
+        self.dataLength = struct.pack('>L', len(data))
+        self.MIDIEventList.extend(tail.MIDIEventList)
+        self.encoderState = tail.encoderState
+        if tail.encodedEnd is not None:
+            self.encodedEnd = tail.encodedEnd
+
+        # Duplicates removed from the new events are removed from the track.
+        self.eventList[events:] = tail.eventList
+        for (column, added) in zip(table.columns(),
+                                   tail.noteTable.columns()):
+            del column[notes:]
+            column.extend(added)
+        self.closedCounts = self.eventCounts()
+        self.appendBounds = (min(earliest, bounds[0]),
+                             max(latest, bounds[1]), positive and bounds[2])
+        if self.originCache is not None and \
+                self.originCache[0] != self.closedCounts:
+            self.originCache = None
+        return True
 
-        for event in self.MIDIEventList:
-            if event.type == "NoteOn":
-                code = 0x9 << 4 | event.channel
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', event.pitch)
-                self.MIDIdata += struct.pack('>B', event.volume)
-            elif event.type == "NoteOff":
-                code = 0x8 << 4 | event.channel
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', event.pitch)
-                self.MIDIdata += struct.pack('>B', event.volume)
-            elif event.type == "Tempo":
-                code = 0xFF
-                subcode = 0x51
-                fourbite = struct.pack('>L', event.tempo)
-                threebite = fourbite[1:4]  # Just discard the MSB
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', subcode)
-                self.MIDIdata += struct.pack('>B', 0x03)
-                self.MIDIdata += threebite
-            elif event.type == "Text":
-                code = 0xFF
-                subcode = 0x01
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', subcode)
-                payloadLength = len(event.text)
-                payloadLengthVar = writeVarLength(payloadLength)
-                for i in range(len(payloadLengthVar)):
-                    self.MIDIdata += struct.pack("b", payloadLengthVar[i])
-                self.MIDIdata += event.text
-            elif event.type == "Copyright":
-                code = 0xFF
-                subcode = 0x02
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', subcode)
-                payloadLength = len(event.notice)
-                payloadLengthVar = writeVarLength(payloadLength)
-                for i in range(len(payloadLengthVar)):
-                    self.MIDIdata += struct.pack("b", payloadLengthVar[i])
-                self.MIDIdata += event.notice
-            elif event.type == "TimeSignature":
-                code = 0xFF
-                subcode = 0x58
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', subcode)
-                self.MIDIdata += struct.pack('>B', 0x04)
-                self.MIDIdata += struct.pack('>B', event.numerator)
-                self.MIDIdata += struct.pack('>B', event.denominator)
-                self.MIDIdata += struct.pack('>B', event.clocks_per_tick)
-                # 32nd notes per quarter note
-                self.MIDIdata += struct.pack('>B', event.notes_per_quarter)
-            elif event.type == "KeySignature":
-                code = 0xFF
-                subcode = 0x59
-                event_subtype = 0x02
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', subcode)
-                self.MIDIdata += struct.pack('>B', event_subtype)
-                self.MIDIdata += struct.pack('>b', event.accidentals *
-                                             event.accidental_type)
-                self.MIDIdata += struct.pack('>B', event.mode)
-            elif event.type == 'ProgramChange':
-                code = 0xC << 4 | event.channel
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', event.programNumber)
-            elif event.type == 'TrackName':
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('B', 0xFF)
-                self.MIDIdata += struct.pack('B', 0X03)
-                dataLength = len(event.trackName)
-                dataLenghtVar = writeVarLength(dataLength)
-                for i in range(0, len(dataLenghtVar)):
-                    self.MIDIdata += struct.pack("b", dataLenghtVar[i])
-                self.MIDIdata += event.trackName
-            elif event.type == "ControllerEvent":
-                code = 0xB << 4 | event.channel
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-                self.MIDIdata += struct.pack('>B', event.controller_number)
-                self.MIDIdata += struct.pack('>B', event.parameter)
-            elif event.type == 'PitchWheelEvent':
-                code = 0xE << 4 | event.channel
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata = self.MIDIdata + struct.pack('>B',timeByte)
-                MSB = (event.pitch_wheel_value + 8192) >> 7
-                LSB = (event.pitch_wheel_value + 8192) & 0x7F
-                self.MIDIdata = self.MIDIdata + struct.pack('>B',code)
-                self.MIDIdata = self.MIDIdata + struct.pack('>B',LSB)
-                self.MIDIdata = self.MIDIdata + struct.pack('>B',MSB)
-            elif event.type == "SysEx":
-                code = 0xF0
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-
-                payloadLength = writeVarLength(len(event.payload)+2)
-                for lenByte in payloadLength:
-                    self.MIDIdata += struct.pack('>B', lenByte)
-
-                self.MIDIdata += struct.pack('>B', event.manID)
-                self.MIDIdata += event.payload
-                self.MIDIdata += struct.pack('>B', 0xF7)
-            elif event.type == "UniversalSysEx":
-                code = 0xF0
-                varTime = writeVarLength(event.time)
-                for timeByte in varTime:
-                    self.MIDIdata += struct.pack('>B', timeByte)
-                self.MIDIdata += struct.pack('>B', code)
-
-                # Do we need to add a length?
-                payloadLength = writeVarLength(len(event.payload)+5)
-                for lenByte in payloadLength:
-                    self.MIDIdata += struct.pack('>B', lenByte)
-
-                if event.realTime:
-                    self.MIDIdata += struct.pack('>B', 0x7F)
-                else:
-                    self.MIDIdata += struct.pack('>B', 0x7E)
-
-                self.MIDIdata += struct.pack('>B', event.sysExChannel)
-                self.MIDIdata += struct.pack('>B', event.code)
-                self.MIDIdata += struct.pack('>B', event.subcode)
-                self.MIDIdata += event.payload
-                self.MIDIdata += struct.pack('>B', 0xF7)
+    def estimateSize(self, origin=0.0):
+        '''
+        Estimate the size of the track's chunk in bytes, without closing or
+        encoding the track.
+
+        ``origin`` is the origin the track would be encoded with, in ticks
+        (``0.0`` if it is not adjusted). If the track has been encoded with
+        it and not changed since, the size of its encoded data is returned.
+
+        Otherwise the bytes of each event are counted from the eventList and
+        note table, and the delta times are found from the sorted times of
+        the events, rounded as when the track is encoded. With running
+        status, the status bytes left out are found from the events in time
+        order. The estimate differs from the size written only where events
+        are removed as duplicates or moved by de-interleaving, or where
+        events at the same time are written in a different order of status.
+        '''
+        if self.encodedFor(origin):
+            return len(self.headerString) + 4 + len(self.MIDIdata)
+
+        noteOn = 0x90
+        noteOff = 0x90 if self.noteOffAsNoteOn else 0x80
+        times = []
+        statuses = []  # The status byte of channel messages, else None
+        size = 0
+        for thing in self.eventList:
+            kind = thing.type
+            times.append(thing.time * TICKSPERBEAT)
+            if kind == 'note':
+                statuses.append(noteOn | thing.channel)
+                times.append((thing.time + thing.duration) * TICKSPERBEAT)
+                statuses.append(noteOff | thing.channel)
+                size += 6
+            elif kind == 'controllerEvent':
+                statuses.append(0xB0 | thing.channel)
+                size += 3
+            elif kind == 'programChange':
+                statuses.append(0xC0 | thing.channel)
+                size += 2
+            elif kind == 'pitchWheelEvent':
+                statuses.append(0xE0 | thing.channel)
+                size += 3
+            else:
+                statuses.append(None)
+                size += _eventSize(thing)
+
+        table = self.noteTable
+        for (channel, time, duration) in zip(table.channels, table.times,
+                                             table.durations):
+            times.append(time * TICKSPERBEAT)
+            statuses.append(noteOn | channel)
+            times.append((time + duration) * TICKSPERBEAT)
+            statuses.append(noteOff | channel)
+        size += 6 * len(table)
+
+        # The delta times, with the round-off carried as in encodeEvents().
+        runningStatus = self.runningStatus
+        status = None
+        preciseTime = 0.0
+        actualTime = 0
+        previous = 0
+        for index in sorted(range(len(times)), key=times.__getitem__):
+            time = times[index] - origin
+            delta = time - previous
+            previous = time
+            preciseTime = preciseTime + delta
+            ticks = _roundTicks(delta)
+            delta = delta + (preciseTime - (actualTime + ticks))
+            ticks = _roundTicks(delta)
+            actualTime = actualTime + ticks
+            size += len(encodeVarLength(ticks))
+            if runningStatus:
+                if statuses[index] is not None and statuses[index] == status:
+                    size -= 1
+                status = statuses[index]
+
+        return len(self.headerString) + 4 + size + len(_END_OF_TRACK)
+
+    def writeMIDIStream(self):
+        '''
+        Write the meta data and note data to the packed MIDI stream.
+        '''
+
+        if self.copySource:
+            self.MIDIdata = self.sourceData
+            self.dataLength = struct.pack('>L', len(self.MIDIdata))
+            return
+
+        # Process the events in the eventList
+
+        self.writeEventsToStream()
+
+        # Write MIDI close event.
+
+        self.MIDIdata += _END_OF_TRACK
+
+        # Calculate the entire length of the data and write to the header
+
+        self.dataLength = struct.pack('>L', len(self.MIDIdata))
+
+    def writeEventsToStream(self):
+        '''
+        Write the events in MIDIEvents to the MIDI stream.
+        '''
+        for data in self.encodeEvents():
+            self.MIDIdata += data
+
+    def encodeEvents(self, batchSize=None, state=None):
+        '''
+        Encode the events in MIDIEventList, yielding the MIDI stream a piece
+        at a time.
+
+        If ``batchSize`` is given a piece is yielded for every ``batchSize``
+        events, so that the stream can be written out without all of it being
+        held in memory; otherwise the stream is yielded in one piece.
+
+        If the track's ``runningStatus`` is set, the status byte of a channel
+        message is left out when it is the same as that of the channel
+        message before it (meta and system exclusive events cancel the
+        running status). If ``noteOffAsNoteOn`` is set, note off events are
+        written as note on events with a velocity of zero, which lets runs of
+        notes share one status byte.
+
+        Once all the events have been encoded, the state of the encoder (the
+        precise and written times and the running status) is left in
+        ``encoderState``. Passing it as ``state`` carries the encoding on from
+        there, for events that follow those encoded (see
+        :meth:`appendEvents`).
+        '''
+        # The stream is assembled in a growable buffer; repeatedly extending
+        # an immutable bytes object would copy the whole track for every byte
+        # added.
+
+        packChannel2 = _CHANNEL2_STRUCT.pack
+        packChannel3 = _CHANNEL3_STRUCT.pack
+        runningStatus = self.runningStatus
+        noteOffAsNoteOn = self.noteOffAsNoteOn
+        status = None  # The running status, if any
+        if state is not None:
+            (preciseTime, actualTime, status) = state
+        else:
+            (preciseTime, actualTime) = (0.0, 0)
+
+        # Event times are fractional tick deltas, but only whole ticks can be
+        # written. The round-off is carried forward so that it does not
+        # accumulate: each delta is corrected by the difference between the
+        # precise time and the time written so far (counted in exact integer
+        # ticks) before it is rounded.
+
+        # preciseTime is the actual time of the event, ignoring round-off,
+        # and actualTime the ticks written to the stream so far.
+
+        count = len(self.MIDIEventList)
+        batchSize = batchSize or count
+        events = iter(self.MIDIEventList)
+        for start in range(0, count, max(batchSize, 1)):
+            data = bytearray()
+            for event in itertools.islice(events, batchSize):
+                preciseTime = preciseTime + event.time
+                ticks = _roundTicks(event.time)
+                event.time = event.time + (preciseTime - (actualTime + ticks))
+                ticks = _roundTicks(event.time)
+                actualTime = actualTime + ticks
+
+                varTime = encodeVarLength(ticks)
+                if event.type == "NoteOn":
+                    data += varTime
+                    statusByte = 0x9 << 4 | event.channel
+                    if statusByte != status:
+                        data += packChannel3(statusByte, event.pitch,
+                                             event.volume)
+                        status = statusByte if runningStatus else None
+                    else:
+                        data += packChannel2(event.pitch, event.volume)
+                elif event.type == "NoteOff":
+                    data += varTime
+                    if noteOffAsNoteOn:
+                        statusByte = 0x9 << 4 | event.channel
+                        volume = 0
+                    else:
+                        statusByte = 0x8 << 4 | event.channel
+                        volume = event.volume
+                    if statusByte != status:
+                        data += packChannel3(statusByte, event.pitch, volume)
+                        status = statusByte if runningStatus else None
+                    else:
+                        data += packChannel2(event.pitch, volume)
+                elif event.type == "Tempo":
+                    data += varTime
+                    status = None
+                    # The tempo is a three byte quantity; it shares a word
+                    # with the length byte and any higher bits are discarded.
+                    data += _TEMPO_STRUCT.pack(
+                        0xFF, 0x51, (0x03 << 24) | (event.tempo & 0xFFFFFF))
+                elif event.type == "Text":
+                    data += varTime
+                    status = None
+                    data += _META_STRUCT.pack(0xFF, 0x01)
+                    data += encodeVarLength(len(event.text))
+                    data += event.text
+                elif event.type == "Copyright":
+                    data += varTime
+                    status = None
+                    data += _META_STRUCT.pack(0xFF, 0x02)
+                    data += encodeVarLength(len(event.notice))
+                    data += event.notice
+                elif event.type == "TimeSignature":
+                    data += varTime
+                    status = None
+                    # The last data byte is the number of 32nd notes per
+                    # quarter note.
+                    data += _TIME_SIGNATURE_STRUCT.pack(
+                        0xFF, 0x58, 0x04, event.numerator, event.denominator,
+                        event.clocks_per_tick, event.notes_per_quarter)
+                elif event.type == "KeySignature":
+                    data += varTime
+                    status = None
+                    data += _KEY_SIGNATURE_STRUCT.pack(0xFF, 0x59, 0x02,
+                                                       event.accidentals *
+                                                       event.accidental_type,
+                                                       event.mode)
+                elif event.type == 'ProgramChange':
+                    data += varTime
+                    statusByte = 0xC << 4 | event.channel
+                    if statusByte != status:
+                        data += packChannel2(statusByte, event.programNumber)
+                        status = statusByte if runningStatus else None
+                    else:
+                        data.append(event.programNumber)
+                elif event.type == 'TrackName':
+                    data += varTime
+                    status = None
+                    data += _META_STRUCT.pack(0xFF, 0x03)
+                    data += encodeVarLength(len(event.trackName))
+                    data += event.trackName
+                elif event.type == "ControllerEvent":
+                    data += varTime
+                    statusByte = 0xB << 4 | event.channel
+                    if statusByte != status:
+                        data += packChannel3(statusByte,
+                                             event.controller_number,
+                                             event.parameter)
+                        status = statusByte if runningStatus else None
+                    else:
+                        data += packChannel2(event.controller_number,
+                                             event.parameter)
+                elif event.type == 'PitchWheelEvent':
+                    data += varTime
+                    MSB = (event.pitch_wheel_value + 8192) >> 7
+                    LSB = (event.pitch_wheel_value + 8192) & 0x7F
+                    statusByte = 0xE << 4 | event.channel
+                    if statusByte != status:
+                        data += packChannel3(statusByte, LSB, MSB)
+                        status = statusByte if runningStatus else None
+                    else:
+                        data += packChannel2(LSB, MSB)
+                elif event.type == "SysEx":
+                    data += varTime
+                    status = None
+                    data.append(0xF0)
+                    data += encodeVarLength(len(event.payload) + 2)
+                    data.append(event.manID)
+                    data += event.payload
+                    data.append(0xF7)
+                elif event.type == "UniversalSysEx":
+                    data += varTime
+                    status = None
+                    data.append(0xF0)
+                    data += encodeVarLength(len(event.payload) + 5)
+                    data += _UNIVERSAL_SYSEX_STRUCT.pack(
+                        0x7F if event.realTime else 0x7E, event.sysExChannel,
+                        event.code, event.subcode)
+                    data += event.payload
+                    data.append(0xF7)
+
+            yield data
+
+        self.encoderState = (preciseTime, actualTime, status)
 
     def deInterleaveNotes(self):
         '''
@@ -764,34 +1670,7 @@ class MIDITrack(object):
         MIDIEventList has been time-ordered.
         '''
 
-        tempEventList = []
-        stack = {}
-        
-        for event in self.MIDIEventList:
-            
-            if event.type == 'NoteOn':
-                if str(event.pitch)+str(event.channel) in stack:
-                    stack[str(event.pitch)+str(event.channel)].append(event.time)
-                else:
-                    stack[str(event.pitch)+str(event.channel)] = [event.time]
-                tempEventList.append(event)
-            elif event.type == 'NoteOff':
-                if len(stack[str(event.pitch)+str(event.channel)]) > 1:
-                    event.time = stack[str(event.pitch)+str(event.channel)].pop()
-                    tempEventList.append(event)
-                else:
-                    stack[str(event.pitch)+str(event.channel)].pop()
-                    tempEventList.append(event)
-            else:
-                tempEventList.append(event)
-                    
-        self.MIDIEventList = tempEventList
-        
-        # Note that ``processEventList`` makes the ordinality of a note off event
-        # a bit lower than the note on event, so this sort will make concomitant
-        # note off events processed first.
-        
-        self.MIDIEventList.sort(key=sort_events)
+        self.MIDIEventList = _deInterleave(self.MIDIEventList)
 
     def adjustTimeAndOrigin(self, origin, adjust):
         '''
@@ -801,10 +1680,14 @@ class MIDITrack(object):
         are converted to relative values here.
         '''
 
+        internal_origin = origin if adjust else 0.0
+        self.encodedOrigin = internal_origin
         if len(self.MIDIEventList) == 0:
+            self.encodedEnd = None
             return
+        last = self.MIDIEventList[-1]
+        self.encodedEnd = (last.time, last.sortKey)
         tempEventList = []
-        internal_origin = origin if adjust else 0.0
         runningTime = 0
 
         for event in self.MIDIEventList:
@@ -820,9 +1703,66 @@ class MIDITrack(object):
         Write track to disk.
         '''
 
-        fileHandle.write(self.headerString)
-        fileHandle.write(self.dataLength)
-        fileHandle.write(self.MIDIdata)
+        for data in self.buffers():
+            fileHandle.write(data)
+
+    def buffers(self):
+        '''
+        Return the pieces of the closed track's chunk (its header, length
+        and encoded data), in the order they are written.
+        '''
+        return [self.headerString, self.dataLength, self.MIDIdata]
+
+    def streamTrack(self, fileHandle, batchSize=None):
+        '''
+        Encode the track and write it to disk a piece at a time.
+
+        The events of the MIDIEventList (which should have been converted to
+        relative times by ``adjustTimeAndOrigin()``) are encoded
+        ``batchSize`` at a time and written straight away, so the encoded
+        track is never held in memory as a whole. The length of the chunk is
+        filled in afterwards if the file is seekable; if it is not, the
+        events are encoded twice, the first time only to find the length.
+        The MIDIEventList is emptied once the track has been written.
+        '''
+        if self.copySource:
+            fileHandle.write(self.headerString)
+            fileHandle.write(struct.pack('>L', len(self.sourceData)))
+            fileHandle.write(self.sourceData)
+            return
+
+        batchSize = batchSize or _STREAM_BATCH_SIZE
+        endLength = len(_END_OF_TRACK)
+
+        if _isSeekable(fileHandle):
+            start = fileHandle.tell()
+            fileHandle.write(self.headerString)
+            fileHandle.write(struct.pack('>L', 0))
+            length = endLength
+            for data in self.encodeEvents(batchSize):
+                fileHandle.write(data)
+                length += len(data)
+            fileHandle.write(_END_OF_TRACK)
+            end = fileHandle.tell()
+            fileHandle.seek(start + len(self.headerString))
+            fileHandle.write(struct.pack('>L', length))
+            fileHandle.seek(end)
+        else:
+            # Encoding corrects the event times for round-off, so they are
+            # put back as they were before the second pass.
+            times = [event.time for event in self.MIDIEventList]
+            length = endLength + sum(len(data) for data in
+                                     self.encodeEvents(batchSize))
+            for (event, time) in zip(self.MIDIEventList, times):
+                event.time = time
+            del times
+            fileHandle.write(self.headerString)
+            fileHandle.write(struct.pack('>L', length))
+            for data in self.encodeEvents(batchSize):
+                fileHandle.write(data)
+            fileHandle.write(_END_OF_TRACK)
+
+        self.MIDIEventList = []
 
 
 class MIDIHeader(object):
@@ -848,11 +1788,205 @@ class MIDIHeader(object):
         self.ticksPerBeat = struct.pack('>H', TICKSPERBEAT)
 
     def writeFile(self, fileHandle):
-        fileHandle.write(self.headerString)
-        fileHandle.write(self.headerSize)
-        fileHandle.write(self.format)
-        fileHandle.write(self.numTracks)
-        fileHandle.write(self.ticksPerBeat)
+        for data in self.buffers():
+            fileHandle.write(data)
+
+    def buffers(self):
+        '''
+        Return the pieces of the header chunk, in the order they are written.
+        '''
+        return [self.headerString, self.headerSize, self.format,
+                self.numTracks, self.ticksPerBeat]
+
+
+class MIDIProducer(object):
+    '''
+    A buffer through which one thread adds events to a :class:`MIDIFile`,
+    made by :meth:`MIDIFile.producer`.
+
+    A producer has the methods of the MIDIFile that add events (``addNote``,
+    ``addNotes``, ``addTempo``, ``addControllerEvent`` and so on), taking
+    the same arguments. The calls are recorded rather than made, without
+    touching the file or anything shared with the other producers, and are
+    made on the file when it is merged (see :meth:`MIDIFile.mergeProducers`).
+    The arguments are kept until then, so sequences passed to ``addNotes``
+    should not be changed in the meantime.
+
+    A producer should only be used by one thread at a time.
+    '''
+
+    def __init__(self, key):
+        self.key = key
+        self.calls = []
+        # Held only while a call is recorded or the calls are taken, so it
+        # is only ever waited for while the file is being merged.
+        self.lock = threading.Lock()
+
+    def takeCalls(self):
+        '''
+        Return the calls recorded, as (method name, args, kwargs) tuples, and
+        start recording afresh.
+        '''
+        with self.lock:
+            (calls, self.calls) = (self.calls, [])
+        return calls
+
+
+def _recordCall(name):
+    '''
+    Return a MIDIProducer method that records a call of the MIDIFile method
+    ``name``.
+    '''
+    def record(self, *args, **kwargs):
+        with self.lock:
+            self.calls.append((name, args, kwargs))
+    record.__name__ = name
+    record.__doc__ = 'Record a call of :meth:`MIDIFile.%s`.' % name
+    return record
+
+
+for _name in ('addNote', 'addNotes', 'addTrackName', 'addTimeSignature',
+              'addTempo', 'addCopyright', 'addKeySignature', 'addText',
+              'addProgramChange', 'addControllerEvent', 'addPitchWheelEvent',
+              'makeRPNCall', 'makeNRPNCall', 'changeTuningBank',
+              'changeTuningProgram', 'changeNoteTuning', 'addSysEx',
+              'addUniversalSysEx'):
+    setattr(MIDIProducer, _name, _recordCall(_name))
+del _name
+
+
+class PhaseRecord(object):
+    '''
+    The record of one phase of closing or writing a :class:`MIDIFile`, made
+    by :class:`CloseProfile`.
+
+    ``phase`` is the name of the phase, ``track`` the index of the track in
+    the file's list of tracks (``None`` for a phase of the whole file),
+    ``seconds`` the wall time it took, ``events`` the number of events it
+    left (the events and notes in the track after ``removeDuplicates``, MIDI
+    events after the later phases) and ``size`` the number of bytes it
+    produced.
+    '''
+
+    __slots__ = ('phase', 'track', 'seconds', 'events', 'size')
+
+    def __init__(self, phase, track, seconds, events=0, size=0):
+        self.phase = phase
+        self.track = track
+        self.seconds = seconds
+        self.events = events
+        self.size = size
+
+    def __repr__(self):
+        return ('PhaseRecord(%r, %r, %r, events=%r, size=%r)' %
+                (self.phase, self.track, self.seconds, self.events,
+                 self.size))
+
+
+class CloseProfile(object):
+    '''
+    A report of where the time goes when a :class:`MIDIFile` is closed and
+    written, made by passing ``profile`` to :meth:`MIDIFile.close` or
+    :meth:`MIDIFile.writeFile`.
+
+    ``records`` is the list of :class:`PhaseRecord` objects, in the order
+    the phases ran. The phases of the file are ``reopenTracks`` (finding the
+    tracks to close, and appending to those that allow it) and
+    ``findOrigin``; those of each track closed are ``removeDuplicates``,
+    ``processEventList`` (creating the MIDI events), ``sortEvents``
+    (sorting them, and with NumPy creating, sorting and de-interleaving the
+    notes of the note table), ``deInterleaveNotes``, ``adjustTimeAndOrigin``
+    and ``writeMIDIStream`` (encoding). Writing the file adds ``writeTrack``
+    for each track, or ``streamTrack`` when it is streamed.
+
+    If ``callback`` is given it is called with each record as it is made.
+    '''
+
+    def __init__(self, callback=None):
+        self.records = []
+        self.callback = callback
+        self.track = None  # The track whose phases are being recorded
+        self.lapStart = default_timer()
+
+    def add(self, record):
+        '''
+        Add a record to the report, and pass it to the callback.
+        '''
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def lap(self, phase, events=0, size=0):
+        '''
+        Record a phase of the current track as having taken the time since
+        the last phase ended.
+        '''
+        now = default_timer()
+        self.add(PhaseRecord(phase, self.track, now - self.lapStart, events,
+                             size))
+        self.lapStart = now
+
+    def seconds(self):
+        '''
+        Return the total time of the phases recorded.
+        '''
+        return sum(record.seconds for record in self.records)
+
+    def phaseTotals(self):
+        '''
+        Return an ordered dictionary of the phases, in the order they first
+        ran, each with a record of its total time, events and bytes over all
+        the tracks.
+        '''
+        totals = OrderedDict()
+        for record in self.records:
+            total = totals.get(record.phase)
+            if total is None:
+                total = totals[record.phase] = PhaseRecord(record.phase, None,
+                                                           0.0)
+            total.seconds += record.seconds
+            total.events += record.events
+            total.size += record.size
+        return totals
+
+    def trackTotals(self):
+        '''
+        Return an ordered dictionary of the total time of the phases of each
+        track, by track index (``None`` for the phases of the whole file).
+        '''
+        totals = OrderedDict()
+        for record in self.records:
+            totals[record.track] = (totals.get(record.track, 0.0) +
+                                    record.seconds)
+        return totals
+
+    def __str__(self):
+        total = self.seconds() or 1.0
+        lines = ['%-20s %10s %7s %10s %10s' % ('phase', 'seconds', 'share',
+                                              'events', 'bytes')]
+        for record in self.phaseTotals().values():
+            lines.append('%-20s %10.4f %6.1f%% %10d %10d' % (
+                record.phase, record.seconds, 100 * record.seconds / total,
+                record.events, record.size))
+        lines.append('%-20s %10.4f' % ('total', self.seconds()))
+        return '\n'.join(lines)
+
+
+def _makeProfile(profile):
+    '''
+    Return the CloseProfile for the ``profile`` argument of
+    ``MIDIFile.close()``: ``None`` if it is ``None`` or false, a new report
+    if it is ``True`` or a callback, or the report itself.
+    '''
+    if profile is None or profile is False:
+        return None
+    if isinstance(profile, CloseProfile):
+        profile.lapStart = default_timer()
+        profile.track = None
+        return profile
+    if profile is True:
+        return CloseProfile()
+    return CloseProfile(profile)
 
 
 class MIDIFile(object):
@@ -865,7 +1999,8 @@ class MIDIFile(object):
     '''
 
     def __init__(self, numTracks=1, removeDuplicates=True,  deinterleave=True,
-                 adjust_origin=None, file_format=1):
+                 adjust_origin=None, file_format=1, running_status=False,
+                 note_off_as_note_on=False):
         '''
 
             Initialize the MIDIFile class
@@ -882,6 +2017,14 @@ class MIDIFile(object):
             :param file_format: The format of the multi-track file. This should
                 either be ``1`` (the default, and the most widely supported
                 format) or ``2``.
+            :param running_status: If set to ``True`` the status byte of a
+                channel message is omitted when it repeats that of the message
+                before it ("running status"), which makes the file smaller
+            :param note_off_as_note_on: If set to ``True`` note off events are
+                written as note on events with a velocity of zero (which has
+                the same effect). Combined with ``running_status`` this lets
+                most of the notes on a channel share one status byte, at the
+                cost of the note off velocity.
 
             Note that the default for ``adjust_origin`` will change in a future
             release, so one should probably explicitly set it.
@@ -934,9 +2077,14 @@ class MIDIFile(object):
             self.adjust_origin = adjust_origin
 
         for i in range(0, self.numTracks):
-            self.tracks.append(MIDITrack(removeDuplicates,  deinterleave))
+            self.tracks.append(MIDITrack(removeDuplicates,  deinterleave,
+                                         running_status, note_off_as_note_on))
         # to keep track of the order of insertion for new sorting
         self.event_counter = 0
+        # The producers through which other threads add events (see
+        # producer()); the lock guards only the list.
+        self.producers = []
+        self.producerLock = threading.Lock()
 
     # Public Functions. These (for the most part) wrap the MIDITrack functions,
     # where most Processing takes place.
@@ -968,6 +2116,43 @@ class MIDIFile(object):
                                            insertion_order=self.event_counter)
         self.event_counter += 1
 
+    def addNotes(self, track, channels, pitches, times, durations, volumes):
+        """
+
+        Add many notes to the MIDIFile object at once
+
+        :param track: The track to which the notes are added.
+        :param channels: the MIDI channels of the notes. [Integers, 0-15]
+        :param pitches: the MIDI pitch numbers [Integers, 0-127].
+        :param times: the times (in beats) at which the notes sound [Floats].
+        :param durations: the durations of the notes (in beats) [Floats].
+        :param volumes: the volumes (velocities) of the notes.
+            [Integers, 0-127].
+
+        The note attributes are given as parallel sequences (lists, tuples,
+        arrays, NumPy arrays or other iterables), element ``i`` of each
+        describing note ``i``. Any of them may instead be a single value,
+        which then applies to every note. The result is the same as calling
+        ``addNote()`` for each note in turn, but the notes are stored
+        compactly, in a columnar table, and the per-note overhead is much
+        lower.
+
+        Notes added in this way are not placed in the track's ``eventList``,
+        and cannot carry an annotation.
+
+        As an example, the following adds a C major scale:
+
+        .. code:: python
+
+            MyMIDI.addNotes(0, 0, [60, 62, 64, 65, 67, 69, 71, 72],
+                            range(8), 1, 100)
+        """
+        if self.header.numeric_format == 1:
+            track += 1
+        self.event_counter += self.tracks[track].addNotes(
+            channels, pitches, times, durations, volumes,
+            insertion_order=self.event_counter)
+
     def addTrackName(self, track, time, trackName):
         """
         Name a track.
@@ -1426,22 +2611,288 @@ class MIDIFile(object):
                               insertion_order=self.event_counter)  # noqa: E128
         self.event_counter += 1
 
-    def writeFile(self, fileHandle):
+    def writeFile(self, fileHandle, workers=None, pool='process',
+                  stream=False, vectored=False, profile=None):
         '''
         Write the MIDI File.
 
         :param fileHandle: A file handle that has been opened for binary
             writing.
+        :param workers: If greater than one, the number of worker processes
+            (or threads) among which the tracks are closed and encoded. See
+            :meth:`close`.
+        :param pool: ``'process'`` (the default) or ``'thread'``, the kind of
+            worker to use.
+        :param stream: If ``True``, the tracks are processed and written one
+            at a time, so that only one track's MIDI events and encoded data
+            are held in memory at once. See :meth:`streamTracks`.
+        :param vectored: If ``True``, the chunks of the file are handed to
+            the operating system together, in a single vectored write
+            (``os.writev()``), rather than being written one buffer at a time.
+            This needs a file handle with a file descriptor and a platform
+            with ``writev()``; otherwise the buffers are written as usual.
+        :param profile: If given, the time spent closing and writing each
+            track is recorded, and the report is returned. See :meth:`close`
+            and :class:`CloseProfile`.
         '''
 
+        profile = _makeProfile(profile)
+
+        if stream:
+            if workers is not None and workers > 1:
+                raise ValueError("Error in MIDIFile: a file cannot be "
+                                 "streamed by more than one worker")
+            if vectored:
+                raise ValueError("Error in MIDIFile: a file cannot be "
+                                 "both streamed and written in one vectored "
+                                 "write")
+            self.header.writeFile(fileHandle)
+            self.streamTracks(fileHandle, profile)
+            return profile
+
+        if vectored:
+            _writeVectored(fileHandle, self.buffers(workers, pool, profile))
+            if profile is not None:
+                profile.track = None
+                profile.lap('writeFile', 0, sum(len(track.MIDIdata) + 8
+                                                for track in self.tracks))
+            return profile
+
         self.header.writeFile(fileHandle)
 
         # Close the tracks and have them create the MIDI event data structures.
-        self.close()
+        self.close(workers, pool, profile)
 
         # Write the MIDI Events to file.
         for i in range(0, self.numTracks):
             self.tracks[i].writeTrack(fileHandle)
+            if profile is not None:
+                profile.track = i
+                profile.lap('writeTrack', 0, len(self.tracks[i].MIDIdata) + 8)
+        return profile
+
+    def writeAsync(self, stream, executor=None, profile=None):
+        '''
+        Write the MIDI file to an asyncio stream without blocking the event
+        loop. The tracks are closed and encoded in ``executor`` (by default a
+        thread of their own) and each is written to ``stream`` as soon as it
+        is ready, awaiting ``stream.drain()`` if it has one; see
+        :func:`midiutil.MidiFileAsync.writeAsync`. Returns a coroutine, and
+        needs Python 3.5 or later.
+
+        Example:
+
+        .. code:: python
+
+            async def handle(reader, writer):
+                await MyMIDI.writeAsync(writer)
+                writer.close()
+        '''
+        from midiutil.MidiFileAsync import writeAsync
+        return writeAsync(self, stream, executor, profile)
+
+    def buffers(self, workers=None, pool='process', profile=None):
+        '''
+        Close the file and return the buffers that make it up, in the order
+        they are written: the pieces of the header chunk followed by those of
+        each track (see :meth:`MIDITrack.buffers`).
+
+        The buffers are those the file keeps, not copies, so they are only
+        valid until events are next added to the file. ``workers``, ``pool``
+        and ``profile`` are as for :meth:`close`.
+        '''
+        self.close(workers, pool, profile)
+        buffers = self.header.buffers()
+        for track in self.tracks:
+            buffers.extend(track.buffers())
+        return buffers
+
+    def toBytes(self, workers=None, pool='process'):
+        '''
+        Return the contents of the MIDI file.
+
+        The size of the file is found from its encoded chunks, and each is
+        copied once into a ``bytearray`` of exactly that size, rather than
+        being written through a ``BytesIO`` (which copies the data in and
+        then out again). The ``bytearray`` is returned as it is, and can be
+        used wherever ``bytes`` can. ``workers`` and ``pool`` are as for
+        :meth:`close`.
+
+        Example:
+
+        .. code:: python
+
+            data = MyMIDI.toBytes()
+        '''
+        buffers = self.buffers(workers, pool)
+        data = bytearray(sum(len(buffer) for buffer in buffers))
+        position = 0
+        for buffer in buffers:
+            end = position + len(buffer)
+            data[position:end] = buffer
+            position = end
+        return data
+
+    def encodingStats(self, workers=None, pool='process'):
+        '''
+        Close the file and return statistics of its encoded size, as
+        :func:`encodingStats` finds them: an :class:`EncodingStats` for the
+        whole file and a list of one for each track. ``workers`` and ``pool``
+        are as for :meth:`close`.
+        '''
+        self.close(workers, pool)
+        tracks = [trackEncodingStats(track.MIDIdata) for track in self.tracks]
+        return _totalStats(tracks), tracks
+
+    def estimateSize(self):
+        '''
+        Estimate the size of the file in bytes, without closing or encoding
+        it.
+
+        Tracks encoded by an earlier write that have not changed since are
+        counted exactly; the others are estimated from their events (see
+        :meth:`MIDITrack.estimateSize`).
+        '''
+        if self.producers:
+            self.mergeProducers()
+        origin = self.findEventOrigin() if self.adjust_origin else 0.0
+        return (sum(len(data) for data in self.header.buffers()) +
+                sum(track.estimateSize(origin) for track in self.tracks))
+
+    def streamTracks(self, fileHandle, profile=None):
+        '''
+        Process, encode and write the tracks to disk one at a time.
+
+        Where :meth:`close` keeps the MIDI events and encoded data of every
+        track until the file is written, here each track is written as soon
+        as it has been processed, and its MIDI events are then freed. The
+        encoded data is written out as it is produced (see
+        :meth:`MIDITrack.streamTrack`). Peak memory is therefore set by the
+        largest track rather than by the whole file.
+
+        The file is not closed: the tracks keep the events added to them, so
+        more can be added and the file written again. Tracks that were closed
+        by an earlier :meth:`close` and have not changed since are written as
+        they were encoded then.
+
+        The phases are recorded in ``profile``, if it is given, as for
+        :meth:`close`; the encoding and writing of a track is recorded as
+        its ``streamTrack`` phase.
+        '''
+        if self.producers:
+            self.mergeProducers()
+        origin = self.reopenTracks()
+        if origin is None:
+            origin = self.findEventOrigin() if self.adjust_origin else 0.0
+        if profile is not None:
+            profile.lap('reopenTracks')
+
+        for (index, track) in enumerate(self.tracks):
+            if profile is not None:
+                profile.track = index
+            if track.closed:
+                track.writeTrack(fileHandle)
+                if profile is not None:
+                    profile.lap('writeTrack', 0, len(track.MIDIdata) + 8)
+                continue
+            track.closeTrack(profile)
+            track.adjustTimeAndOrigin(origin, self.adjust_origin)
+            count = len(track.MIDIEventList)
+            if profile is not None:
+                profile.lap('adjustTimeAndOrigin', count)
+            track.streamTrack(fileHandle)
+            if profile is not None:
+                profile.lap('streamTrack', count)
+            track.closed = False
+
+    @classmethod
+    def fromBytes(cls, data, removeDuplicates=True, deinterleave=True,
+                  adjust_origin=False, running_status=False,
+                  note_off_as_note_on=False):
+        '''
+        Create a MIDIFile from the contents of a standard MIDI file.
+
+        :param data: The contents of the file, as any object supporting the
+            buffer protocol (``bytes``, ``bytearray``, ``memoryview``,
+            ``mmap``, ...). It is parsed in place rather than copied
+            (except on Python 2, where a buffer cannot be viewed as integers
+            without copying it, so it is copied once).
+
+        The other parameters are as for the constructor, except that
+        ``adjust_origin`` defaults to ``False``, so that the events keep the
+        times they have in the file.
+
+        The file's format and tracks are kept: in a format 1 file the first
+        track is the tempo track, and track 0 is the second track in the file,
+        just as for a MIDIFile created with ``file_format=1``. Times are
+        converted from the file's ticks to beats. Notes are rebuilt from
+        their note on and note off events (a note on with a velocity of zero
+        counts as a note off) and are put in the tracks' note tables, as if
+        added with :meth:`addNotes`; a note that is never turned off ends
+        with its track. Events that MIDIFile cannot create (such as
+        aftertouch, or meta events other than those it writes) are skipped,
+        as are note off velocities.
+
+        Each track also keeps the data it was read from. Until events are
+        added to it, that data is written out unchanged in place of the
+        encoded track (including any events that were skipped), which makes
+        writing a file with a few changed tracks much faster. This needs the
+        file to have the same number of ticks per beat as MIDIFile writes,
+        and its tracks to not be shifted in time (see
+        :meth:`reopenTracks`).
+
+        Example:
+
+        .. code::
+
+            with open("mymidifile.midi", 'rb') as input_file:
+                MyMIDI = MIDIFile.fromBytes(input_file.read())
+        '''
+        # Converted once, and read from throughout.
+        view = _byteView(data)
+        (file_format, division, chunks) = readChunks(view)
+        if file_format not in (0, 1, 2):
+            raise ValueError("Error in MIDIFile: unknown file format %d" %
+                             file_format)
+        if division & 0x8000:
+            raise ValueError("Error in MIDIFile: SMPTE time division is not "
+                             "supported")
+        if division == 0 or len(chunks) == 0:
+            raise ValueError("Error in MIDIFile: the file has no tracks or "
+                             "no time division")
+
+        numTracks = len(chunks) - 1 if file_format == 1 else len(chunks)
+        midiFile = cls(numTracks, removeDuplicates, deinterleave,
+                       adjust_origin, file_format, running_status,
+                       note_off_as_note_on)
+        for (track, (start, end)) in zip(midiFile.tracks, chunks):
+            midiFile.event_counter = _readTrack(track, view, start, end,
+                                                division,
+                                                midiFile.event_counter)
+            # The track's data can be written again as it is only if its
+            # times are in the same units, and it is properly ended.
+            if (division == TICKSPERBEAT and
+                    view[max(end - 3, start):end] == _END_OF_TRACK[1:]):
+                track.setSource(bytes(view[start:end]))
+        return midiFile
+
+    @classmethod
+    def read(cls, fileHandle, **kwargs):
+        '''
+        Create a MIDIFile from a standard MIDI file.
+
+        :param fileHandle: A file handle that has been opened for binary
+            reading.
+
+        The file is memory-mapped where that is possible, so that it is
+        parsed without first being read into memory; otherwise it is read.
+        The keyword arguments are passed on to :meth:`fromBytes`.
+        '''
+        data = _mapFile(fileHandle)
+        try:
+            return cls.fromBytes(data, **kwargs)
+        finally:
+            _unmapFile(data)
 
     def shiftTracks(self,  offset=0):
         """Shift tracks to be zero-origined, or origined at offset.
@@ -1458,6 +2909,8 @@ class MIDIFile(object):
                     for event in track.eventList:
                         if event.time < origin:
                             origin = event.time
+                if len(track.noteTable) > 0:
+                    origin = min(origin, min(track.noteTable.times))
 
         for track in self.tracks:
             tempEventList = []
@@ -1471,35 +2924,243 @@ class MIDIFile(object):
                 tempEventList.append(event)
 
             track.eventList = tempEventList
+            track.noteTable.shift(origin, offset)
+            if origin != offset:
+                # The times have changed without any events being added, so
+                # the track must be closed again from them.
+                track.invalidate()
 
     # End Public Functions ########################
 
-    def close(self):
+    def producer(self, key=None):
+        '''
+        Return a :class:`MIDIProducer`, through which a thread can add events
+        to the file alongside other threads.
+
+        The methods of the MIDIFile that add events are not thread-safe: the
+        insertion order that puts events at the same time in order is a
+        counter shared by every track. Each producer instead keeps the calls
+        made on it to itself, and they are made on the file when it is next
+        closed or written (see :meth:`mergeProducers`). The producers are
+        merged in the order of their ``key`` (which defaults to the number
+        of producers made before) and then of their creation, so the file
+        written does not depend on how the threads ran. If the threads make
+        their own producers, they should give them keys that identify them,
+        such as the index of the thread.
+
+        Example:
+
+        .. code:: python
+
+            def generate(producer, part):
+                for beat in range(64):
+                    producer.addNote(part, 0, 60 + part, beat, 1, 100)
+
+            threads = [threading.Thread(target=generate,
+                                        args=(MyMIDI.producer(part), part))
+                       for part in range(4)]
+        '''
+        with self.producerLock:
+            if key is None:
+                key = len(self.producers)
+            producer = MIDIProducer(key)
+            self.producers.append(producer)
+        return producer
+
+    def mergeProducers(self):
+        '''
+        Make the calls recorded by the file's producers on the file itself,
+        one producer at a time in the order of their keys, and each in the
+        order the calls were made. This is done before the file is closed or
+        written.
+
+        The producers are left empty, and can be used again; calls made on
+        them from now on are merged the next time. Errors in the arguments
+        of a call are raised here, when it is made.
+        '''
+        with self.producerLock:
+            producers = sorted(self.producers, key=attrgetter('key'))
+        for producer in producers:
+            for (name, args, kwargs) in producer.takeCalls():
+                getattr(self, name)(*args, **kwargs)
+
+    def close(self, workers=None, pool='process', profile=None):
         '''
         Close the MIDIFile for further writing.
 
         To close the File for events, we must close the tracks, adjust the time
         to be zero-origined, and have the tracks write to their MIDI Stream
         data structure.
+
+        The tracks are independent of each other once the origin is known, so
+        if ``workers`` is greater than one they are handed to a pool of that
+        many workers, which remove duplicates, create and de-interleave the
+        MIDI events and encode each track. ``pool`` is ``'process'`` (the
+        default) for a ``concurrent.futures.ProcessPoolExecutor`` or
+        ``'thread'`` for a ``ThreadPoolExecutor`` (on Python 2 this needs
+        the ``futures`` backport). The tracks are pickled to the worker
+        processes and only their encoded data is returned, so after a
+        parallel close with processes a track's ``MIDIdata`` is complete but
+        its ``MIDIEventList`` is not filled in. The data written is the same
+        in every case.
+
+        Events may still be added once the file has been closed. Closing it
+        again closes only the tracks that have changed, keeping the encoded
+        data of the others (see :meth:`reopenTracks`).
+
+        If ``profile`` is given, the time spent in each phase of the close is
+        recorded, for the file and for each track, and the report is
+        returned (see :class:`CloseProfile`). ``profile`` may be ``True``, a
+        function to be called with each record as it is made (to feed some
+        other metrics system), or a :class:`CloseProfile` to add the records
+        to. Without it nothing is recorded and ``None`` is returned.
         '''
 
-        if self.closed:
-            return
+        profile = _makeProfile(profile)
+        if self.producers:
+            self.mergeProducers()
+
+        if workers is not None and workers > 1:
+            self.closeParallel(workers, pool, profile)
+            self.closed = True
+            return profile
+
+        # Closing a track leaves its MIDIEventList sorted by time and then
+        # ordinality (so that things like program changes come before notes
+        # at the same time), so it is not sorted again here.
+
+        origin = self.reopenTracks()
+        tracks = [(index, track) for (index, track) in enumerate(self.tracks)
+                  if not track.closed]
+        if profile is not None:
+            profile.lap('reopenTracks')
+
+        for (index, track) in tracks:
+            if profile is not None:
+                profile.track = index
+            track.closeTrack(profile)
+
+        if origin is None:
+            if profile is not None:
+                profile.track = None
+            origin = self.findOrigin()
+            if profile is not None:
+                profile.lap('findOrigin')
+
+        for (index, track) in tracks:
+            track.adjustTimeAndOrigin(origin, self.adjust_origin)
+            if profile is not None:
+                profile.track = index
+                profile.lap('adjustTimeAndOrigin', len(track.MIDIEventList))
+            track.writeMIDIStream()
+            if profile is not None:
+                profile.lap('writeMIDIStream', len(track.MIDIEventList),
+                            len(track.MIDIdata))
 
-        for i in range(0, self.numTracks):
-            self.tracks[i].closeTrack()
-            # We want things like program changes to come before notes when
-            # they are at the same time, so we sort the MIDI events by their
-            # ordinality
-            self.tracks[i].MIDIEventList.sort(key=sort_events)
+        self.closed = True
+        return profile
+
+    def closeParallel(self, workers, pool, profile=None):
+        '''
+        Close the tracks in a pool of workers (see :meth:`close`).
 
-        origin = self.findOrigin()
+        The phases of closing each track are recorded in ``profile`` by the
+        worker that closes it, so their times are those of the worker.
+        '''
+        executorClass = _executorClass(pool)
+
+        origin = self.reopenTracks()
+        if origin is None:
+            origin = self.findEventOrigin() if self.adjust_origin else 0.0
+        if profile is not None:
+            profile.lap('reopenTracks')
+        tracks = [(index, track) for (index, track) in enumerate(self.tracks)
+                  if not track.closed]
+
+        def addRecords(index, records):
+            if profile is not None:
+                for record in records:
+                    record.track = index
+                    profile.add(record)
+
+        # Tracks written as they were read need no work.
+        for (index, track) in tracks:
+            if track.copySource:
+                addRecords(index, _closeTrack(track, origin,
+                                              self.adjust_origin,
+                                              profile is not None)[-1])
+        tracks = [(index, track) for (index, track) in tracks
+                  if not track.copySource]
+
+        with executorClass(max_workers=workers) as executor:
+            count = len(tracks)
+            results = executor.map(_closeTrack,
+                                   [track for (index, track) in tracks],
+                                   itertools.repeat(origin, count),
+                                   itertools.repeat(self.adjust_origin, count),
+                                   itertools.repeat(profile is not None,
+                                                    count))
+            for ((index, track), result) in zip(tracks, results):
+                addRecords(index, result[-1])
+                _setClosed(track, result,
+                           origin if self.adjust_origin else 0.0)
+
+        if profile is not None:
+            # The records of the workers overlap, so the time spent waiting
+            # for them is not recorded as well.
+            profile.track = None
+            profile.lapStart = default_timer()
+
+    def findEventOrigin(self):
+        '''
+        Find the earliest time in the file's tracks before they are closed.
 
-        for i in range(0, self.numTracks):
-            self.tracks[i].adjustTimeAndOrigin(origin, self.adjust_origin)
-            self.tracks[i].writeMIDIStream()
+        This is the value that :meth:`findOrigin` returns once the tracks
+        have been closed, found from the events and notes that have been
+        added (in ticks, as the MIDI events will be).
+        '''
+        origin = 1000000  # As in findOrigin()
 
-        self.closed = True
+        for track in self.tracks:
+            origin = min(origin, track.findEventOrigin())
+
+        return origin
+
+    def reopenTracks(self):
+        '''
+        Find the tracks that have to be closed before the file is written.
+
+        A track that has been closed keeps its encoded data, which is written
+        again for as long as no events are added to it and the origin of the
+        file does not change (see :meth:`MIDITrack.encodedFor`). If the
+        events added to it all come after those encoded, they are encoded
+        onto the end of its data (see :meth:`MIDITrack.appendEvents`).
+        Otherwise the track is reopened, to be closed again. The origin is
+        found from the origins of the tracks, which are remembered while they
+        are unchanged, so this is cheap when only a few tracks have changed.
+
+        A track read by :meth:`fromBytes` keeps the data it was read from,
+        and while no events are added to it that data is copied to the
+        output rather than the track being encoded (see
+        :meth:`MIDITrack.unmodified`). This is only done if the tracks are not
+        to be shifted in time: either the origin is not adjusted or it is
+        already zero.
+
+        Returns the origin of the file, as :meth:`findEventOrigin` finds it,
+        if any of its tracks have been closed or were read from a file, and
+        ``None`` otherwise.
+        '''
+        if not any(track.closed or track.sourceData is not None
+                   for track in self.tracks):
+            return None
+
+        origin = self.findEventOrigin() if self.adjust_origin else 0.0
+        for track in self.tracks:
+            if track.encodedFor(origin) or track.appendEvents(origin):
+                continue
+            track.reopen()
+            track.copySource = origin == 0 and track.unmodified()
+        return origin
 
     def findOrigin(self):
         '''
@@ -1521,6 +3182,302 @@ class MIDIFile(object):
         return origin
 
 
+class MIDIFileReader(object):
+    '''
+    A standard MIDI file, parsed lazily.
+
+    Only the header and the positions of the track chunks are read when the
+    object is created. The events of a track are decoded the first time the
+    track is asked for, and are then kept in a cache of limited size, from
+    which the tracks used least recently are dropped.
+
+    Example:
+
+    .. code::
+
+        with open("mymidifile.midi", 'rb') as input_file:
+            with MIDIFileReader.open(input_file) as reader:
+                for (tick, status, data1, data2) in reader[1]:
+                    ...
+    '''
+
+    def __init__(self, buffer, cacheSize=64 * 1024 * 1024):
+        '''
+        Index the chunks of a standard MIDI file.
+
+        :param buffer: The contents of the file, as any object supporting
+            the buffer protocol (``bytes``, ``bytearray``, ``memoryview``,
+            ``mmap``, ...). It is not copied, and must not change while the
+            reader is in use. (On Python 2, where a buffer cannot be viewed
+            as integers without copying it, it is copied once, here.)
+        :param cacheSize: The most memory, in bytes, that the decoded tracks
+            kept in the cache may use (as estimated by :meth:`eventsSize`).
+            ``None`` for no limit.
+        '''
+        self.buffer = buffer
+        # The buffer indexed as integers, which the tracks are read from.
+        self.data = _byteView(buffer)
+        (self.numeric_format, self.division,
+         self.chunks) = readChunks(self.data)
+        self.numTracks = len(self.chunks)
+        self.cacheSize = cacheSize
+        # The decoded tracks and their sizes, by track number, least recently
+        # used first.
+        self.cache = OrderedDict()
+        self.cachedSize = 0
+
+    @classmethod
+    def open(cls, fileHandle, cacheSize=64 * 1024 * 1024):
+        '''
+        Index the chunks of the file opened for binary reading as
+        ``fileHandle``, memory-mapping it where that is possible.
+
+        The file is unmapped by :meth:`close`, or when the reader is used as
+        a context manager, on leaving the ``with`` block.
+        '''
+        return cls(_mapFile(fileHandle), cacheSize)
+
+    def close(self):
+        '''
+        Empty the cache and release the file's memory map, if it has one.
+        '''
+        self.cache.clear()
+        self.cachedSize = 0
+        if isinstance(self.data, memoryview):
+            self.data.release()
+        _unmapFile(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.numTracks
+
+    def __getitem__(self, index):
+        return self.track(index)
+
+    def trackData(self, index):
+        '''
+        Return a view of the data of a track chunk, following the ``MTrk``
+        identifier and length written by :meth:`MIDITrack.writeTrack`. (On
+        Python 2 it is a copy of the track's data.)
+        '''
+        (start, end) = self.chunks[index]
+        return self.data[start:end]
+
+    def track(self, index):
+        '''
+        Return the events of a track, decoding them if they are not cached.
+
+        The events are a list of the (tick, status, data1, data2) tuples
+        yielded by ``readTrackEvents()``, except that the data of meta and
+        system exclusive events is copied to a ``bytes`` object, so that it
+        does not refer to the buffer.
+        '''
+        if index < 0:
+            index = index + self.numTracks
+        cache = self.cache
+        (events, size) = cache.pop(index, (None, 0))
+        if events is None:
+            (start, end) = self.chunks[index]
+            events = [(tick, status, data1, data2) if status < 0xF0
+                      else (tick, status, data1, bytes(data2))
+                      for (tick, status, data1, data2)
+                      in readTrackEvents(self.data, start, end)]
+            size = self.eventsSize(events)
+            if self.cacheSize is not None:
+                if size > self.cacheSize:
+                    return events
+                while cache and self.cachedSize + size > self.cacheSize:
+                    self.cachedSize -= cache.popitem(last=False)[1][1]
+            self.cachedSize += size
+        # The most recently used track is kept at the end.
+        cache[index] = (events, size)
+        return events
+
+    @staticmethod
+    def eventsSize(events):
+        '''
+        Estimate the memory used by a list of decoded events.
+
+        Every event is counted as a tuple and an integer tick; the data of
+        meta and system exclusive events is counted as well.
+        '''
+        size = sys.getsizeof(events) + len(events) * _DECODED_EVENT_SIZE
+        for event in events:
+            if event[1] >= 0xF0:
+                size += sys.getsizeof(event[3])
+        return size
+
+
+class EncodingStats(object):
+    '''
+    What the encoded size of one or more tracks is made of, as found by
+    :func:`trackEncodingStats`, :func:`encodingStats` or
+    :meth:`MIDIFile.encodingStats`.
+
+    ``size`` is the number of bytes of track data (not counting the eight
+    bytes of each chunk's header) in the ``tracks`` tracks counted.
+    ``sizes`` and ``counts`` give the bytes taken by, and the number of,
+    the events of each type, by the name of the type (``'NoteOn'``,
+    ``'ControllerEvent'``, ``'Tempo'``, ``'SysEx'``, ...). The bytes of an
+    event include its delta time and status byte. ``deltaWidths[n]`` is the
+    number of delta times written in ``n`` bytes. ``metaBytes`` and
+    ``sysExBytes`` are the bytes of the data of meta events and of system
+    exclusive events, less the bytes that introduce it.
+    '''
+
+    def __init__(self):
+        self.size = 0
+        self.tracks = 0
+        self.sizes = {}
+        self.counts = {}
+        self.deltaWidths = [0, 0, 0, 0, 0]
+        self.metaBytes = 0
+        self.sysExBytes = 0
+
+    def add(self, other):
+        '''
+        Add the statistics of other tracks to these.
+        '''
+        self.size += other.size
+        self.tracks += other.tracks
+        for (kind, size) in other.sizes.items():
+            self.sizes[kind] = self.sizes.get(kind, 0) + size
+        for (kind, count) in other.counts.items():
+            self.counts[kind] = self.counts.get(kind, 0) + count
+        for (width, count) in enumerate(other.deltaWidths):
+            if width >= len(self.deltaWidths):
+                self.deltaWidths.append(0)
+            self.deltaWidths[width] += count
+        self.metaBytes += other.metaBytes
+        self.sysExBytes += other.sysExBytes
+
+    def payloadShares(self):
+        '''
+        Return the fractions of the track data taken by the data of meta
+        events and by the data of system exclusive events.
+        '''
+        if self.size == 0:
+            return (0.0, 0.0)
+        return (self.metaBytes / self.size, self.sysExBytes / self.size)
+
+    def __str__(self):
+        lines = ['%-18s %10s %12s %7s' % ('event', 'count', 'bytes',
+                                          'share')]
+        for (kind, size) in sorted(self.sizes.items(),
+                                   key=lambda item: (-item[1], item[0])):
+            lines.append('%-18s %10d %12d %6.1f%%' % (
+                kind, self.counts[kind], size,
+                100.0 * size / (self.size or 1)))
+        lines.append('%-18s %10s %12d' % ('total', '', self.size))
+        lines.append('delta widths: ' + ', '.join(
+            '%d byte %d' % (width, count)
+            for (width, count) in enumerate(self.deltaWidths) if width > 0))
+        lines.append('payloads: meta %.1f%%, system exclusive %.1f%%' %
+                     tuple(100 * share for share in self.payloadShares()))
+        return '\n'.join(lines)
+
+
+class MIDIMetadata(object):
+    '''
+    The metadata of a standard MIDI file, as found by ``scanMetadata()``.
+
+    Times are in ticks from the start of the file; the number of ticks per
+    beat is given by ``division``.
+
+    * ``numeric_format``, ``division`` and ``numTracks``: from the header
+      (``numTracks`` is the number of track chunks actually found).
+    * ``trackNames``: the first track name in each track, or ``None``.
+    * ``copyrights``: the copyright notices, in the order found.
+    * ``tempos``: (tick, tempo) for each tempo event, in order of time, with
+      the tempo in microseconds per quarter note (as in :class:`Tempo`).
+    * ``timeSignatures``: (tick, numerator, denominator, clocks_per_tick,
+      notes_per_quarter) for each time signature, in order of time.
+    * ``keySignatures``: (tick, accidentals, accidental_type, mode) for each
+      key signature, in order of time.
+    * ``noteCounts`` and ``eventCounts``: the number of notes (note ons of
+      non-zero velocity) and of events in each track, not counting the end
+      of track events.
+    * ``ticks``: the length of the longest track.
+    * ``duration``: the length in beats, or ``None`` if the file uses SMPTE
+      time.
+    * ``seconds``: the length in seconds, following the tempo map.
+    '''
+
+    def __init__(self, numeric_format, division, numTracks):
+        self.numeric_format = numeric_format
+        self.division = division
+        self.numTracks = numTracks
+        self.trackNames = []
+        self.copyrights = []
+        self.tempos = []
+        self.timeSignatures = []
+        self.keySignatures = []
+        self.noteCounts = []
+        self.eventCounts = []
+        self.ticks = 0
+        self.duration = None
+        self.seconds = 0.0
+
+    def toSeconds(self, tick):
+        '''
+        Convert a time in ticks to seconds, following the tempo map.
+
+        The tempo is 120 beats per minute until the first tempo event. In a
+        format 2 file the tempo events of all the tracks are taken together.
+        '''
+        if self.division & 0x8000:
+            # SMPTE time: frames per second and ticks per frame.
+            framesPerSecond = 256 - (self.division >> 8)
+            return tick / (framesPerSecond * (self.division & 0xFF))
+        seconds = 0.0
+        previousTick = 0
+        tempo = 500000
+        for (tempoTick, newTempo) in self.tempos:
+            if tempoTick >= tick:
+                break
+            seconds += (tempoTick - previousTick) * tempo
+            previousTick = tempoTick
+            tempo = newTempo
+        seconds += (tick - previousTick) * tempo
+        return seconds / (1000000.0 * self.division)
+
+
+# The estimated size of an event decoded by MIDIFileReader.track(), not
+# counting the data of meta and system exclusive events.
+
+_DECODED_EVENT_SIZE = sys.getsizeof((0, 0, 0, 0)) + sys.getsizeof(1 << 20)
+
+
+def _mapFile(fileHandle):
+    '''
+    Return a read-only memory map of a file, or if the file cannot be mapped
+    its contents.
+    '''
+    try:
+        return mmap.mmap(fileHandle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, EnvironmentError, ValueError):
+        # Not a real file (or an empty one, which cannot be mapped).
+        return fileHandle.read()
+
+
+def _unmapFile(data):
+    '''
+    Close a memory map returned by ``_mapFile()``.
+    '''
+    if isinstance(data, mmap.mmap):
+        try:
+            data.close()
+        except BufferError:
+            # A view of the map is still held (by a traceback, say); the map
+            # is closed when that is freed.
+            pass
+
+
 def writeVarLength(i):
     '''
     Accept an input, and write a MIDI-compatible variable length stream
@@ -1529,27 +3486,418 @@ def writeVarLength(i):
     length quantities. These quantities are a stream of bytes. If the most
     significant bit is 1, then more bytes follow. If it is zero, then the
     byte in question is the last in the stream
+
+    The value is returned as a list of byte values. See ``encodeVarLength()``
+    for a faster, ``bytes``-returning equivalent for integer input.
     '''
     input = int(i+0.5)
-    output = [0, 0, 0, 0]
-    reversed = [0, 0, 0, 0]
-    count = 0
-    result = input & 0x7F
-    output[count] = result
-    count = count + 1
+    output = [input & 0x7F]
     input = input >> 7
     while input > 0:
-        result = input & 0x7F
-        result = result | 0x80
-        output[count] = result
-        count = count + 1
+        output.append(input & 0x7F | 0x80)
         input = input >> 7
+    if len(output) > 4:
+        raise ValueError("%s is too large for a MIDI variable length "
+                         "quantity" % i)
+    output.reverse()
+    return output
+
+
+# Almost all the delta times and payload lengths in a MIDI stream are
+# smaller than 16384, the limit of a two byte variable length quantity, so
+# their encodings are computed once, up front.
+
+_VAR_LENGTH_TABLE_SIZE = 16384
+_VAR_LENGTH_TABLE = tuple(bytes(bytearray(writeVarLength(value)))
+                          for value in range(_VAR_LENGTH_TABLE_SIZE))
+
+
+def encodeVarLength(value):
+    '''
+    Return the MIDI variable length quantity for an integer as ``bytes``.
+
+    This is the equivalent of ``writeVarLength()`` for integers; small values
+    are looked up in a pre-computed table.
+    '''
+    if 0 <= value < _VAR_LENGTH_TABLE_SIZE:
+        return _VAR_LENGTH_TABLE[value]
+    return bytes(bytearray(writeVarLength(value)))
+
+
+def _numpyColumn(column):
+    '''
+    Return a NoteTable column as a NumPy array, without copying it.
+    '''
+    return numpy.frombuffer(column, dtype=_NUMPY_TYPES[column.typecode])
+
+
+_NUMPY_TYPES = {
+    'B': 'u1',
+    'd': 'f8',
+    'q': 'i8',
+    'l': 'i%d' % array('l').itemsize,
+}
+
+
+# The end of track meta-event, written at the end of every track.
+
+_END_OF_TRACK = struct.pack('BBBB', 0x00, 0xFF, 0x2F, 0x00)
+
+# The number of events encoded at a time when a track is streamed to disk.
+
+_STREAM_BATCH_SIZE = 4096
+
+
+# The most buffers handed to a single os.writev() call.
+
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = -1
+if _IOV_MAX <= 0:
+    _IOV_MAX = 16  # The least that POSIX allows
+
+
+def _writeVectored(fileHandle, buffers):
+    '''
+    Write a list of buffers to a file, handing them to the operating system
+    in as few calls to ``os.writev()`` as it allows.
+
+    If the file has no file descriptor, or the platform no ``writev()``, the
+    buffers are written one at a time.
+    '''
+    writev = getattr(os, 'writev', None)
+    try:
+        fd = fileHandle.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        fd = None
+    if writev is None or fd is None:
+        for buffer in buffers:
+            fileHandle.write(buffer)
+        return
+
+    # Anything the file object has buffered must reach the file first.
+    flush = getattr(fileHandle, 'flush', None)
+    if flush is not None:
+        flush()
+
+    buffers = [buffer for buffer in buffers if len(buffer) > 0]
+    index = 0
+    while index < len(buffers):
+        written = writev(fd, buffers[index:index + _IOV_MAX])
+        # A write may stop part way through; the rest is written next.
+        while written > 0:
+            size = len(buffers[index])
+            if written < size:
+                buffers[index] = memoryview(buffers[index])[written:]
+                break
+            written -= size
+            index += 1
+
+
+def _isSeekable(fileHandle):
+    '''
+    Return ``True`` if the file can be written out of order.
+    '''
+    try:
+        return fileHandle.seekable()
+    except AttributeError:
+        # Python 2 files have no seekable(), but tell() fails on pipes
+        try:
+            fileHandle.tell()
+        except (AttributeError, IOError, OSError):
+            return False
+        return True
+
+
+def _executorClass(pool):
+    '''
+    Return the ``concurrent.futures`` executor class for a type of pool,
+    ``'process'`` or ``'thread'``.
+    '''
+    if pool not in ('process', 'thread'):
+        raise ValueError("Error in MIDIFile: Unknown pool type %s" % pool)
+    try:
+        from concurrent import futures
+    except ImportError:
+        raise ImportError("Error in MIDIFile: a pool of workers needs the "
+                          "concurrent.futures module (on Python 2, install "
+                          "the futures package)")
+    if pool == 'process':
+        return futures.ProcessPoolExecutor
+    return futures.ThreadPoolExecutor
+
+
+def _closeTrack(track, origin, adjust, profile=False):
+    '''
+    Close a track and encode its MIDI stream, returning the encoded data, its
+    packed length, where the encoding left off (for
+    ``MIDITrack.appendEvents()``) and, if ``profile`` is true, the records of
+    the phases of the close (see ``CloseProfile``). This is the work done by
+    each worker of a parallel ``MIDIFile.close()``.
+    '''
+    profile = CloseProfile() if profile else None
+    track.closeTrack(profile)
+    track.adjustTimeAndOrigin(origin, adjust)
+    if profile is not None:
+        profile.lap('adjustTimeAndOrigin', len(track.MIDIEventList))
+    track.writeMIDIStream()
+    if profile is not None:
+        profile.lap('writeMIDIStream', len(track.MIDIEventList),
+                    len(track.MIDIdata))
+    return (track.MIDIdata, track.dataLength, track.encoderState,
+            track.encodedEnd, profile.records if profile is not None else [])
+
+
+def _setClosed(track, result, origin):
+    '''
+    Give a track the result of ``_closeTrack()``, which may have been run on
+    a copy of it in another process, so that it is written from the encoded
+    data and kept until it changes.
+    '''
+    (track.MIDIdata, track.dataLength, track.encoderState,
+     track.encodedEnd) = result[:4]
+    track.closed = True
+    track.closedCounts = track.eventCounts()
+    track.encodedOrigin = origin
+
+
+def _eventSize(thing):
+    '''
+    Return the number of bytes, less the delta time, that an eventList item
+    other than a note or channel message is encoded in.
+    '''
+    kind = thing.type
+    if kind == 'tempo':
+        return 6
+    elif kind == 'TimeSignature':
+        return 7
+    elif kind == 'KeySignature':
+        return 5
+    elif kind in ('Text', 'Copyright', 'trackName'):
+        text = (thing.text if kind == 'Text' else thing.notice
+                if kind == 'Copyright' else thing.trackName)
+        return 2 + len(encodeVarLength(len(text))) + len(text)
+    elif kind == 'SysEx':
+        length = len(thing.payload) + 2
+        return 1 + len(encodeVarLength(length)) + length
+    elif kind == 'UniversalSysEx':
+        length = len(thing.payload) + 5
+        return 1 + len(encodeVarLength(length)) + length
+    raise ValueError("Error in MIDITrack: Unknown event type %s" % kind)
+
+
+def _timeBounds(things, times, durations):
+    '''
+    Return the earliest and latest times (in beats) of a list of eventList
+    items and of the notes with the given note table times and durations,
+    and whether all of those notes have a positive duration.
+    '''
+    earliest = float('inf')
+    latest = float('-inf')
+    positive = True
+    for thing in things:
+        if thing.time < earliest:
+            earliest = thing.time
+        if thing.time > latest:
+            latest = thing.time
+        if thing.type == 'note' and not thing.duration > 0:
+            positive = False
+    if len(times) > 0:
+        earliest = min(earliest, min(times))
+        latest = max(latest, max(times))
+        positive = positive and min(durations) > 0
+    return earliest, latest, positive
+
+
+def _deInterleave(events):
+    '''
+    Return a sorted list of MIDI events with interleaved notes corrected, as
+    described for ``MIDITrack.deInterleaveNotes()``.
+    '''
+    if not any(event.type == 'NoteOn' for event in events):
+        return events
+
+    tempEventList = []
+    movedEvents = []
+    # The times of the sounding notes, a stack for each channel and pitch.
+    # Valid MIDI values index a flat table of 16 * 128 entries, whose stacks
+    # are made when their pitch is first played; anything else is kept
+    # apart, so it cannot share a stack.
+    stacks = [None] * (16 * 128)
+    otherStacks = {}
+
+    for event in events:
+        eventType = event.type
+        if eventType != 'NoteOn' and eventType != 'NoteOff':
+            tempEventList.append(event)
+            continue
+
+        channel = event.channel
+        pitch = event.pitch
+        if 0 <= channel < 16 and 0 <= pitch < 128:
+            index = channel * 128 + pitch
+            stack = stacks[index]
+            if stack is None:
+                stack = stacks[index] = []
+        else:
+            stack = otherStacks.setdefault((channel, pitch), [])
+
+        if eventType == 'NoteOn':
+            stack.append(event.time)
+            tempEventList.append(event)
+        elif len(stack) > 1:
+            time = stack.pop()
+            if time != event.time:
+                event.time = time
+                movedEvents.append(event)
+            else:
+                tempEventList.append(event)
+        else:
+            # A note off with no note on before it (as happens for a note
+            # of zero duration) is left as it is.
+            if stack:
+                stack.pop()
+            tempEventList.append(event)
+
+    # Only the note off events that were moved have to be put back in
+    # order; the rest of the list is still sorted. A note off is only
+    # ever moved earlier, so merging them back in gives the same order as
+    # sorting the whole list again would. Note that ``processEventList``
+    # makes the ordinality of a note off event a bit lower than the note
+    # on event, so concomitant note off events are processed first.
+
+    setSortKeys(movedEvents)
+    movedEvents.sort(key=_sortKey)
+    return _mergeEvents(tempEventList, movedEvents)
+
+
+def _deInterleaveTimes(times, isNoteOff, voices):
+    '''
+    A NumPy version of the time correction made by ``_deInterleave()``, for
+    the note events of the note table.
+
+    ``times``, ``isNoteOff`` and ``voices`` (a distinct integer for each
+    channel and pitch) are arrays describing the events in sorted order.
+    Returns the corrected times, or ``None`` if some note off has no note on
+    before it, in which case ``_deInterleave()`` must be used.
+
+    For each voice the note on events push their time onto a stack and the
+    note off events pop it. A note off that pops from a stack of depth d
+    pops the time of the last note on that pushed to depth d, so sorting
+    the events by (voice, depth) puts each note off right after its note on.
+    If the depth is more than one the note off takes that note on's time.
+    '''
+    count = len(times)
+    order = numpy.argsort(voices, kind='stable')
+    steps = numpy.where(isNoteOff[order], -1, 1)
+    depths = numpy.cumsum(steps)
+    # Restart the count at the first event of each voice.
+    sortedVoices = voices[order]
+    starts = numpy.flatnonzero(numpy.concatenate(
+        ([True], sortedVoices[1:] != sortedVoices[:-1])))
+    lengths = numpy.diff(numpy.append(starts, count))
+    depths -= numpy.repeat(depths[starts] - steps[starts], lengths)
+    if depths.min() < 0:
+        return None
+
+    # The depth a note on pushes to, or a note off pops from. Within a
+    # voice and depth the events alternate, each note on followed by the
+    # note off that pops it.
+    levels = depths + (steps < 0)
+    byLevel = numpy.lexsort((numpy.arange(count), levels, sortedVoices))
+    noteOffs = numpy.flatnonzero(steps[byLevel] < 0)
+    noteOffs = noteOffs[levels[byLevel[noteOffs]] > 1]
+    times = times.copy()
+    times[order[byLevel[noteOffs]]] = times[order[byLevel[noteOffs - 1]]]
+    return times
+
+
+def _mergeEvents(first, second):
+    '''
+    Merge two lists of MIDI events, each already sorted by their
+    ``sortKey``.
+
+    Events that sort equally keep their order, those of ``first`` coming
+    before those of ``second``.
+    '''
+    if not first:
+        return second
+    if not second:
+        return first
+    # Timsort finds the two sorted runs and merges them in linear time.
+    merged = first + second
+    merged.sort(key=_sortKey)
+    return merged
+
+
+# The key function for sorting MIDI events once setSortKeys() has been called.
+
+_sortKey = attrgetter('sortKey')
+
+_SIGN_BIT = 1 << 63
+_MAGNITUDE_MASK = _SIGN_BIT - 1
+
 
-    reversed[0] = output[3]
-    reversed[1] = output[2]
-    reversed[2] = output[1]
-    reversed[3] = output[0]
-    return reversed[4-count:4]
+def _orderedBits(values):
+    '''
+    Return the bit patterns of a list of floats as signed 64 bit integers
+    that compare in the same way as the floats themselves.
+
+    The pattern of a non-negative float already does; for negative values the
+    magnitude bits are inverted, and negative zero is made equal to zero.
+    '''
+    count = len(values)
+    bits = struct.unpack('<%dq' % count, struct.pack('<%dd' % count, *values))
+    if count == 0 or min(bits) >= 0:
+        return bits
+    return [bit if bit >= 0 else
+            (bit ^ _MAGNITUDE_MASK if bit != -_SIGN_BIT else 0)
+            for bit in bits]
+
+
+def _orderedBitsArray(values):
+    '''
+    A NumPy version of ``_orderedBits()``, taking and returning arrays.
+    '''
+    bits = numpy.ascontiguousarray(values, dtype=numpy.float64).view(
+        numpy.int64)
+    negative = bits < 0
+    if negative.any():
+        bits = numpy.where(negative, bits ^ _MAGNITUDE_MASK, bits)
+        bits[bits == -1] = 0
+    return bits
+
+
+def setSortKeys(events):
+    '''
+    Give each of a list of MIDI events a packed integer ``sortKey``.
+
+    The key orders the events exactly as ``sort_events()`` does -- by time,
+    then ordinal, then insertion order -- but sorting on it is a single
+    integer comparison per pair of events, and no tuple is created for each
+    event on every sort. The time and the ordinal are packed as the ordered
+    bits of the floats (so fractional tick times sort correctly) and the
+    insertion order must fit in a signed 64 bit integer.
+    '''
+    times = _orderedBits([event.time for event in events])
+    ordinals = _orderedBits([event.ord for event in events])
+    for (event, time, ordinal) in zip(events, times, ordinals):
+        event.sortKey = (time << 128) + (ordinal << 64) + event.insertion_order
+
+
+def _roundTicks(time):
+    '''
+    Round a time in ticks to the integer written to the stream.
+
+    This is the value that ``readVarLength()`` would recover from
+    ``writeVarLength(time)``: the time rounded half up. (Only the low seven
+    bits of a negative value survive ``writeVarLength()``.)
+    '''
+    ticks = int(time + 0.5)
+    if ticks < 0:
+        ticks = ticks & 0x7F
+    return ticks
 
 
 # readVarLength is taken from the MidiFile class.
@@ -1561,18 +3909,606 @@ def readVarLength(offset, buffer):
     It returns a tuple of the value read and the number of bytes processed. The
     input is an offset into the buffer, and the buffer itself.
     '''
+    if sys.version_info[0] < 3 and not isinstance(buffer, bytearray):
+        # _byteView() copies the whole buffer on Python 2, which would make
+        # reading a run of values one at a time quadratic; read the bytes
+        # in place instead.
+        data = None
+    else:
+        data = _byteView(buffer)
     toffset = offset
     output = 0
-    bytesRead = 0
     while True:
-        output = output << 7
-        byte = struct.unpack_from('>B', buffer, toffset)[0]
+        if data is None:
+            byte = struct.unpack_from('>B', buffer, toffset)[0]
+        else:
+            byte = data[toffset]
         toffset = toffset + 1
-        bytesRead = bytesRead + 1
-        output = output + (byte & 127)
-        if (byte & 128) == 0:
+        output = (output << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            break
+    return (output, toffset - offset)
+
+
+def readVarLengths(buffer, offset=0, count=None):
+    '''
+    Read a run of consecutive MIDI variable length variables.
+
+    :param buffer: Any object supporting the buffer protocol (``bytes``,
+        ``bytearray``, ``memoryview``, ``mmap``, ...). It is not copied.
+    :param offset: The offset of the first variable in the buffer.
+    :param count: The number of variables to read. If ``None`` variables are
+        read up to the end of the buffer.
+
+    Returns a tuple of the list of values read and the offset following the
+    last of them.
+    '''
+    data = _byteView(buffer)
+    end = len(data)
+    values = []
+    append = values.append
+    remaining = -1 if count is None else count
+    while remaining != 0 and offset < end:
+        output = 0
+        while True:
+            byte = data[offset]
+            offset = offset + 1
+            output = (output << 7) | (byte & 0x7F)
+            if byte < 0x80:
+                break
+        append(output)
+        remaining = remaining - 1
+    if remaining > 0:
+        raise ValueError("Buffer holds fewer than %d variable length "
+                         "quantities" % count)
+    return (values, offset)
+
+
+if sys.version_info[0] < 3:
+    def _byteView(buffer):
+        # Indexing a memoryview yields strings rather than integers on
+        # Python 2, so a copy has to be made there (unless the buffer is
+        # already one that has been converted).
+        if isinstance(buffer, bytearray):
+            return buffer
+        return bytearray(buffer)
+else:
+    def _byteView(buffer):
+        '''
+        Return a zero-copy view of a buffer which indexes as integers.
+        '''
+        view = memoryview(buffer)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        return view
+
+
+def _readLength(data, offset):
+    '''
+    Read the four byte big-endian length of a chunk.
+    '''
+    return (data[offset] << 24 | data[offset + 1] << 16 |
+            data[offset + 2] << 8 | data[offset + 3])
+
+
+def _readVarLength(data, offset):
+    '''
+    Read a variable length variable from a byte view, returning it with the
+    offset that follows it.
+    '''
+    output = 0
+    while True:
+        byte = data[offset]
+        offset = offset + 1
+        output = (output << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return (output, offset)
+
+
+def readChunks(buffer):
+    '''
+    Find the track chunks of a standard MIDI file.
+
+    :param buffer: The contents of the file, as any object supporting the
+        buffer protocol. It is not copied.
+
+    Returns a tuple of the file format and time division given in the header
+    and a list of the (start, end) offsets of the data of each track chunk.
+    Chunks of other types are skipped.
+    '''
+    data = _byteView(buffer)
+    length = len(data)
+    if length < 14 or data[0:4] != b'MThd' or _readLength(data, 4) < 6:
+        raise ValueError("Error in MIDIFile: not a standard MIDI file")
+    file_format = data[8] << 8 | data[9]
+    division = data[12] << 8 | data[13]
+
+    chunks = []
+    offset = 8 + _readLength(data, 4)
+    while offset + 8 <= length:
+        start = offset + 8
+        end = start + _readLength(data, offset + 4)
+        if end > length:
+            raise ValueError("Error in MIDIFile: the chunk at offset %d is "
+                             "truncated" % offset)
+        if data[offset:offset + 4] == b'MTrk':
+            chunks.append((start, end))
+        offset = end
+    return (file_format, division, chunks)
+
+
+def readTrackEvents(buffer, start=0, end=None):
+    '''
+    Iterate over the events in the data of a track chunk.
+
+    :param buffer: Any object supporting the buffer protocol. It is not
+        copied.
+    :param start: The offset of the track data (see ``readChunks()``).
+    :param end: The offset following the track data. If ``None`` the data
+        runs to the end of the buffer.
+
+    Yields a (tick, status, data1, data2) tuple for each event, where tick is
+    the time of the event from the start of the track. For channel messages
+    data1 and data2 are the data bytes (data2 is ``None`` for program change
+    and channel pressure messages); running status is followed, and status
+    is always the full status byte. For meta events status is ``0xFF``,
+    data1 is the meta event type and data2 a view of its data. For system
+    exclusive events status is ``0xF0`` or ``0xF7``, data1 is ``None`` and
+    data2 a view of the data following the length. Iteration stops at the
+    end of track event.
+    '''
+    data = _byteView(buffer)
+    if end is None:
+        end = len(data)
+    offset = start
+    tick = 0
+    status = None
+
+    while offset < end:
+        # The delta time, read inline as this is done for every event.
+        byte = data[offset]
+        offset = offset + 1
+        delta = byte & 0x7F
+        while byte & 0x80:
+            byte = data[offset]
+            offset = offset + 1
+            delta = (delta << 7) | (byte & 0x7F)
+        tick = tick + delta
+
+        byte = data[offset]
+        if byte & 0x80:
+            offset = offset + 1
+        elif status is None:
+            raise ValueError("Error in MIDIFile: data byte without a status "
+                             "at offset %d" % offset)
+        else:
+            byte = status
+
+        if byte < 0xF0:
+            status = byte
+            if byte & 0xE0 == 0xC0:
+                yield (tick, byte, data[offset], None)
+                offset = offset + 1
+            else:
+                yield (tick, byte, data[offset], data[offset + 1])
+                offset = offset + 2
+        elif byte == 0xFF:
+            status = None
+            kind = data[offset]
+            (length, offset) = _readVarLength(data, offset + 1)
+            if kind == 0x2F:
+                return
+            yield (tick, byte, kind, data[offset:offset + length])
+            offset = offset + length
+        elif byte == 0xF0 or byte == 0xF7:
+            status = None
+            (length, offset) = _readVarLength(data, offset)
+            yield (tick, byte, None, data[offset:offset + length])
+            offset = offset + length
+        else:
+            raise ValueError("Error in MIDIFile: unexpected status byte "
+                             "0x%02X at offset %d" % (byte, offset - 1))
+
+    if offset > end:
+        raise ValueError("Error in MIDIFile: the track ending at offset %d is "
+                         "truncated" % end)
+
+
+def encodingStats(buffer):
+    '''
+    Find what the encoded size of a standard MIDI file is made of.
+
+    :param buffer: The contents of the file, as any object supporting the
+        buffer protocol. It is not copied.
+
+    Returns an :class:`EncodingStats` for the whole file and a list of one
+    for each track (see :func:`trackEncodingStats`).
+    '''
+    data = _byteView(buffer)
+    (file_format, division, chunks) = readChunks(data)
+    tracks = [trackEncodingStats(data, start, end) for (start, end) in chunks]
+    return _totalStats(tracks), tracks
+
+
+def _totalStats(tracks):
+    '''
+    Return the sum of a list of EncodingStats.
+    '''
+    total = EncodingStats()
+    for stats in tracks:
+        total.add(stats)
+    return total
+
+
+# The event types counted by trackEncodingStats(), by status (of channel
+# messages, ignoring the channel) and by meta event type. The names are those
+# of the MIDI events written by MIDITrack, where there is one.
+
+_CHANNEL_EVENT_TYPES = {0x80: 'NoteOff', 0x90: 'NoteOn', 0xA0: 'PolyPressure',
+                        0xB0: 'ControllerEvent', 0xC0: 'ProgramChange',
+                        0xD0: 'ChannelPressure', 0xE0: 'PitchWheelEvent'}
+_META_EVENT_TYPES = {0x01: 'Text', 0x02: 'Copyright', 0x03: 'TrackName',
+                     0x2F: 'EndOfTrack', 0x51: 'Tempo', 0x58: 'TimeSignature',
+                     0x59: 'KeySignature'}
+
+
+def trackEncodingStats(buffer, start=0, end=None):
+    '''
+    Find what the encoded size of a track is made of.
+
+    :param buffer: Any object supporting the buffer protocol, such as a
+        track's ``MIDIdata``. It is not copied.
+    :param start: The offset of the track data (see ``readChunks()``).
+    :param end: The offset following the track data. If ``None`` the data
+        runs to the end of the buffer.
+
+    Returns an :class:`EncodingStats`. The events are walked as by
+    ``readTrackEvents()``, and each is counted with the bytes it takes,
+    from its delta time to the end of its data. A note on with a velocity of
+    zero is counted as a ``NoteOff``.
+    '''
+    data = _byteView(buffer)
+    if end is None:
+        end = len(data)
+    stats = EncodingStats()
+    stats.tracks = 1
+    stats.size = end - start
+    sizes = stats.sizes
+    counts = stats.counts
+    widths = stats.deltaWidths
+    offset = start
+    status = None
+
+    while offset < end:
+        eventStart = offset
+        byte = data[offset]
+        offset = offset + 1
+        while byte & 0x80:
+            byte = data[offset]
+            offset = offset + 1
+        width = offset - eventStart
+        while width >= len(widths):
+            widths.append(0)
+        widths[width] += 1
+
+        byte = data[offset]
+        if byte & 0x80:
+            offset = offset + 1
+        elif status is None:
+            raise ValueError("Error in MIDIFile: data byte without a status "
+                             "at offset %d" % offset)
+        else:
+            byte = status
+
+        if byte < 0xF0:
+            status = byte
+            kind = _CHANNEL_EVENT_TYPES[byte & 0xF0]
+            if byte & 0xE0 == 0xC0:
+                offset = offset + 1
+            else:
+                if kind == 'NoteOn' and data[offset + 1] == 0:
+                    kind = 'NoteOff'
+                offset = offset + 2
+        elif byte == 0xFF:
+            status = None
+            meta = data[offset]
+            (length, offset) = _readVarLength(data, offset + 1)
+            kind = _META_EVENT_TYPES.get(meta, 'Meta')
+            stats.metaBytes += length
+            offset = offset + length
+        elif byte == 0xF0 or byte == 0xF7:
+            status = None
+            (length, offset) = _readVarLength(data, offset)
+            kind = ('UniversalSysEx' if byte == 0xF0 and length > 0 and
+                    data[offset] in (0x7E, 0x7F) else 'SysEx')
+            stats.sysExBytes += length
+            offset = offset + length
+        else:
+            raise ValueError("Error in MIDIFile: unexpected status byte "
+                             "0x%02X at offset %d" % (byte, offset - 1))
+
+        sizes[kind] = sizes.get(kind, 0) + offset - eventStart
+        counts[kind] = counts.get(kind, 0) + 1
+        if kind == 'EndOfTrack':
             break
-    return (output, bytesRead)
+
+    if offset > end:
+        raise ValueError("Error in MIDIFile: the track ending at offset %d is "
+                         "truncated" % end)
+    return stats
+
+
+def scanMetadata(buffer):
+    '''
+    Find the metadata of a standard MIDI file, without decoding its events.
+
+    :param buffer: The contents of the file, as any object supporting the
+        buffer protocol. It is not copied.
+
+    Returns a :class:`MIDIMetadata`. The tracks are walked event by event,
+    but the data of channel messages and system exclusive events is skipped
+    over (only a note on's velocity is looked at, to count the notes), and
+    only the meta events that correspond to a :class:`Tempo`,
+    :class:`TrackName`, :class:`TimeSignature`, :class:`KeySignature` or
+    :class:`Copyright` are decoded.
+    '''
+    data = _byteView(buffer)
+    (file_format, division, chunks) = readChunks(data)
+    info = MIDIMetadata(file_format, division, len(chunks))
+    for (start, end) in chunks:
+        _scanTrack(data, start, end, info)
+    info.tempos.sort(key=itemgetter(0))
+    info.timeSignatures.sort(key=itemgetter(0))
+    info.keySignatures.sort(key=itemgetter(0))
+    if not division & 0x8000 and division > 0:
+        info.duration = info.ticks / division
+    if division > 0:
+        info.seconds = info.toSeconds(info.ticks)
+    return info
+
+
+def _scanTrack(data, offset, end, info):
+    '''
+    Add the metadata of a track chunk to a MIDIMetadata (see
+    ``scanMetadata()``).
+    '''
+    tick = 0
+    status = None
+    notes = 0
+    events = 0
+    trackName = None
+
+    while offset < end:
+        byte = data[offset]
+        offset = offset + 1
+        delta = byte & 0x7F
+        while byte & 0x80:
+            byte = data[offset]
+            offset = offset + 1
+            delta = (delta << 7) | (byte & 0x7F)
+        tick = tick + delta
+
+        byte = data[offset]
+        if byte & 0x80:
+            offset = offset + 1
+        elif status is None:
+            raise ValueError("Error in MIDIFile: data byte without a status "
+                             "at offset %d" % offset)
+        else:
+            byte = status
+        events = events + 1
+
+        if byte < 0xF0:
+            status = byte
+            if byte & 0xE0 == 0xC0:
+                offset = offset + 1
+            else:
+                if byte & 0xF0 == 0x90 and data[offset + 1]:
+                    notes = notes + 1
+                offset = offset + 2
+        elif byte == 0xFF:
+            status = None
+            kind = data[offset]
+            (length, offset) = _readVarLength(data, offset + 1)
+            if kind == 0x2F:
+                events = events - 1
+                break
+            if kind == 0x51 and length == 3:
+                info.tempos.append((tick, data[offset] << 16 |
+                                    data[offset + 1] << 8 | data[offset + 2]))
+            elif kind == 0x03 and trackName is None:
+                trackName = bytes(data[offset:offset + length]).decode(
+                    "ISO-8859-1")
+            elif kind == 0x02:
+                info.copyrights.append(bytes(
+                    data[offset:offset + length]).decode("ISO-8859-1"))
+            elif kind == 0x58 and length == 4:
+                info.timeSignatures.append((tick, data[offset],
+                                            data[offset + 1],
+                                            data[offset + 2],
+                                            data[offset + 3]))
+            elif kind == 0x59 and length == 2:
+                accidentals = data[offset]
+                if accidentals > 0x7F:
+                    accidentals = accidentals - 256
+                info.keySignatures.append((tick, abs(accidentals),
+                                           FLATS if accidentals < 0
+                                           else SHARPS, data[offset + 1]))
+            offset = offset + length
+        elif byte == 0xF0 or byte == 0xF7:
+            status = None
+            (length, offset) = _readVarLength(data, offset)
+            offset = offset + length
+        else:
+            raise ValueError("Error in MIDIFile: unexpected status byte "
+                             "0x%02X at offset %d" % (byte, offset - 1))
+
+    if offset > end:
+        raise ValueError("Error in MIDIFile: the track ending at offset %d is "
+                         "truncated" % end)
+    info.trackNames.append(trackName)
+    info.noteCounts.append(notes)
+    info.eventCounts.append(events)
+    info.ticks = max(info.ticks, tick)
+
+
+def scanDirectory(directory, workers=None, pool='process',
+                  extensions=('.mid', '.midi')):
+    '''
+    Find the metadata of every MIDI file in a directory tree.
+
+    :param directory: The directory to search, with its subdirectories.
+    :param workers: If greater than one, the files are scanned in a pool of
+        this many workers.
+    :param pool: ``'process'`` (the default) for a
+        ``concurrent.futures.ProcessPoolExecutor`` or ``'thread'`` for a
+        ``ThreadPoolExecutor``.
+    :param extensions: The file name extensions (compared without regard to
+        case) of the files to scan.
+
+    Yields a (path, metadata) tuple for each file, in the order in which the
+    files are found, where metadata is a :class:`MIDIMetadata` (see
+    ``scanMetadata()``), or ``None`` if the file could not be read or is not
+    a standard MIDI file.
+    '''
+    extensions = tuple(extension.lower() for extension in extensions)
+    paths = (os.path.join(root, name)
+             for (root, dirs, names) in os.walk(directory)
+             for name in sorted(names)
+             if name.lower().endswith(extensions))
+
+    if workers is None or workers <= 1:
+        for path in paths:
+            yield (path, _scanPath(path))
+        return
+
+    executorClass = _executorClass(pool)
+
+    # The paths are handed out in batches, with at most a few batches per
+    # worker in flight at once, so that a large tree is neither listed nor
+    # held in memory all at once.
+    batchSize = 64
+    with executorClass(max_workers=workers) as executor:
+        pending = []
+        batches = iter(lambda: list(itertools.islice(paths, batchSize)), [])
+        for batch in batches:
+            pending.append((batch, executor.submit(_scanPaths, batch)))
+            if len(pending) < 2 * workers:
+                continue
+            (batch, future) = pending.pop(0)
+            for result in zip(batch, future.result()):
+                yield result
+        for (batch, future) in pending:
+            for result in zip(batch, future.result()):
+                yield result
+
+
+def _scanPath(path):
+    '''
+    Scan the metadata of the file at ``path`` (see ``scanDirectory()``).
+    '''
+    try:
+        with open(path, 'rb') as fileHandle:
+            data = _mapFile(fileHandle)
+            try:
+                return scanMetadata(data)
+            finally:
+                _unmapFile(data)
+    except (EnvironmentError, ValueError, IndexError):
+        return None
+
+
+def _scanPaths(paths):
+    '''
+    Scan a batch of files in a worker (see ``scanDirectory()``).
+    '''
+    return [_scanPath(path) for path in paths]
+
+
+def _readTrack(track, buffer, start, end, division, insertion_order):
+    '''
+    Add the events of a track chunk to a MIDITrack (see
+    ``MIDIFile.fromBytes()``), numbering them from ``insertion_order``.
+
+    Returns the insertion order following that of the last event added.
+    '''
+    eventList = track.eventList
+    channels = []
+    pitches = []
+    starts = []
+    stops = []
+    volumes = []
+    sounding = {}  # The notes sounding, first first, by note on status, pitch
+    tick = 0
+
+    for (tick, status, data1, data2) in readTrackEvents(buffer, start, end):
+        kind = status & 0xF0
+        if kind == 0x90 and data2 > 0:
+            sounding.setdefault((status, data1), []).append(len(starts))
+            channels.append(status & 0x0F)
+            pitches.append(data1)
+            starts.append(tick)
+            stops.append(None)
+            volumes.append(data2)
+            continue
+        elif kind == 0x80 or kind == 0x90:
+            notes = sounding.get((status | 0x10, data1))
+            if notes:
+                stops[notes.pop(0)] = tick
+            continue
+
+        time = tick / division
+        if kind == 0xB0:
+            event = ControllerEvent(status & 0x0F, time, data1, data2)
+        elif kind == 0xC0:
+            event = ProgramChange(status & 0x0F, time, data1)
+        elif kind == 0xE0:
+            event = PitchWheelEvent(status & 0x0F, time,
+                                    (data2 << 7 | data1) - 8192)
+        elif status == 0xFF:
+            if data1 == 0x51 and len(data2) == 3:
+                event = Tempo(time, 120)
+                event.tempo = data2[0] << 16 | data2[1] << 8 | data2[2]
+            elif data1 == 0x01:
+                event = Text(time, bytes(data2).decode("ISO-8859-1"))
+            elif data1 == 0x02:
+                event = Copyright(time, bytes(data2).decode("ISO-8859-1"))
+            elif data1 == 0x03:
+                event = TrackName(time, bytes(data2).decode("ISO-8859-1"))
+            elif data1 == 0x58 and len(data2) == 4:
+                event = TimeSignature(time, data2[0], data2[1], data2[2],
+                                      data2[3])
+            elif data1 == 0x59 and len(data2) == 2:
+                accidentals = data2[0] - 256 if data2[0] > 0x7F else data2[0]
+                event = KeySignature(time, abs(accidentals),
+                                     FLATS if accidentals < 0 else SHARPS,
+                                     data2[1])
+            else:
+                continue
+        elif status == 0xF0 and len(data2) > 0:
+            payload = bytes(data2)
+            if data2[len(data2) - 1] == 0xF7:
+                payload = payload[:-1]
+            if data2[0] in (0x7E, 0x7F) and len(payload) >= 4:
+                event = UniversalSysExEvent(time, data2[0] == 0x7F, data2[1],
+                                            data2[2], data2[3], payload[4:])
+            else:
+                event = SysExEvent(time, data2[0], payload[1:])
+        else:
+            continue
+        event.insertion_order = insertion_order
+        insertion_order = insertion_order + 1
+        eventList.append(event)
+
+    if starts:
+        # The notes follow the other events of the track in insertion order,
+        # in the order in which they start.
+        durations = [((tick if stop is None else stop) - begin) / division
+                     for (begin, stop) in zip(starts, stops)]
+        insertion_order = insertion_order + track.addNotes(
+            channels, pitches, [begin / division for begin in starts],
+            durations, volumes, insertion_order=insertion_order)
+    return insertion_order
 
 
 def frequencyTransform(freq):
@@ -1631,6 +4567,11 @@ def sort_events(event):
           one is making an RPN call one can specify the controller change
           events in the proper order and be sure that they will end up in the
           file that way.
+
+        Within the library MIDI events are sorted on the equivalent packed
+        integer key set by :func:`setSortKeys`, which is faster; this
+        function remains the key to use for any other objects, such as
+        instances of user-defined event types.
     '''
 
     return (event.time, event.ord, event.insertion_order)
@@ -0,0 +1,135 @@
+# -----------------------------------------------------------------------------
+# Name:        MidiFileAsync.py
+# Purpose:     Writing MIDI files from asyncio code
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+# -----------------------------------------------------------------------------
+'''
+Writing a :class:`~midiutil.MidiFile.MIDIFile` without blocking an asyncio
+event loop.
+
+This module needs Python 3.5 or later; the rest of the package does not
+import it, so it can still be used with earlier versions.
+'''
+
+import asyncio
+from concurrent import futures
+import inspect
+
+from midiutil.MidiFile import _closeTrack, _makeProfile, _setClosed
+
+__all__ = ['writeAsync']
+
+
+async def writeAsync(midi, stream, executor=None, profile=None):
+    '''
+    Write a MIDI file to an asyncio stream, closing and encoding its tracks
+    in an executor so that the event loop is not blocked.
+
+    The header is written first, and then each track as soon as it has been
+    encoded, in order. The tracks are handed to the executor together, so
+    the later tracks are encoded while the earlier ones are written. Tracks
+    that have not changed since the file was last closed are written as
+    they were encoded then, without going to the executor. Once every track
+    has been encoded the file is closed, as by
+    :meth:`~midiutil.MidiFile.MIDIFile.close`.
+
+    :param midi: The :class:`~midiutil.MidiFile.MIDIFile` to write.
+    :param stream: An ``asyncio.StreamWriter``, or any object with a
+        ``write()`` method, which may be a coroutine (as it is for
+        asynchronous files). If the stream has a ``drain()`` coroutine, it
+        is awaited after each track is written, so that a slow reader holds
+        the writing back.
+    :param executor: The ``concurrent.futures`` executor in which the tracks
+        are closed: by default a thread made for the write. In a
+        ``ProcessPoolExecutor`` the tracks are closed in other processes,
+        to which they are copied (and their encoded data copied back).
+    :param profile: As for :meth:`~midiutil.MidiFile.MIDIFile.writeFile`.
+        The phases of closing each track are recorded by the worker that
+        closes it.
+
+    If the task writing the file is cancelled, the tracks not yet handed to
+    a worker are left open and those being closed are waited for, so the
+    file can still be written again afterwards; what has been written to
+    the stream is not a complete file.
+
+    Returns the profile, if one is given.
+    '''
+    profile = _makeProfile(profile)
+    if midi.producers:
+        midi.mergeProducers()
+
+    origin = midi.reopenTracks()
+    if origin is None:
+        origin = midi.findEventOrigin() if midi.adjust_origin else 0.0
+    encodedOrigin = origin if midi.adjust_origin else 0.0
+    if profile is not None:
+        profile.lap('reopenTracks')
+
+    ownExecutor = executor is None
+    if ownExecutor:
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+    jobs = {}
+    for (index, track) in enumerate(midi.tracks):
+        if track.closed:
+            continue
+        if track.copySource:
+            # Tracks written as they were read need no work.
+            result = _closeTrack(track, origin, midi.adjust_origin,
+                                 profile is not None)
+            _addRecords(profile, index, result[-1])
+            continue
+        jobs[index] = executor.submit(_closeTrack, track, origin,
+                                      midi.adjust_origin, profile is not None)
+    if not jobs:
+        midi.closed = True
+
+    try:
+        await _write(stream, midi.header.buffers())
+        for (index, track) in enumerate(midi.tracks):
+            if index in jobs:
+                result = await asyncio.wrap_future(jobs[index])
+                del jobs[index]
+                _addRecords(profile, index, result[-1])
+                _setClosed(track, result, encodedOrigin)
+                if not jobs:
+                    midi.closed = True
+            await _write(stream, track.buffers())
+            if profile is not None:
+                profile.track = index
+                profile.lap('writeTrack', 0, len(track.MIDIdata) + 8)
+    except BaseException:
+        # Leave the tracks consistent before giving up: those not started
+        # stay open, and those being closed are let finish (a thread cannot
+        # be stopped part of the way through a track).
+        running = [asyncio.wrap_future(job) for job in jobs.values()
+                   if not job.cancel()]
+        if running:
+            await asyncio.wait(running)
+        raise
+    finally:
+        if ownExecutor:
+            executor.shutdown(wait=False)
+    return profile
+
+
+async def _write(stream, buffers):
+    '''
+    Write buffers to a stream, awaiting the writes if they are coroutines
+    and then the draining of the stream if it can be drained.
+    '''
+    for buffer in buffers:
+        written = stream.write(buffer)
+        if inspect.isawaitable(written):
+            await written
+    drain = getattr(stream, 'drain', None)
+    if drain is not None:
+        await drain()
+
+
+def _addRecords(profile, index, records):
+    if profile is not None:
+        for record in records:
+            record.track = index
+            profile.add(record)
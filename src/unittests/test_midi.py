@@ -14,12 +14,34 @@
 
 from __future__ import division, print_function
 import sys,  struct
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from concurrent import futures
+except ImportError:
+    # Python 2 without the futures backport: pools of workers cannot be
+    # used.
+    futures = None
 
 import unittest
 
 from midiutil.MidiFile import *
+import midiutil.MidiFile as MidiFileModule
 
-from midiutil.MidiFile import writeVarLength,  \
+from midiutil.MidiFile import writeVarLength,  readVarLength, encodeVarLength, readVarLengths, MIDIEvent, MIDITrack, sort_events, setSortKeys, Note, ControllerEvent, \
+    readChunks, readTrackEvents, MIDIFileReader, scanMetadata, scanDirectory, CloseProfile, \
+    encodingStats, trackEncodingStats, MIDIProducer, \
     frequencyTransform,  returnFrequency, TICKSPERBEAT, MAJOR, MINOR, SHARPS, FLATS, MIDIFile
     
 
@@ -40,6 +62,77 @@ class Decoder(object):
     def unpack_into_byte(self, key):
         return struct.unpack('>B', self[key])[0]
 
+def legacyDeltaTimes(deltas):
+    '''
+    The round-off compensation that ``writeEventsToStream`` used to perform,
+    round-tripping every delta through a variable length quantity.  Returns
+    the compensated (fractional) delta times.
+    '''
+    times = []
+    preciseTime = 0.0
+    actualTime = 0.0
+    for time in deltas:
+        preciseTime = preciseTime + time
+        testBuffer = b""
+        for timeByte in writeVarLength(time):
+            testBuffer = testBuffer + struct.pack('>B', timeByte)
+        (roundedVal, discard) = readVarLength(0, testBuffer)
+        time = time + (preciseTime - (actualTime + roundedVal))
+        testBuffer = b""
+        for timeByte in writeVarLength(time):
+            testBuffer = testBuffer + struct.pack('>B', timeByte)
+        (roundedVal, discard) = readVarLength(0, testBuffer)
+        actualTime = actualTime + roundedVal
+        times.append(time)
+    return times
+
+def decodeTracks(data):
+    '''
+    Decode the tracks of a MIDI file, following running status. Returns a
+    list for each track of (absolute tick, status, data bytes) tuples.
+    '''
+    data = bytearray(data)
+    offset = 8 + struct.unpack('>L', bytes(data[4:8]))[0]
+    tracks = []
+    while offset < len(data):
+        length = struct.unpack('>L', bytes(data[offset + 4:offset + 8]))[0]
+        offset += 8
+        end = offset + length
+        events = []
+        tick = 0
+        status = None
+        while offset < end:
+            (delta, size) = readVarLength(offset, data)
+            offset += size
+            tick += delta
+            if data[offset] & 0x80:
+                byte = data[offset]
+                offset += 1
+            else:
+                byte = status  # running status
+            if byte == 0xFF:
+                kind = data[offset]
+                (size, sizeLength) = readVarLength(offset + 1, data)
+                start = offset + 1 + sizeLength
+                events.append((tick, byte, (kind,) +
+                               tuple(data[start:start + size])))
+                offset = start + size
+                status = None
+            elif byte == 0xF0:
+                (size, sizeLength) = readVarLength(offset, data)
+                start = offset + sizeLength
+                events.append((tick, byte, tuple(data[start:start + size])))
+                offset = start + size
+                status = None
+            else:
+                count = 1 if byte >> 4 in (0xC, 0xD) else 2
+                events.append((tick, byte,
+                               tuple(data[offset:offset + count])))
+                offset += count
+                status = byte
+        tracks.append(events)
+    return tracks
+
 class TestMIDIUtils(unittest.TestCase):
     
     def testWriteVarLength(self):
@@ -48,6 +141,64 @@ class TestMIDIUtils(unittest.TestCase):
         self.assertEqual(writeVarLength(0x1FFFFF), [0xFF, 0xFF, 0x7F])
         self.assertEqual(writeVarLength(0x08000000), [0xC0, 0x80, 0x80, 0x00])
         
+    def testEncodeVarLength(self):
+        for value in [0, 1, 0x7F, 0x80, 0x3FFF, 0x4000, 0x1FFFFF, 0x200000,
+                      0x0FFFFFFF]:
+            self.assertEqual(encodeVarLength(value),
+                             bytes(bytearray(writeVarLength(value))))
+        self.assertEqual(encodeVarLength(0x80), b'\x81\x00')
+        self.assertEqual(encodeVarLength(0x08000000), b'\xc0\x80\x80\x00')
+        with self.assertRaises(ValueError):
+            writeVarLength(0x10000000)
+
+    def testReadVarLength(self):
+        values = [0, 0x40, 0x7F, 0x80, 0x2000, 0x3FFF, 0x4000, 0x100000,
+                  0x1FFFFF, 0x200000, 0x8000000, 0xFFFFFFF]
+        buffer = b"\xff" + b"".join(encodeVarLength(v) for v in values)
+        offset = 1
+        for value in values:
+            (readValue, bytesRead) = readVarLength(offset, buffer)
+            self.assertEqual(readValue, value)
+            self.assertEqual(bytesRead, len(encodeVarLength(value)))
+            offset += bytesRead
+
+        self.assertEqual(readVarLengths(buffer, 1), (values, len(buffer)))
+        self.assertEqual(readVarLengths(bytearray(buffer), 1, count=3),
+                         (values[:3], 4))
+        self.assertEqual(readVarLengths(memoryview(buffer)[1:], 0, count=0),
+                         ([], 0))
+        with self.assertRaises(ValueError):
+            readVarLengths(buffer, 1, count=len(values) + 1)
+
+    def testDeltaTimeRounding(self):
+        # The integer tick accumulator must reproduce the delta times of the
+        # original variable length round-trip exactly.
+        rnd = random.Random(1234)
+        for trial in range(50):
+            deltas = []
+            for i in range(200):
+                deltas.append(rnd.choice([
+                    0, 0.0, rnd.randint(0, 2000), rnd.random(),
+                    rnd.random() * 10, rnd.uniform(0, 1e5),
+                    rnd.randint(0, 20) * TICKSPERBEAT / 3.0,
+                    rnd.randint(0, 20) * 0.5]))
+            track = MIDITrack(False, False)
+            for delta in deltas:
+                event = MIDIEvent("NoteOn", delta)
+                event.channel, event.pitch, event.volume = 0, 60, 100
+                track.MIDIEventList.append(event)
+            track.writeEventsToStream()
+
+            expected = legacyDeltaTimes(deltas)
+            self.assertEqual([event.time for event in track.MIDIEventList],
+                             expected)
+            data = b""
+            for time in expected:
+                for timeByte in writeVarLength(time):
+                    data += struct.pack('>B', timeByte)
+                data += struct.pack('>BBB', 0x90, 60, 100)
+            self.assertEqual(track.MIDIdata, data)
+
     def testAddNote(self):
         MyMIDI = MIDIFile(1) # a format 1 file, so we increment the track number below
         MyMIDI.addNote(0, 0, 100,0,1,100)
@@ -57,6 +208,78 @@ class TestMIDIUtils(unittest.TestCase):
         self.assertEqual(MyMIDI.tracks[1].eventList[0].duration, 1)
         self.assertEqual(MyMIDI.tracks[1].eventList[0].volume, 100)
         
+    def testAddNotes(self):
+        MyMIDI = MIDIFile(1)
+        MyMIDI.addNote(0, 0, 50, 0, 1, 100)
+        MyMIDI.addNotes(0, [0, 1, 2], [60, 61, 62], (0, 0.5, 1), 1, 90)
+        MyMIDI.addTempo(0, 0, 120)
+        table = MyMIDI.tracks[1].noteTable
+        self.assertEqual(len(table), 3)
+        self.assertEqual(list(table.rows())[1], (1, 61, 0.5, 1.0, 90, 2))
+        self.assertEqual(MyMIDI.event_counter, 5)
+        self.assertEqual(len(MyMIDI.tracks[1].eventList), 1)
+
+        with self.assertRaises(ValueError):
+            MyMIDI.addNotes(0, 0, [60, 61], [0, 1, 2], 1, 100)
+        with self.assertRaises(OverflowError):
+            MyMIDI.addNotes(0, 0, [60, 256], [0, 1], 1, 100)
+        self.assertEqual(len(table), 3)
+        self.assertEqual(MyMIDI.event_counter, 5)
+
+    def testAddNotesMatchesAddNote(self):
+        self.checkAddNotesMatchesAddNote()
+
+    def testAddNotesMatchesAddNoteWithoutNumpy(self):
+        # The pure Python fallbacks must agree with the NumPy code
+        savedNumpy = MidiFileModule.numpy
+        MidiFileModule.numpy = None
+        try:
+            self.checkAddNotesMatchesAddNote()
+        finally:
+            MidiFileModule.numpy = savedNumpy
+
+    def checkAddNotesMatchesAddNote(self):
+        # Notes added in bulk must produce the same file as addNote(),
+        # including the choice of which duplicate survives. In every fourth
+        # trial all the notes are in the note table, which is then
+        # de-interleaved on its own.
+        rnd = random.Random(99)
+        for trial in range(20):
+            notes = []
+            for i in range(rnd.randint(1, 300)):
+                notes.append((rnd.randrange(2), rnd.choice([60, 61, 62]),
+                              rnd.choice([rnd.randint(0, 8), rnd.random() * 8,
+                                          rnd.randint(0, 24) / 3.0]),
+                              rnd.choice([0.5, 1, rnd.random() + 0.01,
+                                          0 if trial % 8 == 3 else 2]),
+                              rnd.randrange(128)))
+            removeDuplicates = trial % 2 == 0
+            expected = MIDIFile(1, removeDuplicates=removeDuplicates)
+            actual = MIDIFile(1, removeDuplicates=removeDuplicates)
+            i = 0
+            while i < len(notes):
+                size = rnd.randint(1, 40)
+                block = notes[i:i + size]
+                for note in block:
+                    expected.addNote(0, *note)
+                if trial % 4 != 3 and rnd.random() < 0.3:
+                    for note in block:
+                        actual.addNote(0, *note)
+                else:
+                    columns = list(zip(*block))
+                    if numpy is not None and rnd.random() < 0.5:
+                        columns = [numpy.array(column) for column in columns]
+                    actual.addNotes(0, *columns)
+                expected.addProgramChange(1, 0, i / 2.0, 5)
+                actual.addProgramChange(1, 0, i / 2.0, 5)
+                i += size
+
+            expectedFile = BytesIO()
+            expected.writeFile(expectedFile)
+            actualFile = BytesIO()
+            actual.writeFile(actualFile)
+            self.assertEqual(actualFile.getvalue(), expectedFile.getvalue())
+
     def testShiftTrack(self):
         time = 1
         MyMIDI = MIDIFile(1)
@@ -82,7 +305,911 @@ class TestMIDIUtils(unittest.TestCase):
         self.assertEqual(MyMIDI.tracks[1].MIDIEventList[2].time,  0)
         self.assertEqual(MyMIDI.tracks[1].MIDIEventList[3].type, 'NoteOff')
         self.assertEqual(MyMIDI.tracks[1].MIDIEventList[3].time,  TICKSPERBEAT * 2)
-        
+
+    def testDeinterleaveVoices(self):
+        # Pitch 1 on channel 12 and pitch 11 on channel 2 are different
+        # voices, so neither note is shortened.
+        MyMIDI = MIDIFile(1)
+        MyMIDI.addNote(0, 12, 1, 0, 2, 100)
+        MyMIDI.addNote(0, 2, 11, 1, 2, 100)
+        track = MyMIDI.tracks[1]
+        track.closeTrack()
+        self.assertEqual([(event.type, event.channel, event.time)
+                          for event in track.MIDIEventList],
+                         [('NoteOn', 12, 0), ('NoteOn', 2, TICKSPERBEAT),
+                          ('NoteOff', 12, 2 * TICKSPERBEAT),
+                          ('NoteOff', 2, 3 * TICKSPERBEAT)])
+
+        # A note of zero duration (whose note off comes first) is left alone
+        MyMIDI = MIDIFile(1)
+        MyMIDI.addNote(0, 0, 60, 1, 0, 100)
+        track = MyMIDI.tracks[1]
+        track.closeTrack()
+        self.assertEqual([(event.type, event.time)
+                          for event in track.MIDIEventList],
+                         [('NoteOff', TICKSPERBEAT), ('NoteOn', TICKSPERBEAT)])
+
+    def testParallelClose(self):
+        def build():
+            rnd = random.Random(11)
+            MyMIDI = MIDIFile(4, adjust_origin=True)
+            MyMIDI.addTempo(0, 2, 100)
+            for track in range(4):
+                MyMIDI.addProgramChange(track, track, 1.5, 10)
+                for i in range(200):
+                    MyMIDI.addNote(track, track, rnd.choice([60, 62]),
+                                   1 + rnd.randrange(64) / 4.0,
+                                   rnd.choice([0.25, 1, 4]), 100)
+            MyMIDI.addNotes(3, 3, [64] * 10, range(2, 12), 4, 90)
+            return MyMIDI
+
+        expected = BytesIO()
+        build().writeFile(expected)
+        if futures is None:
+            with self.assertRaises(ImportError):
+                build().close(workers=2)
+        else:
+            for pool in ('thread', 'process'):
+                actual = BytesIO()
+                build().writeFile(actual, workers=2, pool=pool)
+                self.assertEqual(expected.getvalue(), actual.getvalue())
+
+        with self.assertRaises(ValueError):
+            build().close(workers=2, pool='bad')
+
+    def testStreamWrite(self):
+        class Unseekable(object):
+            def __init__(self):
+                self.data = b""
+
+            def write(self, data):
+                self.data += bytes(data)
+
+            def seekable(self):
+                return False
+
+        def build():
+            rnd = random.Random(12)
+            MyMIDI = MIDIFile(3, adjust_origin=True)
+            MyMIDI.addTempo(0, 1, 100)
+            for track in range(3):
+                MyMIDI.addTrackName(track, 1, "Track %d" % track)
+                for i in range(300):
+                    MyMIDI.addNote(track, track, rnd.choice([60, 62]),
+                                   1 + rnd.random() * 64,
+                                   rnd.choice([0.25, 1, 4]), 100)
+            return MyMIDI
+
+        expected = BytesIO()
+        build().writeFile(expected)
+
+        # Seekable files have the track lengths filled in afterwards, others
+        # are encoded twice. The file is left open and can be written again.
+        MyMIDI = build()
+        for attempt in range(2):
+            actual = BytesIO()
+            MyMIDI.writeFile(actual, stream=True)
+            self.assertEqual(expected.getvalue(), actual.getvalue())
+            self.assertEqual([], MyMIDI.tracks[1].MIDIEventList)
+            actual = Unseekable()
+            MyMIDI.writeFile(actual, stream=True)
+            self.assertEqual(expected.getvalue(), actual.data)
+
+        with self.assertRaises(ValueError):
+            build().writeFile(BytesIO(), workers=2, stream=True)
+
+    def testToBytes(self):
+        def build(tracks):
+            MyMIDI = MIDIFile(tracks, adjust_origin=True)
+            for track in range(tracks):
+                MyMIDI.addTrackName(track, 0, "Track %d" % track)
+                MyMIDI.addNote(track, 0, 60 + track % 60, 1, 1, 100)
+            return MyMIDI
+
+        expected = BytesIO()
+        build(3).writeFile(expected)
+        expected = expected.getvalue()
+        MyMIDI = build(3)
+        self.assertEqual(MyMIDI.toBytes(), expected)
+        self.assertEqual(MyMIDI.toBytes(), expected)
+        self.assertEqual(b"".join(bytes(buffer) for buffer
+                                  in MyMIDI.buffers()), expected)
+
+        # A vectored write gives the same file, also when it has more buffers
+        # than fit in one call or the writes stop short.
+        def partialWritev(fd, buffers):
+            return os.write(fd, b"".join(bytes(buffer)
+                                         for buffer in buffers)[:7])
+
+        writev = getattr(os, 'writev', None)
+        cases = [(build(3), None), (build(400), None)]
+        if writev is not None:
+            cases.append((build(3), partialWritev))
+        (handle, path) = tempfile.mkstemp(suffix='.mid')
+        os.close(handle)
+        try:
+            for (MyMIDI, replacement) in cases:
+                expected = BytesIO()
+                MyMIDI.writeFile(expected)
+                if replacement is not None:
+                    os.writev = replacement
+                try:
+                    with open(path, 'wb') as output_file:
+                        output_file.write(b"head")
+                        MyMIDI.writeFile(output_file, vectored=True)
+                        output_file.write(b"tail")
+                finally:
+                    if writev is not None:
+                        os.writev = writev
+                with open(path, 'rb') as input_file:
+                    self.assertEqual(input_file.read(),
+                                     b"head" + expected.getvalue() + b"tail")
+        finally:
+            os.remove(path)
+
+        # Files without a file descriptor are written a buffer at a time.
+        actual = BytesIO()
+        MyMIDI.writeFile(actual, vectored=True)
+        self.assertEqual(actual.getvalue(), expected.getvalue())
+        with self.assertRaises(ValueError):
+            MyMIDI.writeFile(BytesIO(), stream=True, vectored=True)
+
+    def testRunningStatus(self):
+        def build(**options):
+            rnd = random.Random(13)
+            MyMIDI = MIDIFile(2, adjust_origin=True, **options)
+            MyMIDI.addTempo(0, 0, 120)
+            for track in range(2):
+                MyMIDI.addProgramChange(track, track, 0, 5)
+                MyMIDI.addProgramChange(track, track, 0, 6)
+                for i in range(300):
+                    time = rnd.randrange(200) / 4.0
+                    MyMIDI.addNote(track, rnd.randrange(3), rnd.randrange(128),
+                                   time, rnd.choice([0.25, 1]), 100)
+                    if i % 20 == 0:
+                        MyMIDI.addControllerEvent(track, 0, time, 7, 90)
+                        MyMIDI.addPitchWheelEvent(track, 0, time, 200)
+                    if i % 50 == 0:
+                        MyMIDI.addText(track, time, "text")
+                        MyMIDI.addSysEx(track, time, 0x41, b"\x01")
+            output = BytesIO()
+            MyMIDI.writeFile(output)
+            return output.getvalue()
+
+        plain = build()
+        running = build(running_status=True)
+        noteOn = build(running_status=True, note_off_as_note_on=True)
+        self.assertTrue(len(noteOn) < len(running) < len(plain))
+
+        # Running status changes nothing once the file is decoded.
+        self.assertEqual(decodeTracks(plain), decodeTracks(running))
+
+        # Nor does writing note offs as note ons of velocity zero, other
+        # than losing the note off velocity.
+        def noteOffAsNoteOn(tracks):
+            return [[(tick, 0x90 | status & 0x0F, (data[0], 0))
+                     if status >> 4 == 0x8 else (tick, status, data)
+                     for (tick, status, data) in events]
+                    for events in tracks]
+        self.assertEqual(noteOffAsNoteOn(decodeTracks(plain)),
+                         decodeTracks(noteOn))
+        self.assertEqual(decodeTracks(noteOn),
+                         decodeTracks(build(note_off_as_note_on=True)))
+
+    def testReadFile(self):
+        def build(file_format, **options):
+            rnd = random.Random(14)
+            MyMIDI = MIDIFile(3, adjust_origin=False, file_format=file_format,
+                              **options)
+            MyMIDI.addTempo(0, 0, 133)
+            MyMIDI.addTimeSignature(0, 0, 6, 3, 36)
+            MyMIDI.addKeySignature(1, 0, 3, FLATS, MINOR)
+            MyMIDI.addCopyright(0, 0, "copyright")
+            MyMIDI.addTrackName(1, 0, "name")
+            for track in range(3):
+                MyMIDI.addProgramChange(track, track, 0, track + 4)
+                for i in range(300):
+                    MyMIDI.addNote(track, rnd.randrange(4), rnd.randrange(30, 40),
+                                   rnd.randrange(400) / 4.0,
+                                   rnd.choice([0.25, 1, 3]),
+                                   rnd.randrange(1, 128))
+                    if i % 40 == 0:
+                        MyMIDI.addControllerEvent(track, 0, i / 3.0, 7, 60)
+                        MyMIDI.addPitchWheelEvent(track, 1, i / 5.0, -3000)
+                        MyMIDI.addSysEx(track, i / 7.0, 0x41, b"\x01\x02")
+                        MyMIDI.addUniversalSysEx(track, i / 7.0, 8, 2, b"\x05",
+                                                 realTime=True)
+                        MyMIDI.addText(track, i / 7.0, "text")
+            return MyMIDI
+
+        def write(MyMIDI):
+            output = BytesIO()
+            MyMIDI.writeFile(output)
+            return output.getvalue()
+
+        def reencode(MyMIDI):
+            # Drop the data read, so that the tracks are encoded again.
+            for track in MyMIDI.tracks:
+                track.sourceData = None
+            return MyMIDI
+
+        def normalize(tracks):
+            # Note off velocities are not kept, and events at the same time
+            # may be reordered.
+            return [sorted((tick, status | 0x10, data[:1])
+                           if status >> 4 == 0x8 or
+                           (status >> 4 == 0x9 and data[1] == 0)
+                           else (tick, status, data)
+                           for (tick, status, data) in events)
+                    for events in tracks]
+
+        for (file_format, options) in ((1, {}), (2, {}),
+                                       (1, {'running_status': True}),
+                                       (1, {'running_status': True,
+                                            'note_off_as_note_on': True})):
+            original = write(build(file_format, **options))
+            copy = write(reencode(MIDIFile.fromBytes(original, **options)))
+            self.assertEqual(normalize(decodeTracks(original)),
+                             normalize(decodeTracks(copy)))
+            # Once read and written, a file is read and written unchanged.
+            self.assertEqual(copy, write(reencode(
+                MIDIFile.fromBytes(copy, **options))))
+
+            # From a file (which is memory-mapped) and a memoryview.
+            (handle, path) = tempfile.mkstemp(suffix='.mid')
+            try:
+                with os.fdopen(handle, 'wb') as output_file:
+                    output_file.write(copy)
+                with open(path, 'rb') as input_file:
+                    self.assertEqual(copy,
+                                     write(MIDIFile.read(input_file,
+                                                         **options)))
+            finally:
+                os.remove(path)
+            self.assertEqual(copy, write(MIDIFile.fromBytes(memoryview(copy),
+                                                            **options)))
+            self.assertEqual(copy, write(MIDIFile.read(BytesIO(copy),
+                                                       **options)))
+
+        with self.assertRaises(ValueError):
+            MIDIFile.fromBytes(b"RIFF" + original[4:])
+        with self.assertRaises(ValueError):
+            MIDIFile.fromBytes(original[:-10])
+
+    def testPassThrough(self):
+        rnd = random.Random(17)
+        MyMIDI = MIDIFile(4, adjust_origin=False)
+        MyMIDI.addTempo(0, 0, 120)
+        for track in range(4):
+            MyMIDI.addProgramChange(track, track, 0, 10)
+            for i in range(100):
+                MyMIDI.addNote(track, track, rnd.randrange(40, 80),
+                               rnd.randrange(100) / 2.0, 1, 100)
+        output = BytesIO()
+        MyMIDI.writeFile(output)
+        original = output.getvalue()
+
+        def write(MyMIDI, **options):
+            output = BytesIO()
+            MyMIDI.writeFile(output, **options)
+            return output.getvalue()
+
+        def chunks(data):
+            return [data[start:end] for (start, end) in readChunks(data)[2]]
+
+        # Untouched tracks are copied, whichever way the file is written.
+        ways = [{}, {'stream': True}]
+        if futures is not None:
+            ways.append({'workers': 2, 'pool': 'thread'})
+        for options in ways:
+            MyMIDI = MIDIFile.fromBytes(original)
+            self.assertTrue(all(track.unmodified()
+                                for track in MyMIDI.tracks))
+            self.assertEqual(write(MyMIDI, **options), original)
+
+        # Only a track that has been added to is encoded again.
+        MyMIDI = MIDIFile.fromBytes(original)
+        MyMIDI.addNote(1, 1, 90, 60, 1, 100)
+        self.assertEqual([track.unmodified() for track in MyMIDI.tracks],
+                         [True, True, False, True, True])
+        copy = write(MyMIDI)
+        self.assertEqual([a == b for (a, b)
+                          in zip(chunks(original), chunks(copy))],
+                         [True, True, False, True, True])
+        self.assertEqual(decodeTracks(copy)[2][-2],
+                         (61 * TICKSPERBEAT, 0x81, (90, 100)))
+
+        # Events that cannot be read are kept in an untouched track.
+        track = bytearray([0x00, 0x90, 0x3C, 0x40, 0x00, 0xA0, 0x3C, 0x10,
+                           0x83, 0x60, 0x80, 0x3C, 0x40,
+                           0x00, 0xFF, 0x06, 0x01, 0x61,
+                           0x00, 0xFF, 0x2F, 0x00])
+        data = (b"MThd" + struct.pack(">LHHH", 6, 2, 2, TICKSPERBEAT) +
+                (b"MTrk" + struct.pack(">L", len(track)) + bytes(track)) * 2)
+        self.assertEqual(write(MIDIFile.fromBytes(data)), data)
+        MyMIDI = MIDIFile.fromBytes(data)
+        MyMIDI.addNote(1, 0, 62, 0, 1, 100)
+        copy = chunks(write(MyMIDI))
+        self.assertEqual(copy[0], bytes(track))
+        self.assertNotEqual(copy[1], bytes(track))
+
+        # Tracks that would be moved in time, or that are in other units,
+        # are always encoded.
+        MyMIDI = MIDIFile(1, adjust_origin=True)
+        MyMIDI.addNote(0, 0, 60, 4, 1, 100)
+        shifted = write(MyMIDI)
+        MyMIDI = MIDIFile(1, adjust_origin=False)
+        MyMIDI.addNote(0, 0, 60, 4, 1, 100)
+        later = write(MyMIDI)
+        self.assertNotEqual(shifted, later)
+        self.assertEqual(write(MIDIFile.fromBytes(later, adjust_origin=True)),
+                         shifted)
+        slower = data.replace(struct.pack(">H", TICKSPERBEAT),
+                              struct.pack(">H", TICKSPERBEAT // 2), 1)
+        MyMIDI = MIDIFile.fromBytes(slower)
+        self.assertFalse(MyMIDI.tracks[0].unmodified())
+        self.assertEqual(decodeTracks(write(MyMIDI))[0][-1],
+                         (TICKSPERBEAT, 0xFF, (0x2F,)))
+
+    def testShiftAfterWrite(self):
+        # shiftTracks() moves events without adding any, so the tracks it
+        # changes must be encoded again rather than written as before.
+        def write(MyMIDI, **options):
+            output = BytesIO()
+            MyMIDI.writeFile(output, **options)
+            return output.getvalue()
+
+        def build(time):
+            MyMIDI = MIDIFile(1, adjust_origin=False)
+            MyMIDI.addNote(0, 0, 60, time, 1, 100)
+            MyMIDI.addTempo(0, time, 100)
+            return MyMIDI
+
+        for options in ({}, {'stream': True}):
+            MyMIDI = build(4)
+            write(MyMIDI, **options)
+            MyMIDI.shiftTracks(0)
+            self.assertEqual(write(MyMIDI, **options), write(build(0)))
+            # Events added after the shift come after those shifted.
+            MyMIDI.addNote(0, 0, 62, 2, 1, 100)
+            expected = build(0)
+            expected.addNote(0, 0, 62, 2, 1, 100)
+            self.assertEqual(write(MyMIDI, **options), write(expected))
+
+        # Tracks already at the origin are kept as they were encoded.
+        MyMIDI = build(0)
+        write(MyMIDI)
+        encoded = MyMIDI.tracks[1].MIDIdata
+        MyMIDI.shiftTracks(0)
+        write(MyMIDI)
+        self.assertIs(MyMIDI.tracks[1].MIDIdata, encoded)
+
+        # A track read from a file is no longer copied from it once shifted.
+        MyMIDI = MIDIFile.fromBytes(write(build(4)))
+        MyMIDI.shiftTracks(0)
+        self.assertEqual(write(MyMIDI), write(build(0)))
+
+    def testIncrementalClose(self):
+        def add(MyMIDI, notes):
+            for (track, time) in notes:
+                MyMIDI.addNote(track, track, 60 + track, time, 1, 100)
+
+        def write(MyMIDI, **options):
+            output = BytesIO()
+            MyMIDI.writeFile(output, **options)
+            return output.getvalue()
+
+        first = [(track, time) for track in range(3) for time in range(2, 10)]
+        ways = [{}, {'stream': True}]
+        if futures is not None:
+            ways.append({'workers': 2, 'pool': 'thread'})
+        for adjust in (False, True):
+            for options in ways:
+                MyMIDI = MIDIFile(3, adjust_origin=adjust)
+                add(MyMIDI, first)
+                write(MyMIDI)
+                encoded = [track.MIDIdata for track in MyMIDI.tracks]
+
+                # Events added after a write are written, and only their track
+                # is encoded again.
+                add(MyMIDI, [(1, 5.5), (1, 6.5)])
+                expected = MIDIFile(3, adjust_origin=adjust)
+                add(expected, first + [(1, 5.5), (1, 6.5)])
+                self.assertEqual(write(MyMIDI, **options), write(expected))
+                if not options:
+                    self.assertEqual([track.MIDIdata is data for (track, data)
+                                      in zip(MyMIDI.tracks, encoded)],
+                                     [True, True, False, True])
+
+                # An event that moves the origin has every track encoded again
+                # if the origin is adjusted.
+                add(MyMIDI, [(2, 1)])
+                add(expected, [(2, 1)])
+                self.assertEqual(write(MyMIDI, **options), write(expected))
+                self.assertEqual(write(MyMIDI), write(expected))
+
+    def testEncodingStats(self):
+        def build(**options):
+            MyMIDI = MIDIFile(2, adjust_origin=True, **options)
+            MyMIDI.addTempo(0, 1, 100)
+            MyMIDI.addTrackName(1, 0.5, "name")
+            MyMIDI.addText(1, 0.75, "x" * 200)
+            MyMIDI.addSysEx(1, 0.75, 0x41, b"abc")
+            MyMIDI.addUniversalSysEx(1, 0.75, 1, 2, b"zz")
+            for i in range(100):
+                MyMIDI.addNote(1, 0, 60 + i % 12, 1 + i * 0.5, 0.25, 100)
+            MyMIDI.addNote(0, 1, 60, 2000, 1, 100)
+            MyMIDI.addNotes(0, 1, [61, 62], [1.5, 2.5], 0.25, 90)
+            return MyMIDI
+
+        MyMIDI = build()
+        (total, tracks) = MyMIDI.encodingStats()
+        self.assertEqual(len(tracks), 3)
+        self.assertEqual([stats.size for stats in tracks],
+                         [len(track.MIDIdata) for track in MyMIDI.tracks])
+        self.assertEqual(total.size, sum(stats.size for stats in tracks))
+        self.assertEqual(total.tracks, 3)
+        self.assertEqual(sum(total.sizes.values()), total.size)
+        self.assertEqual(sum(total.counts.values()), sum(total.deltaWidths))
+        self.assertEqual(tracks[2].counts, {
+            'TrackName': 1, 'Text': 1, 'SysEx': 1, 'UniversalSysEx': 1,
+            'NoteOn': 100, 'NoteOff': 100, 'EndOfTrack': 1})
+        self.assertEqual(tracks[2].sizes['Text'], 2 + 2 + 2 + 200)
+        self.assertEqual(tracks[2].metaBytes, 4 + 200)
+        self.assertEqual(tracks[2].sysExBytes, (1 + 3 + 1) + (4 + 2 + 1))
+        self.assertEqual(tracks[1].deltaWidths[4], 0)
+        self.assertEqual(tracks[1].deltaWidths[3], 1)  # The last note
+        self.assertEqual(total.payloadShares(),
+                         (total.metaBytes / float(total.size),
+                          total.sysExBytes / float(total.size)))
+        self.assertIn('NoteOn', str(total))
+
+        # The same is found from the file, and a note on with a velocity of
+        # zero counts as a note off.
+        data = MyMIDI.toBytes()
+        self.assertEqual(encodingStats(data)[0].sizes, total.sizes)
+        MyMIDI = build(running_status=True, note_off_as_note_on=True)
+        stats = encodingStats(MyMIDI.toBytes())[1][2]
+        self.assertEqual(stats.counts['NoteOff'], 100)
+        self.assertEqual(stats.sizes['NoteOn'], tracks[2].sizes['NoteOn'] - 99)
+        self.assertEqual(stats.sizes['NoteOff'],
+                         tracks[2].sizes['NoteOff'] - 100)
+
+        # Without duplicates or overlapping notes the estimate is exact, and
+        # an encoded track is counted as it is.
+        for options in ({}, {'running_status': True},
+                        {'running_status': True,
+                         'note_off_as_note_on': True}):
+            MyMIDI = build(**options)
+            estimate = MyMIDI.estimateSize()
+            self.assertEqual(estimate, len(MyMIDI.toBytes()))
+            self.assertEqual(MyMIDI.estimateSize(), estimate)
+
+    def testCloseProfile(self):
+        def build():
+            MyMIDI = MIDIFile(2, adjust_origin=True)
+            for track in range(2):
+                for i in range(50):
+                    MyMIDI.addNote(track, 0, 60 + i % 5, 1 + i / 2.0, 1, 100)
+            return MyMIDI
+
+        expected = BytesIO()
+        self.assertIsNone(build().writeFile(expected))
+
+        seen = []
+        MyMIDI = build()
+        actual = BytesIO()
+        profile = MyMIDI.writeFile(actual, profile=seen.append)
+        self.assertEqual(actual.getvalue(), expected.getvalue())
+        self.assertIsInstance(profile, CloseProfile)
+        self.assertEqual(seen, profile.records)
+        trackPhases = ['removeDuplicates', 'processEventList', 'sortEvents',
+                       'deInterleaveNotes', 'adjustTimeAndOrigin',
+                       'writeMIDIStream', 'writeTrack']
+        self.assertEqual(list(profile.phaseTotals()),
+                         ['reopenTracks'] + trackPhases[:4] +
+                         ['findOrigin'] + trackPhases[4:])
+        for index in range(3):
+            self.assertEqual(sorted(record.phase for record in profile.records
+                                    if record.track == index),
+                             sorted(trackPhases))
+        records = dict(((record.track, record.phase), record)
+                       for record in profile.records)
+        self.assertEqual(records[(1, 'removeDuplicates')].events, 50)
+        self.assertEqual(records[(1, 'writeMIDIStream')].events, 100)
+        self.assertEqual(records[(1, 'writeMIDIStream')].size,
+                         len(MyMIDI.tracks[1].MIDIdata))
+        self.assertTrue(all(record.seconds >= 0
+                            for record in profile.records))
+        self.assertAlmostEqual(profile.seconds(),
+                               sum(profile.trackTotals().values()))
+        self.assertIn('writeMIDIStream', str(profile))
+
+        # Only the track that changed is closed again, and a report may be
+        # added to.
+        MyMIDI.addNote(1, 0, 70, 2, 1, 100)
+        MyMIDI.close(profile=profile)
+        self.assertEqual([record.track for record in profile.records
+                          if record.phase == 'sortEvents'], [0, 1, 2, 2])
+
+        # Parallel closes record the phases of each track in its worker.
+        if futures is not None:
+            MyMIDI = build()
+            profile = MyMIDI.close(workers=2, pool='thread', profile=True)
+            self.assertEqual(sorted(set(
+                record.track for record in profile.records
+                if record.phase == 'writeMIDIStream')), [0, 1, 2])
+
+    def testProducers(self):
+        def write(MyMIDI):
+            output = BytesIO()
+            MyMIDI.writeFile(output)
+            return output.getvalue()
+
+        def produce(producer, part, seed):
+            # Many events at the same times in every part, so the file
+            # depends on the order in which the parts are merged.
+            rnd = random.Random(seed)
+            producer.addTrackName(part % 2, 0, 'Part %d' % part)
+            for beat in range(100):
+                producer.addNote(part % 2, part, 60 + part, beat / 2.0, 1,
+                                 100)
+                producer.addControllerEvent(part % 2, part, beat / 2.0, 7,
+                                            beat)
+                if rnd.random() < 0.2:
+                    time.sleep(0)
+            producer.addNotes(part % 2, [part] * 3, [40, 41, 42],
+                              [0, 1, 2], [1, 1, 1], [90, 90, 90])
+            producer.addTempo(0, 10, 100 + part)
+
+        def threaded(seed):
+            MyMIDI = MIDIFile(2, adjust_origin=True)
+            threads = []
+            for part in range(6):
+                producer = MyMIDI.producer()
+                threads.append(threading.Thread(target=produce,
+                                                args=(producer, part,
+                                                      seed + part)))
+            for thread in reversed(threads):
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return MyMIDI
+
+        # The calls of each producer are made in the order of their keys,
+        # whatever the order in which the threads ran.
+        expected = MIDIFile(2, adjust_origin=True)
+        for part in range(6):
+            produce(expected, part, 0)
+        expected = write(expected)
+        for seed in range(3):
+            self.assertEqual(write(threaded(seed)), expected)
+
+        # Keys given explicitly are merged in their order, and after the
+        # events added to the file directly.
+        MyMIDI = MIDIFile(1, adjust_origin=True)
+        late = MyMIDI.producer('b')
+        early = MyMIDI.producer('a')
+        self.assertIsInstance(early, MIDIProducer)
+        late.addNote(0, 0, 61, 0, 1, 100)
+        early.addNote(0, 0, 60, 0, 1, 100)
+        MyMIDI.addNote(0, 0, 62, 0, 1, 100)
+        reference = MIDIFile(1, adjust_origin=True)
+        for pitch in (62, 60, 61):
+            reference.addNote(0, 0, pitch, 0, 1, 100)
+        self.assertEqual(write(MyMIDI), write(reference))
+
+        # Producers can be used again after a merge, and only the new calls
+        # are made.
+        self.assertEqual(late.calls, [])
+        early.addNote(0, 0, 63, 4, 1, 100)
+        reference.addNote(0, 0, 63, 4, 1, 100)
+        self.assertEqual(write(MyMIDI), write(reference))
+        self.assertEqual(MyMIDI.estimateSize(), len(write(reference)))
+
+        # Errors in the arguments are raised when the calls are made.
+        early.addTempo(0, 0, 0)
+        self.assertRaises(ZeroDivisionError, MyMIDI.close)
+
+    def testAppendEvents(self):
+        def write(MyMIDI):
+            output = BytesIO()
+            MyMIDI.writeFile(output)
+            return output.getvalue()
+
+        def build(MyMIDI, track, start, end, rnd):
+            # Notes, controller changes and tempos from beat start to end.
+            for beat in range(start, end):
+                for i in range(3):
+                    when = beat + rnd.choice((0, 0.25, 0.5, 1.0 / 3))
+                    MyMIDI.addNote(track, rnd.randrange(2),
+                                   rnd.randrange(60, 64), when,
+                                   rnd.choice((0.25, 0.5, 1, 2)), 100)
+                MyMIDI.addNotes(track, 0, [60, 62], beat + 0.5, 0.75, 90)
+                MyMIDI.addControllerEvent(track, 1, beat + 0.1, 7, beat % 128)
+                if beat % 4 == 0:
+                    MyMIDI.addTempo(track, beat, 100 + beat)
+
+        for (remdep, deinterleave, running, adjust) in itertools.product(
+                (True, False), repeat=4):
+            options = dict(removeDuplicates=remdep, deinterleave=deinterleave,
+                           running_status=running, note_off_as_note_on=running,
+                           adjust_origin=adjust)
+            rnd = random.Random(1)
+            MyMIDI = MIDIFile(2, **options)
+            expected = MIDIFile(2, **options)
+            for (start, end) in ((2, 6), (9, 11), (14, 15), (18, 24)):
+                state = rnd.getstate()
+                build(MyMIDI, 1, start, end, rnd)
+                rnd.setstate(state)
+                build(expected, 1, start, end, rnd)
+                data = MyMIDI.tracks[2].MIDIdata
+                self.assertEqual(write(MyMIDI), write(expected))
+                for track in expected.tracks:
+                    track.reopen()
+                if start > 2:
+                    # The new notes were encoded onto the end of the track.
+                    self.assertIs(MyMIDI.tracks[2].MIDIdata, data)
+
+            # Events before the end of the track have it encoded again, as
+            # does a duplicate of the last note.
+            for (time, appended) in ((10, False), (30, True), (30, False)):
+                data = MyMIDI.tracks[2].MIDIdata
+                MyMIDI.addNote(1, 0, 70, time, 1, 100)
+                expected.addNote(1, 0, 70, time, 1, 100)
+                self.assertEqual(write(MyMIDI), write(expected))
+                self.assertEqual(MyMIDI.tracks[2].MIDIdata is data, appended)
+                for track in expected.tracks:
+                    track.reopen()
+
+        # A note of zero duration stops notes being appended to a track whose
+        # notes are de-interleaved.
+        MyMIDI = MIDIFile(1)
+        MyMIDI.addNote(0, 0, 60, 0, 0, 100)
+        write(MyMIDI)
+        data = MyMIDI.tracks[1].MIDIdata
+        MyMIDI.addNote(0, 0, 60, 1, 1, 100)
+        MyMIDI.addNote(0, 0, 60, 1.5, 1, 100)
+        expected = MIDIFile(1)
+        expected.addNote(0, 0, 60, 0, 0, 100)
+        expected.addNote(0, 0, 60, 1, 1, 100)
+        expected.addNote(0, 0, 60, 1.5, 1, 100)
+        self.assertEqual(write(MyMIDI), write(expected))
+        self.assertIsNot(MyMIDI.tracks[1].MIDIdata, data)
+
+    def testReadTrackEvents(self):
+        track = bytearray([
+            0x00, 0x90, 0x3C, 0x40,        # Note on
+            0x00, 0x3E, 0x40,              # Note on, running status
+            0x00, 0xA0, 0x3C, 0x10,        # Aftertouch
+            0x60, 0x90, 0x3C, 0x00,        # Note off as a note on
+            0x00, 0xFF, 0x06, 0x03, 0x61, 0x62, 0x63,  # Marker
+            0x00, 0xC1, 0x05,              # Program change
+            0x00, 0x06,                    # Program change, running status
+            0x81, 0x00, 0x80, 0x3E, 0x00,  # Note off
+            0x00, 0x90, 0x40, 0x50,        # Note on, never turned off
+            0x10, 0xE0, 0x00, 0x40,        # Pitch wheel
+            0x00, 0xFF, 0x2F, 0x00])
+        data = (b"MThd" + struct.pack(">LHHH", 6, 0, 1, 96) +
+                b"XTRA" + struct.pack(">L", 2) + b"\x00\x00" +
+                b"MTrk" + struct.pack(">L", len(track)) + bytes(track))
+
+        (file_format, division, chunks) = readChunks(data)
+        self.assertEqual((file_format, division), (0, 96))
+        self.assertEqual(chunks, [(32, 32 + len(track))])
+        events = [(tick, status, data1,
+                   bytes(data2) if status == 0xFF else data2)
+                  for (tick, status, data1, data2)
+                  in readTrackEvents(data, *chunks[0])]
+        self.assertEqual(events, [
+            (0, 0x90, 0x3C, 0x40), (0, 0x90, 0x3E, 0x40),
+            (0, 0xA0, 0x3C, 0x10), (96, 0x90, 0x3C, 0x00),
+            (96, 0xFF, 0x06, b"abc"), (96, 0xC1, 0x05, None),
+            (96, 0xC1, 0x06, None), (224, 0x80, 0x3E, 0x00),
+            (224, 0x90, 0x40, 0x50), (240, 0xE0, 0x00, 0x40)])
+
+        MyMIDI = MIDIFile.fromBytes(data)
+        self.assertEqual(MyMIDI.header.numeric_format, 0)
+        self.assertEqual(MyMIDI.numTracks, 1)
+        table = MyMIDI.tracks[0].noteTable
+        self.assertEqual(list(table.rows()), [
+            (0, 60, 0.0, 1.0, 64, 3), (0, 62, 0.0, 224 / 96.0, 64, 4),
+            (0, 64, 224 / 96.0, 16 / 96.0, 80, 5)])
+        events = MyMIDI.tracks[0].eventList
+        self.assertEqual([(event.type, event.time) for event in events],
+                         [('programChange', 1.0), ('programChange', 1.0),
+                          ('pitchWheelEvent', 2.5)])
+        self.assertEqual([event.programNumber for event in events[:2]],
+                         [5, 6])
+        self.assertEqual(events[2].pitch_wheel_value, 0)
+
+        # A data byte with no running status to follow.
+        with self.assertRaises(ValueError):
+            list(readTrackEvents(bytearray([0x00, 0x3C, 0x40])))
+
+    def testFileReader(self):
+        rnd = random.Random(15)
+        MyMIDI = MIDIFile(4, adjust_origin=False)
+        MyMIDI.addTempo(0, 0, 100)
+        for track in range(4):
+            MyMIDI.addTrackName(track, 0, "track %d" % track)
+            MyMIDI.addSysEx(track, 0, 0x41, b"\x01\x02")
+            for i in range(200 * (track + 1)):
+                MyMIDI.addNote(track, track, rnd.randrange(30, 90),
+                               rnd.randrange(400) / 4.0, 1, 100)
+        output = BytesIO()
+        MyMIDI.writeFile(output)
+        data = output.getvalue()
+
+        # The events decoded, in the form decodeTracks() returns them.
+        expected = [[event for event in events
+                     if event[1:] != (0xFF, (0x2F,))]
+                    for events in decodeTracks(data)]
+
+        def decoded(events):
+            return [(tick, status, (data1,) + tuple(bytearray(data2))
+                     if status == 0xFF else tuple(bytearray(data2))
+                     if status == 0xF0 else (data1,) if data2 is None
+                     else (data1, data2))
+                    for (tick, status, data1, data2) in events]
+
+        reader = MIDIFileReader(data, cacheSize=None)
+        self.assertEqual((reader.numeric_format, reader.division, len(reader)),
+                         (1, TICKSPERBEAT, 5))
+        self.assertEqual(len(reader.cache), 0)
+        self.assertEqual(decoded(reader[3]), expected[3])
+        self.assertEqual(list(reader.cache), [3])
+        self.assertTrue(reader[3] is reader[3])
+        self.assertEqual(bytes(reader.trackData(2)),
+                         bytes(MyMIDI.tracks[2].MIDIdata))
+
+        # With room for the largest track only, the cache keeps just the
+        # track used last.
+        sizes = [MIDIFileReader.eventsSize(reader[track])
+                 for track in range(5)]
+        self.assertEqual(reader.cachedSize, sum(sizes))
+        reader = MIDIFileReader(data, cacheSize=sizes[4])
+        for track in (1, 2, 0, 3):
+            self.assertEqual(decoded(reader[track]), expected[track])
+        self.assertEqual(list(reader.cache), [0, 3])
+        self.assertEqual(reader.cachedSize, sizes[0] + sizes[3])
+        self.assertEqual(decoded(reader[-1]), expected[4])
+        self.assertEqual(list(reader.cache), [4])
+        reader.cacheSize = sizes[4] - 1
+        reader.cache.clear()
+        reader.cachedSize = 0
+        self.assertEqual(decoded(reader[4]), expected[4])
+        self.assertEqual(list(reader.cache), [])
+
+        (handle, path) = tempfile.mkstemp(suffix='.mid')
+        try:
+            with os.fdopen(handle, 'wb') as output_file:
+                output_file.write(data)
+            with open(path, 'rb') as input_file:
+                with MIDIFileReader.open(input_file) as reader:
+                    self.assertEqual([decoded(reader[track])
+                                      for track in range(5)], expected)
+        finally:
+            os.remove(path)
+
+    def testScanMetadata(self):
+        def build(notes):
+            MyMIDI = MIDIFile(2, adjust_origin=False)
+            MyMIDI.addTempo(0, 0, 120)
+            MyMIDI.addTempo(0, 8, 60)
+            MyMIDI.addTimeSignature(0, 0, 6, 3, 36)
+            MyMIDI.addKeySignature(1, 4, 2, FLATS, MINOR)
+            MyMIDI.addCopyright(0, 0, "copyright")
+            MyMIDI.addTrackName(0, 0, "first")
+            MyMIDI.addTrackName(0, 1, "renamed")
+            MyMIDI.addSysEx(1, 0, 0x41, b"\x90\x01")
+            for i in range(notes):
+                MyMIDI.addNote(i % 2, 0, 60 + i, i, 2, 100)
+                MyMIDI.addControllerEvent(1, 0, i, 7, 90)
+            output = BytesIO()
+            MyMIDI.writeFile(output)
+            return output.getvalue()
+
+        data = build(12)
+        info = scanMetadata(data)
+        self.assertEqual((info.numeric_format, info.division, info.numTracks),
+                         (1, TICKSPERBEAT, 3))
+        self.assertEqual(info.trackNames, [None, "first", None])
+        self.assertEqual(info.copyrights, ["copyright"])
+        self.assertEqual(info.tempos, [(0, 500000), (8 * TICKSPERBEAT,
+                                                     1000000)])
+        self.assertEqual(info.timeSignatures, [(0, 6, 3, 36, 8)])
+        self.assertEqual(info.keySignatures,
+                         [(4 * TICKSPERBEAT, 2, FLATS, MINOR)])
+        self.assertEqual(info.noteCounts, [0, 6, 6])
+        self.assertEqual(info.eventCounts, [
+            len(events) - 1 for events in decodeTracks(data)])
+        self.assertEqual(info.ticks, 13 * TICKSPERBEAT)
+        self.assertEqual(info.duration, 13)
+        # Eight beats at 120 beats per minute and five at 60.
+        self.assertAlmostEqual(info.seconds, 9.0)
+        self.assertAlmostEqual(info.toSeconds(9 * TICKSPERBEAT), 5.0)
+
+        directory = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(directory, "sub"))
+            expected = []
+            for (name, notes) in (("a.mid", 4), ("b.MIDI", 8),
+                                  (os.path.join("sub", "c.mid"), 12)):
+                path = os.path.join(directory, name)
+                with open(path, 'wb') as output_file:
+                    output_file.write(build(notes))
+                expected.append((path, notes))
+            with open(os.path.join(directory, "bad.mid"), 'wb') as output_file:
+                output_file.write(b"MThd")
+            expected.insert(2, (os.path.join(directory, "bad.mid"), None))
+            with open(os.path.join(directory, "notes.txt"), 'wb') as output_file:
+                output_file.write(data)
+
+            for options in ({}, {'workers': 2, 'pool': 'thread'},
+                            {'workers': 2, 'pool': 'process'}):
+                if futures is None and options:
+                    with self.assertRaises(ImportError):
+                        list(scanDirectory(directory, **options))
+                    continue
+                results = [(path, info and sum(info.noteCounts))
+                           for (path, info) in scanDirectory(directory,
+                                                             **options)]
+                self.assertEqual(results, expected)
+        finally:
+            for (root, dirs, names) in os.walk(directory, topdown=False):
+                for name in names:
+                    os.remove(os.path.join(root, name))
+                os.rmdir(root)
+
+    def testCloseTrackOrder(self):
+        # Closing a track sorts its events once; the note offs moved by
+        # de-interleaving are merged back in, and the result must match a
+        # full sort.
+        rnd = random.Random(7)
+        MyMIDI = MIDIFile(1)
+        for i in range(500):
+            time = rnd.randrange(100) / 4.0
+            MyMIDI.addNote(0, rnd.randrange(2), rnd.choice([60, 61]), time,
+                           rnd.choice([0.25, 1, 3]), 100)
+            if i % 10 == 0:
+                MyMIDI.addControllerEvent(0, 0, time, 7, 100)
+        track = MyMIDI.tracks[1]
+        track.closeTrack()
+        self.assertEqual(track.MIDIEventList,
+                         sorted(track.MIDIEventList, key=sort_events))
+        self.assertEqual(len(track.MIDIEventList), 2 * len(track.eventList) -
+                         sum(1 for thing in track.eventList
+                             if thing.type != 'note'))
+
+    def testSortKeys(self):
+        # The packed sort keys must order events exactly as sort_events()
+        # does, including negative and fractional times and ordinals.
+        rnd = random.Random(3)
+        for trial in range(100):
+            events = [MIDIEvent("NoteOn",
+                                rnd.choice([0, 0.0, -0.0, 1.5, -1.5,
+                                            rnd.uniform(-1e6, 1e6),
+                                            rnd.randint(-5, 5)]),
+                                rnd.choice([3, 2.9, 0, -0.1, 1]),
+                                rnd.choice([0, 1, 2, 2 ** 62, -5]))
+                      for i in range(50)]
+            setSortKeys(events)
+            self.assertEqual(sorted(events, key=sort_events),
+                             sorted(events, key=lambda event: event.sortKey))
+
+        if numpy is not None:
+            # The keys made for the note table must match setSortKeys()
+            MyMIDI = MIDIFile(1)
+            MyMIDI.addNotes(0, 0, [rnd.randrange(128) for i in range(500)],
+                            [rnd.randrange(400) / 3.0 for i in range(500)],
+                            [0.25, 1, 1 / 3.0, 2] * 125, 100)
+            events = MyMIDI.tracks[1].expandNoteTableSorted()
+            keys = [event.sortKey for event in events]
+            setSortKeys(events)
+            self.assertEqual(keys, [event.sortKey for event in events])
+            self.assertEqual(keys, sorted(keys))
+
     def testTimeShift(self):
         
         # With one track
@@ -347,6 +1474,23 @@ class TestMIDIUtils(unittest.TestCase):
             self.assertEqual(data.unpack_into_byte(index), test_char)
             index = index + 1
 
+    def testLongText(self):
+        # Payload lengths of 128 bytes or more need a multi-byte length
+        text = "x" * 200
+        MyMIDI = MIDIFile(1)
+        MyMIDI.addText(0, 0, text)
+        MyMIDI.close()
+
+        data = Decoder(MyMIDI.tracks[1].MIDIdata)
+
+        self.assertEqual(data.unpack_into_byte(0), 0x00) # time
+        self.assertEqual(data.unpack_into_byte(1), 0xff) # Code
+        self.assertEqual(data.unpack_into_byte(2), 0x01)
+        self.assertEqual(data.unpack_into_byte(3), 0x81)
+        self.assertEqual(data.unpack_into_byte(4), 0x48)
+        self.assertEqual(data[5:205], text.encode("ISO-8859-1"))
+        self.assertEqual(len(data), 205 + 4) # plus end of track
+
     def testTimeSignature(self):
         time = 0
         track = 0
@@ -786,7 +1930,26 @@ class TestMIDIUtils(unittest.TestCase):
         with self.assertRaises(Exception) as context:
             MyMIDI.close()
         self.assertTrue(('Error in MIDITrack: Unknown event type %s' % bad_type) in str(context.exception))
-            
+
+    def testSlottedEvents(self):
+        MyMIDI = MIDIFile(1)
+        MyMIDI.addNote(0, 0, 69, 0, 1, 64)
+        MyMIDI.addTempo(0, 0, 120)
+        MyMIDI.close()
+        for track in MyMIDI.tracks:
+            for event in track.eventList + track.MIDIEventList:
+                self.assertFalse(hasattr(event, '__dict__'))
+        self.assertTrue(isinstance(MyMIDI.tracks[0].MIDIEventList[0],
+                                   MidiFileModule.MIDITempo))
+        self.assertEqual(['NoteOn', 'NoteOff'],
+                         [event.type for event in MyMIDI.tracks[1].MIDIEventList])
+
+        # The generic event still takes arbitrary attributes, for
+        # user-defined event types.
+        event = MIDIEvent("Tempo", 0, 3, 0)
+        event.tempo = 500000
+        self.assertEqual(500000, event.tempo)
+
     def testRemoveDuplicates(self):
         # First notes
         track    = 0
@@ -880,9 +2043,48 @@ class TestMIDIUtils(unittest.TestCase):
         MyMIDI.addUniversalSysEx(track, time, code, subcode, payload, realTime=True)
         MyMIDI.close()
         self.assertEqual(2, len(MyMIDI.tracks[1].eventList))
-        
+
+    def testDedupeKeys(self):
+        # A dense chord: notes at the same time are only duplicates if they
+        # also share pitch and channel. The first of each is kept.
+        MyMIDI = MIDIFile(1)
+        for volume in (100, 50):
+            for channel in range(16):
+                for pitch in range(128):
+                    MyMIDI.addNote(0, channel, pitch, 0, 1, volume)
+        track = MyMIDI.tracks[1]
+        track.removeDuplicates()
+        self.assertEqual(16 * 128, len(track.eventList))
+        self.assertTrue(all(note.volume == 100 for note in track.eventList))
+
+        # Other events of the same type at the same time are duplicates,
+        # whatever their data.
+        MyMIDI = MIDIFile(1)
+        MyMIDI.addText(0, 0, "first")
+        MyMIDI.addText(0, 0, "second")
+        MyMIDI.addText(0, 1, "third")
+        MyMIDI.addCopyright(0, 0, "first")
+        track = MyMIDI.tracks[1]
+        track.removeDuplicates()
+        self.assertEqual([b"first", b"third"],
+                         [thing.text for thing in track.eventList
+                          if thing.type == 'Text'])
+        self.assertEqual(3, len(track.eventList))
+
+        self.assertEqual(Note(0, 60, 1, 1, 100), Note(0, 60, 1, 2, 50))
+        self.assertNotEqual(Note(0, 60, 1, 1, 100), Note(1, 60, 1, 1, 100))
+        self.assertNotEqual(ControllerEvent(0, 0, 7, 100),
+                            ControllerEvent(0, 0, 7, 100))
+        self.assertEqual(hash(Note(0, 60, 1, 1, 100)),
+                         hash(Note(0, 60, 1.0, 2, 50)))
+
 def suite():
     MIDISuite = unittest.TestLoader().loadTestsFromTestCase(TestMIDIUtils)
+    if sys.version_info >= (3, 5):
+        # The asyncio tests are kept apart, as Python 2 cannot parse them.
+        from test_midi_async import TestMIDIAsync
+        MIDISuite.addTests(
+            unittest.TestLoader().loadTestsFromTestCase(TestMIDIAsync))
 
     return MIDISuite
 
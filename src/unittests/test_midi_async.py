@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Name:        test_midi_async.py
+# Purpose:     Unit tests of writing MIDI files from asyncio code
+#
+# License:     Please see License.txt for the terms under which this
+#              software is distributed.
+#-----------------------------------------------------------------------------
+#
+# These tests need Python 3.5 or later, so they are kept out of test_midi.py,
+# which is run on Python 2 as well.
+
+import asyncio
+import random
+import unittest
+from concurrent import futures
+from io import BytesIO
+
+from midiutil.MidiFile import MIDIFile
+
+
+class TestMIDIAsync(unittest.TestCase):
+
+    def testWriteAsync(self):
+        def build():
+            MyMIDI = MIDIFile(4, adjust_origin=True)
+            rnd = random.Random(3)
+            for track in range(4):
+                for i in range(200):
+                    MyMIDI.addNote(track, track, rnd.choice([60, 62]),
+                                   1 + rnd.randrange(64) / 4.0,
+                                   rnd.choice([0.25, 1, 4]), 100)
+            return MyMIDI
+
+        def write(MyMIDI):
+            output = BytesIO()
+            MyMIDI.writeFile(output)
+            return output.getvalue()
+
+        def run(coroutine):
+            loop = asyncio.new_event_loop()
+            try:
+                return loop.run_until_complete(coroutine)
+            finally:
+                loop.close()
+
+        class Stream(object):
+            # Written to like an asyncio.StreamWriter; the drain after the
+            # track numbered hold does not finish.
+            def __init__(self, hold=None):
+                self.data = bytearray()
+                self.drains = 0
+                self.hold = hold
+                self.held = None
+
+            def write(self, data):
+                self.data.extend(data)
+
+            async def drain(self):
+                self.drains += 1
+                if self.drains - 2 == self.hold:
+                    self.held.set_result(None)
+                    await asyncio.sleep(3600)
+
+        class AsyncFile(object):
+            # Like an asynchronous file, whose writes are coroutines.
+            def __init__(self):
+                self.data = bytearray()
+
+            async def write(self, data):
+                await asyncio.sleep(0)
+                self.data.extend(data)
+
+        expected = write(build())
+        stream = Stream()
+        MyMIDI = build()
+        profile = run(MyMIDI.writeAsync(stream, profile=True))
+        self.assertEqual(bytes(stream.data), expected)
+        self.assertTrue(MyMIDI.closed)
+        # The header and the tempo track are written as well.
+        self.assertEqual(stream.drains, 6)
+        self.assertEqual([record.track for record in profile.records
+                          if record.phase == 'writeTrack'], [0, 1, 2, 3, 4])
+
+        # Only the tracks that have changed are closed again.
+        MyMIDI.addNote(1, 0, 70, 2, 1, 100)
+        output = AsyncFile()
+        profile = run(MyMIDI.writeAsync(output, profile=True))
+        self.assertEqual([record.track for record in profile.records
+                          if record.phase == 'sortEvents'], [2])
+        reference = build()
+        reference.addNote(1, 0, 70, 2, 1, 100)
+        self.assertEqual(bytes(output.data), write(reference))
+
+        with futures.ProcessPoolExecutor(max_workers=2) as executor:
+            output = AsyncFile()
+            MyMIDI = build()
+            run(MyMIDI.writeAsync(output, executor))
+            self.assertEqual(bytes(output.data), expected)
+            self.assertEqual(write(MyMIDI), expected)
+
+        # A write that is cancelled leaves the file to be written again.
+        async def cancel(MyMIDI, stream):
+            stream.held = asyncio.Future()
+            task = asyncio.ensure_future(MyMIDI.writeAsync(stream))
+            await stream.held
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        MyMIDI = build()
+        stream = Stream(hold=1)
+        run(cancel(MyMIDI, stream))
+        self.assertFalse(MyMIDI.closed)
+        self.assertEqual(bytes(stream.data),
+                         expected[:len(stream.data)])
+        self.assertLess(len(stream.data), len(expected))
+        self.assertEqual(write(MyMIDI), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()